@@ -0,0 +1,12 @@
+import os
+import sys
+
+# Makes `python -m wood_poly` work from the parent directory, the modules import each other from the top level
+module_path = os.path.dirname(os.path.abspath(__file__))
+if module_path not in sys.path:
+    sys.path.insert(0, module_path)
+
+import cli
+
+if __name__ == "__main__":
+    sys.exit(cli.main())
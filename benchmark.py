@@ -0,0 +1,170 @@
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import connector_pipeline
+import create_svg_functions
+import synthetic_meshes
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+from blender_helper import export_helper, instrument_helper
+
+DEFAULT_CASES = [
+    ("icosphere", 1), ("icosphere", 2), ("icosphere", 4), ("icosphere", 8), ("icosphere", 16), ("icosphere", 32),
+    ("dome", 4), ("dome", 8), ("dome", 16),
+    ("prism", 6), ("prism", 64),
+    ("hub", 16), ("hub", 128),
+]
+QUICK_CASES = [("icosphere", 4), ("dome", 4), ("prism", 6), ("hub", 16)]
+
+# stages that are faster than this in the baseline are too noisy to compare
+MIN_COMPARE_TIME = 0.01
+# width, height, margin and gap of the sheets of cli pack
+PACK_SHEET = (1200, 600, 5, 2)
+
+
+def run_pipeline(coords, face_offsets, face_indices, parameters, chunk_size, export_path):
+    """
+    The steps of cli generate in a single process and the faces packed like cli pack, the stages are measured
+    by instrument_helper
+
+    :return: amount of connectors
+    """
+    mesh = ArrayConnectionMesh(coords, face_offsets, face_indices)
+    jobs = connector_pipeline.get_connector_jobs(mesh)
+    connector_pipeline.group_jobs(jobs)
+
+    with export_helper.get_writer(export_path) as writer:
+        for chunk in connector_pipeline.get_chunks(jobs, chunk_size):
+            wood_con = connector_pipeline.build_batch(chunk, parameters)
+            writer.add_meshes(wood_con.get_verts(), *wood_con.get_face_buffers())
+
+    width, height, margin, gap = PACK_SHEET
+    create_svg_functions.pack_tris(create_svg_functions.get_face_outlines(mesh), width, height, margin=margin,
+                                   spacing=gap)
+    return len(jobs)
+
+
+def run_case(name, size, parameters=None, chunk_size=256, repeat=3, memory=True):
+    """
+    Runs the pipeline on a generated mesh, the fastest of the repeats is kept
+
+    :param name: generator in synthetic_meshes.GENERATORS
+    :param size: frequency, sides or valence of the generator
+    :param parameters: dict with the parameters that differ from DEFAULT_PARAMETERS
+    :param repeat: amount of timed runs
+    :param memory: also do a run with tracemalloc for the peak memory, that run is not timed
+    :return: dict with the results
+    """
+    parameters = connector_pipeline.get_parameters(parameters)
+    coords, face_offsets, face_indices = synthetic_meshes.get_mesh(name, size)
+
+    best_total = None
+    best_times = None
+    best_counters = None
+    with tempfile.TemporaryDirectory() as directory:
+        export_path = os.path.join(directory, "connectors.stl")
+        for i in range(repeat):
+            instrument_helper.enable()
+            start = time.perf_counter()
+            connector_amount = run_pipeline(coords, face_offsets, face_indices, parameters, chunk_size, export_path)
+            total = time.perf_counter() - start
+            instrumentation = instrument_helper.disable()
+            if best_total is None or total < best_total:
+                best_total = total
+                best_times = {name: seconds for name, (calls, seconds) in instrumentation.stages.items()}
+                best_counters = instrumentation.counters
+        export_size = os.path.getsize(export_path)
+
+        peak_memory = None
+        if memory:
+            tracemalloc.start()
+            run_pipeline(coords, face_offsets, face_indices, parameters, chunk_size, export_path)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return {
+        "name": name + "_" + str(size),
+        "vertices": len(coords),
+        "faces": len(face_offsets) - 1,
+        "connectors": connector_amount,
+        "stages": best_times,
+        "counters": best_counters,
+        "total": best_total,
+        "connectors_per_second": connector_amount / best_total,
+        "peak_memory": peak_memory,
+        "export_bytes": export_size,
+    }
+
+
+def run_benchmarks(cases=None, parameters=None, chunk_size=256, repeat=3, memory=True, log=print):
+    """
+
+    :param cases: [(generator name, size), ...], DEFAULT_CASES when None
+    :param log: function that gets a line for every finished case, None for no output
+    :return: dict that can be stored as json and used as baseline
+    """
+    if cases is None:
+        cases = DEFAULT_CASES
+
+    results = []
+    for name, size in cases:
+        result = run_case(name, size, parameters=parameters, chunk_size=chunk_size, repeat=repeat, memory=memory)
+        results.append(result)
+        if log is not None:
+            log(format_result(result))
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "chunk_size": chunk_size,
+        "cases": results,
+    }
+
+
+def format_result(result):
+    memory = "" if result["peak_memory"] is None else "  peak " + str(round(result["peak_memory"] / 2 ** 20, 1)) + " MB"
+    stages = ", ".join(name + " " + str(round(seconds * 1000, 1)) for name, seconds in result["stages"].items())
+    return (result["name"].ljust(14) + str(result["connectors"]).rjust(7) + " connectors  " +
+            str(round(result["total"] * 1000, 1)).rjust(9) + " ms  " +
+            str(int(result["connectors_per_second"])).rjust(8) + " /s" + memory + "\n    " + stages + " (ms)")
+
+
+def save_results(path, results):
+    with open(path, "w") as json_file:
+        json.dump(results, json_file, indent=2)
+
+
+def load_results(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+
+def compare_results(results, baseline, threshold=1.25):
+    """
+    Compares the total time and the stage times of the cases that are in both, stages that took less than
+    MIN_COMPARE_TIME in the baseline are skipped
+
+    :param results: dict from run_benchmarks
+    :param baseline: dict from run_benchmarks, for example loaded with load_results
+    :param threshold: allowed ratio between the new and the baseline time
+    :return: [message, ...] one message for every regression
+    """
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        if case["name"] not in baseline_cases:
+            continue
+        old_case = baseline_cases[case["name"]]
+        timings = [("total", case["total"], old_case["total"])]
+        timings += [(name, seconds, old_case["stages"].get(name)) for name, seconds in case["stages"].items()]
+        for name, new_time, old_time in timings:
+            if old_time is None or old_time < MIN_COMPARE_TIME:
+                continue
+            if new_time > threshold * old_time:
+                regressions.append(case["name"] + " " + name + ": " + str(round(old_time * 1000, 1)) + " ms -> " +
+                                   str(round(new_time * 1000, 1)) + " ms")
+    return regressions
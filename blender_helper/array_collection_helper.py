@@ -0,0 +1,221 @@
+import numpy as np
+from blender_helper.half_edge_helper import HalfEdgeMesh
+from blender_helper import instrument_helper
+from blender_helper import weld_helper
+
+
+class CsrLink:
+    """
+    Compressed adjacency list: the items linked to element i are indices[offsets[i]:offsets[i + 1]].
+    Indexing it behaves like the dicts in collection_helper, link[vert] gives the linked indices.
+    """
+    def __init__(self, offsets, indices):
+        self.offsets = offsets
+        self.indices = indices
+
+    def __getitem__(self, index):
+        return self.indices[self.offsets[index]:self.offsets[index + 1]]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def counts(self):
+        return np.diff(self.offsets)
+
+
+class ArrayConnectionMesh:
+    """
+    Array backed counterpart of collection_helper.ConnectionMesh that does not need bmesh or mathutils.
+    Vertices, edges and faces are plain integer indices, the coordinates are stored in a float64 array
+    and all the links are stored as CsrLink objects.
+    """
+    def __init__(self, coords, face_offsets, face_indices):
+        """
+
+        :param coords: (V, 3) vertex coordinates
+        :param face_offsets: (F + 1) start of every face in face_indices
+        :param face_indices: vertex index of every face corner
+        """
+        with instrument_helper.stage("adjacency"):
+            self.coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 3)
+            self.faces = CsrLink(np.ascontiguousarray(face_offsets, dtype=np.int64),
+                                 np.ascontiguousarray(face_indices, dtype=np.int64))
+            self.verts = np.arange(len(self.coords))
+
+            self.corner_face = get_corner_face(self)
+            self.corner_next = get_corner_next(self)
+            self.edge_verts, self.corner_edge = get_edges(self)
+            self.edges = np.arange(len(self.edge_verts))
+
+            self.vertex_edge = get_vertex_edge_link(self)
+            self.vertex_face = get_vertex_face_link(self)
+            self.edge_face = get_edge_face_link(self)
+            self.face_normal, self.face_area = get_face_normal(self)
+            self.vertex_normal = get_vertex_normal(self)
+
+        with instrument_helper.stage("half_edge_fans"):
+            self.half_edge = HalfEdgeMesh.from_array_mesh(self)
+
+    @classmethod
+    def from_faces(cls, coords, faces):
+        """
+        Convenience constructor for a list of faces (lists of vertex indices) of any size
+
+        :param coords: (V, 3) vertex coordinates
+        :param faces: [[v1, v2, v3], [v1, v2, v3, v4], ...]
+        :return: ArrayConnectionMesh
+        """
+        sizes = np.fromiter((len(face) for face in faces), dtype=np.int64, count=len(faces))
+        offsets = np.zeros(len(faces) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=offsets[1:])
+        indices = np.fromiter((vert for face in faces for vert in face), dtype=np.int64, count=offsets[-1])
+        return cls(coords, offsets, indices)
+
+    @classmethod
+    def from_blender_mesh(cls, mesh, weld_tolerance=None):
+        """
+        Reads a bpy.types.Mesh with foreach_get so there is no python loop over the elements
+
+        :param mesh: bpy.types.Mesh
+        :param weld_tolerance: vertices closer than this are welded first, None keeps the vertices of the mesh
+        :return: ArrayConnectionMesh
+        """
+        coords = np.empty(len(mesh.vertices) * 3, dtype=np.float64)
+        mesh.vertices.foreach_get("co", coords)
+        loop_start = np.empty(len(mesh.polygons), dtype=np.int64)
+        mesh.polygons.foreach_get("loop_start", loop_start)
+        loop_total = np.empty(len(mesh.polygons), dtype=np.int64)
+        mesh.polygons.foreach_get("loop_total", loop_total)
+        loop_verts = np.empty(len(mesh.loops), dtype=np.int64)
+        mesh.loops.foreach_get("vertex_index", loop_verts)
+
+        # polygons normally store their loops in order, but that is not guaranteed
+        offsets = np.zeros(len(loop_total) + 1, dtype=np.int64)
+        np.cumsum(loop_total, out=offsets[1:])
+        corner = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - loop_start, loop_total)
+        indices = loop_verts[corner]
+        if weld_tolerance is not None:
+            coords, offsets, indices, _ = weld_helper.weld_vertices(coords, offsets, indices, tolerance=weld_tolerance)
+        return cls(coords, offsets, indices)
+
+
+def group_by(keys, values, amount):
+    """
+    Groups values by their key in a single sort
+
+    :param keys: (N) integer key of every value, 0 <= key < amount
+    :param values: (N) values
+    :param amount: amount of different keys
+    :return: CsrLink where link[key] = [value1, ..., value k]
+    """
+    order = np.argsort(keys, kind="stable")
+    offsets = np.zeros(amount + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=amount), out=offsets[1:])
+    return CsrLink(offsets, values[order])
+
+
+def get_corner_face(mesh):
+    """
+
+    :param mesh: ArrayConnectionMesh
+    :return: (C) face index of every face corner
+    """
+    return np.repeat(np.arange(len(mesh.faces)), mesh.faces.counts())
+
+
+def get_corner_next(mesh):
+    """
+
+    :param mesh: ArrayConnectionMesh
+    :return: (C) index of the next corner in the same face
+    """
+    offsets = mesh.faces.offsets
+    corner_next = np.arange(1, offsets[-1] + 1)
+    corner_next[offsets[1:] - 1] = offsets[:-1]
+    return corner_next
+
+
+def get_edges(mesh):
+    """
+    The edges are the unique vertex pairs of the face sides, every edge is stored with the lowest vertex first
+
+    :param mesh: ArrayConnectionMesh
+    :return: (E, 2) edge vertices, (C) edge index of the side that starts at every face corner
+    """
+    v_start = mesh.faces.indices
+    v_end = v_start[mesh.corner_next]
+    low = np.minimum(v_start, v_end)
+    high = np.maximum(v_start, v_end)
+
+    keys = low * len(mesh.coords) + high
+    unique_keys, corner_edge = np.unique(keys, return_inverse=True)
+    edge_verts = np.stack((unique_keys // len(mesh.coords), unique_keys % len(mesh.coords)), axis=1)
+
+    return edge_verts, corner_edge.reshape(-1)
+
+
+def get_vertex_edge_link(mesh):
+    """
+
+    :param mesh: ArrayConnectionMesh
+    :return: link[vertex] = [edge1, ..., edge k]
+    """
+    keys = mesh.edge_verts.reshape(-1)
+    values = np.repeat(mesh.edges, 2)
+    return group_by(keys, values, len(mesh.coords))
+
+
+def get_edge_face_link(mesh):
+    """
+
+    :param mesh: ArrayConnectionMesh
+    :return: link[edge] = [face1, ..., face k]
+    """
+    return group_by(mesh.corner_edge, mesh.corner_face, len(mesh.edge_verts))
+
+
+def get_vertex_face_link(mesh):
+    """
+
+    :param mesh: ArrayConnectionMesh
+    :return: link[vertex] = [face1, ..., face k]
+    """
+    return group_by(mesh.faces.indices, mesh.corner_face, len(mesh.coords))
+
+
+def get_face_normal(mesh):
+    """
+    Newell's method, the summed cross products of the sides give the normal scaled by twice the face area.
+    This also works for faces that are not planar or not convex.
+
+    :param mesh: ArrayConnectionMesh
+    :return: (F, 3) unit face normals, (F) face areas
+    """
+    co_start = mesh.coords[mesh.faces.indices]
+    co_end = co_start[mesh.corner_next]
+    corner_cross = np.cross(co_start, co_end)
+
+    area_normal = np.add.reduceat(corner_cross, mesh.faces.offsets[:-1], axis=0) / 2
+    area = np.linalg.norm(area_normal, axis=1)
+    normal = area_normal / np.where(area > 0, area, 1)[:, None]
+
+    return normal, area
+
+
+def get_vertex_normal(mesh):
+    """
+    Area weighted average of the normals of the faces around each vertex
+
+    :param mesh: ArrayConnectionMesh
+    :return: (V, 3) unit vertex normals
+    """
+    weighted = mesh.face_normal * mesh.face_area[:, None]
+    corner_weighted = weighted[mesh.corner_face]
+
+    normal = np.empty_like(mesh.coords)
+    for axis in range(3):
+        normal[:, axis] = np.bincount(mesh.faces.indices, weights=corner_weighted[:, axis],
+                                      minlength=len(mesh.coords))
+
+    length = np.linalg.norm(normal, axis=1)
+    return normal / np.where(length > 0, length, 1)[:, None]
@@ -0,0 +1,70 @@
+import bpy
+import numpy as np
+
+
+def new_mesh(name, verts, face_offsets, face_indices):
+    """
+    Creates a bpy.types.Mesh straight from the buffers with foreach_set, there is no bmesh round trip
+    and no python loop over the elements
+
+    :param name: name of the mesh
+    :param verts: (V, 3) vertex coordinates
+    :param face_offsets: (F + 1) start of every face in face_indices
+    :param face_indices: (C) vertex index of every face corner
+    :return: bpy.types.Mesh
+    """
+    face_offsets = np.asarray(face_offsets)
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(verts))
+    mesh.loops.add(len(face_indices))
+    mesh.polygons.add(len(face_offsets) - 1)
+
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(verts, dtype=np.float32).reshape(-1))
+    mesh.loops.foreach_set("vertex_index", np.ascontiguousarray(face_indices, dtype=np.int32))
+    mesh.polygons.foreach_set("loop_start", face_offsets[:-1].astype(np.int32))
+    # since 4.0 loop_total follows from the loop starts and can't be set
+    if bpy.app.version < (4, 0, 0):
+        mesh.polygons.foreach_set("loop_total", np.diff(face_offsets).astype(np.int32))
+
+    mesh.update(calc_edges=True)
+    return mesh
+
+
+def set_face_attribute(mesh, name, values):
+    """
+    Stores an integer for every face, for example the vertex a connector belongs to in a merged mesh.
+    Blender versions without generic attributes skip this.
+
+    :param mesh: bpy.types.Mesh
+    :param name: name of the attribute
+    :param values: (F) integer for every face
+    """
+    if not hasattr(mesh, "attributes"):
+        return
+    attribute = mesh.attributes.new(name, "INT", "FACE")
+    attribute.data.foreach_set("value", np.ascontiguousarray(values, dtype=np.int32))
+
+
+def link_objects(scene, objects, name="connectors"):
+    """
+    Links the objects to a new collection that is only linked to the scene after all the objects are in it,
+    so the scene is updated once instead of once for every object. Blender versions before collections
+    use a group and link every object to the scene.
+
+    :param scene: bpy.types.Scene
+    :param objects: [bpy.types.Object, ...]
+    :param name: name of the collection
+    :return: the collection or group
+    """
+    if hasattr(bpy.data, "collections"):
+        collection = bpy.data.collections.new(name)
+        for obj in objects:
+            collection.objects.link(obj)
+        scene.collection.children.link(collection)
+        return collection
+
+    group = bpy.data.groups.new(name)
+    for obj in objects:
+        scene.objects.link(obj)
+        group.objects.link(obj)
+    return group
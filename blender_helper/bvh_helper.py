@@ -0,0 +1,115 @@
+import numpy as np
+
+
+def spread_bits(values):
+    """
+    Puts two zero bits between the lowest 10 bits of every value, for the morton codes
+
+    :param values: (n) integers below 1024
+    :return: (n) integers
+    """
+    values = values.astype(np.uint64)
+    values = (values | (values << np.uint64(16))) & np.uint64(0x030000FF)
+    values = (values | (values << np.uint64(8))) & np.uint64(0x0300F00F)
+    values = (values | (values << np.uint64(4))) & np.uint64(0x030C30C3)
+    values = (values | (values << np.uint64(2))) & np.uint64(0x09249249)
+    return values
+
+
+def get_morton_codes(points):
+    """
+
+    :param points: (n, 3) coordinates
+    :return: (n) 30 bit morton code of every point in the bounding box of all the points
+    """
+    low = points.min(axis=0)
+    size = np.maximum(points.max(axis=0) - low, 1e-12)
+    cells = np.clip(((points - low) / size * 1023).astype(np.int64), 0, 1023)
+    return (spread_bits(cells[:, 0]) << np.uint64(2)) | (spread_bits(cells[:, 1]) << np.uint64(1)) | \
+        spread_bits(cells[:, 2])
+
+
+def boxes_overlap(low1, high1, low2, high2):
+    return np.all((low1 <= high2) & (low2 <= high1), axis=-1)
+
+
+class BoxTree:
+    """
+    Bounding volume hierarchy over axis aligned boxes. The boxes are sorted along a morton curve and put
+    in leaves of leaf_size boxes, the leaves are the bottom level of a complete binary tree that is stored
+    like a heap: the children of node i are 2i + 1 and 2i + 2. Because all the leaves are on the same level
+    a query walks the tree one level at a time for all the node pairs at once.
+    """
+    def __init__(self, low, high, leaf_size=4):
+        """
+
+        :param low: (n, 3) lowest corner of every box
+        :param high: (n, 3) highest corner of every box
+        :param leaf_size: amount of boxes in a leaf
+        """
+        self.low = np.asarray(low, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.leaf_size = leaf_size
+
+        leaf_amount = max(-(-len(self.low) // leaf_size), 1)
+        self.depth = int(np.ceil(np.log2(leaf_amount)))
+        leaf_amount = 2 ** self.depth
+
+        # leaf l holds the boxes leaf_boxes[l], -1 fills up the last leaves
+        order = np.argsort(get_morton_codes((self.low + self.high) / 2), kind="stable") if len(self.low) else \
+            np.zeros(0, dtype=np.int64)
+        self.leaf_boxes = np.full(leaf_amount * leaf_size, -1, dtype=np.int64)
+        self.leaf_boxes[:len(order)] = order
+        self.leaf_boxes = self.leaf_boxes.reshape(leaf_amount, leaf_size)
+
+        # empty nodes get an inverted box, so they never overlap anything
+        node_amount = 2 * leaf_amount - 1
+        self.node_low = np.full((node_amount, 3), np.inf)
+        self.node_high = np.full((node_amount, 3), -np.inf)
+        if len(order):
+            filled = self.leaf_boxes >= 0
+            box_low = np.where(filled[..., None], self.low[self.leaf_boxes], np.inf)
+            box_high = np.where(filled[..., None], self.high[self.leaf_boxes], -np.inf)
+            self.node_low[leaf_amount - 1:] = box_low.min(axis=1)
+            self.node_high[leaf_amount - 1:] = box_high.max(axis=1)
+        for level in range(self.depth - 1, -1, -1):
+            nodes = np.arange(2 ** level - 1, 2 ** (level + 1) - 1)
+            self.node_low[nodes] = np.minimum(self.node_low[2 * nodes + 1], self.node_low[2 * nodes + 2])
+            self.node_high[nodes] = np.maximum(self.node_high[2 * nodes + 1], self.node_high[2 * nodes + 2])
+
+    def get_overlapping_pairs(self):
+        """
+        All the pairs of boxes that overlap, every node pair that overlaps is split in its child pairs
+        until the leaves are reached, so only the boxes that are near each other are compared
+
+        :return: (P, 2) box indices, the first index is always the smaller one
+        """
+        if len(self.low) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        first = np.zeros(1, dtype=np.int64)
+        second = np.zeros(1, dtype=np.int64)
+        for level in range(self.depth):
+            same = first == second
+            node, other_first, other_second = first[same], first[~same], second[~same]
+            # a node with itself gives the pairs of its children, two different nodes all four child pairs
+            second_children = np.stack((2 * other_second + 1, 2 * other_second + 2), axis=1).reshape(-1)
+            child_first = np.concatenate((2 * node + 1, 2 * node + 1, 2 * node + 2,
+                                          np.repeat(2 * other_first + 1, 2), np.repeat(2 * other_first + 2, 2)))
+            child_second = np.concatenate((2 * node + 1, 2 * node + 2, 2 * node + 2,
+                                           second_children, second_children))
+            keep = boxes_overlap(self.node_low[child_first], self.node_high[child_first],
+                                 self.node_low[child_second], self.node_high[child_second])
+            first, second = child_first[keep], child_second[keep]
+
+        leaf_offset = 2 ** self.depth - 1
+        size = self.leaf_size
+        box1 = np.repeat(self.leaf_boxes[first - leaf_offset], size, axis=1).reshape(-1)
+        box2 = np.tile(self.leaf_boxes[second - leaf_offset], (1, size)).reshape(-1)
+        # inside one leaf every pair is only taken once, by the order of the boxes in the leaf
+        same = np.repeat(first == second, size * size)
+        ordered = np.tile(np.repeat(np.arange(size), size) < np.tile(np.arange(size), size), len(first))
+        keep = (box1 >= 0) & (box2 >= 0) & (~same | ordered)
+        box1, box2 = box1[keep], box2[keep]
+        keep = boxes_overlap(self.low[box1], self.high[box1], self.low[box2], self.high[box2])
+        box1, box2 = box1[keep], box2[keep]
+        return np.stack((np.minimum(box1, box2), np.maximum(box1, box2)), axis=1)
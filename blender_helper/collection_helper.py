@@ -1,5 +1,6 @@
 from collections import defaultdict
-import mathutils
+import numpy as np
+from blender_helper.half_edge_helper import HalfEdgeMesh
 
 class ConnectionMesh:
     """
@@ -19,47 +20,179 @@ class ConnectionMesh:
         self.vertex_face = get_vertex_face_link(mesh)
         self.edge_face = get_edge_face_link(mesh)
         self.vertex_normal = get_vertex_normal(self)
+        self.half_edge = HalfEdgeMesh.from_bmesh(mesh)
 
 class WoodConnector:
     """
-    This class is used to contain the information about connection pieces
-    :return:
+    This class is used to contain the information about connection pieces.
+
+    All the vertices of the connector are kept in one list in the order they are made, the parts of the
+    connector are stored as index ranges into that list instead of lists of vertices. The hole vertices of a pair
+    are one block [top bolt, bottom bolt, ..., top nut, bottom nut, ...] as made in add_holes, so the top and
+    bottom vertices are ranges with a step of 2. The pair views are computed once and kept.
+
+    After detach (and when it is pickled) the connector holds a (V, 3) array of coordinates instead of the vertices,
+    so it can be sent to another process or kept for a long time without the bmesh.
     """
-    def __init__(self, mesh, middle_vert, av_normal, pairs):
-        self.av_normal = av_normal
+    __slots__ = ("mesh", "verts", "origin_index", "av_normal", "pairs", "pair_amount", "is_closed", "bottom_plane",
+                 "extended_index", "top_rim_range", "bottom_rim_range", "hole_start", "bolt_amount", "nut_amount",
+                 "top_pairs", "bottom_pairs", "frame_origin", "frame_axes")
+
+    def __init__(self, mesh, middle_vert, av_normal, pairs, origin_index=None):
+        """
+
+        :param mesh: bmesh the connector is built in
+        :param middle_vert: vertex in mesh at the place of the original vertex
+        :param av_normal: normal of the original vertex
+        :param pairs: [[e1, e2], [e2, e3], ...] edges of the original mesh around the original vertex
+        :param origin_index: index of the original vertex, the edge directions start there
+        """
         self.mesh = mesh
-        self.middle_vert = middle_vert
-        self.extended_middle = None
-        self.top_rim_verts = None
-        self.bottom_rim_verts = None
-        self.top_faces = None
+        self.verts = [middle_vert]
+        self.origin_index = origin_index
+        self.av_normal = av_normal
         self.pairs = pairs
+        self.pair_amount = len(pairs)
         self.is_closed = None
         self.bottom_plane = None
 
-        self.top_bolt_verts = None
-        self.bottom_bolt_verts = None
-        self.top_nut_verts = None
-        self.bottom_nut_verts = None
+        self.extended_index = None
+        self.top_rim_range = None
+        self.bottom_rim_range = None
+        self.hole_start = None
+        self.bolt_amount = 0
+        self.nut_amount = 0
+
+        self.top_pairs = None
+        self.bottom_pairs = None
+        # local frame after to_middle_point, the origin and the x, y and z axis as rows
+        self.frame_origin = None
+        self.frame_axes = None
+
+    def __getstate__(self):
+        self.detach()
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def detach(self):
+        """
+        Replaces the vertices by their coordinates and drops the references to the bmesh
+        """
+        if self.mesh is not None:
+            self.verts = np.array([tuple(vert.co) for vert in self.verts], dtype=np.float64).reshape(-1, 3)
+            self.av_normal = tuple(self.av_normal)
+            self.bottom_plane = None if self.bottom_plane is None else tuple(self.bottom_plane)
+            self.frame_origin = None if self.frame_origin is None else tuple(self.frame_origin)
+            self.frame_axes = None if self.frame_axes is None else tuple(tuple(row) for row in self.frame_axes)
+            self.mesh = None
+            self.pairs = None
+            self.top_pairs = None
+            self.bottom_pairs = None
+
+    def new_vert(self, co):
+        """
+
+        :param co: coordinate of the vertex
+        :return: the new vertex, its index is len(verts) - 1
+        """
+        vert = self.mesh.verts.new(co)
+        self.verts.append(vert)
+        return vert
+
+    def get_vert_amount(self):
+        return len(self.verts)
+
+    def get_verts(self, indices):
+        verts = self.verts
+        return [verts[i] for i in indices]
+
+    @property
+    def middle_vert(self):
+        return self.verts[0]
+
+    @property
+    def extended_middle(self):
+        return None if self.extended_index is None else self.verts[self.extended_index]
+
+    @property
+    def top_rim_verts(self):
+        return None if self.top_rim_range is None else self.get_verts(self.top_rim_range)
+
+    @property
+    def bottom_rim_verts(self):
+        return None if self.bottom_rim_range is None else self.get_verts(self.bottom_rim_range)
+
+    @property
+    def top_bolt_verts(self):
+        return self.get_hole_verts(0, self.bolt_amount, 0)
+
+    @property
+    def bottom_bolt_verts(self):
+        return self.get_hole_verts(0, self.bolt_amount, 1)
+
+    @property
+    def top_nut_verts(self):
+        return self.get_hole_verts(2 * self.bolt_amount, self.nut_amount, 0)
+
+    @property
+    def bottom_nut_verts(self):
+        return self.get_hole_verts(2 * self.bolt_amount, self.nut_amount, 1)
 
     def set_pairs(self, pairs):
         self.pairs = pairs
+        self.pair_amount = len(pairs)
 
     def set_closed_pair(self, bool):
         self.is_closed = bool
+        self.top_pairs = None
+        self.bottom_pairs = None
+
+    def set_top_rim_verts(self, indices):
+        """
 
-    def set_top_rim_verts(self, verts):
-        self.top_rim_verts = verts
+        :param indices: range of the rim vertices in verts
+        """
+        self.top_rim_range = indices
+        self.top_pairs = None
 
-    def set_bottom_rim_verts(self, verts):
-        self.bottom_rim_verts = verts
+    def set_bottom_rim_verts(self, indices):
+        self.bottom_rim_range = indices
+        self.bottom_pairs = None
 
-    def set_extended_middle(self, vert):
-        self.extended_middle = vert
+    def set_extended_middle(self, index):
+        self.extended_index = index
 
     def set_bottom_plane(self, plane):
         self.bottom_plane = plane
 
+    def set_hole_verts(self, start, bolt_amount, nut_amount):
+        """
+
+        :param start: index of the first hole vertex of the first pair
+        :param bolt_amount: vertices of a bolt circle
+        :param nut_amount: vertices of a nut circle
+        """
+        self.hole_start = start
+        self.bolt_amount = bolt_amount
+        self.nut_amount = nut_amount
+
+    def get_hole_verts(self, offset, amount, side):
+        """
+
+        :param offset: start of the circle in the block of a pair
+        :param amount: vertices of the circle
+        :param side: 0 for the top vertices, 1 for the bottom vertices
+        :return: [[v1, ..., v amount], ...] the circle of every pair
+        """
+        if self.hole_start is None:
+            return None
+        block = 2 * (self.bolt_amount + self.nut_amount)
+        starts = range(self.hole_start + offset + side, self.hole_start + self.pair_amount * block, block)
+        return [self.get_verts(range(start, start + 2 * amount, 2)) for start in starts]
+
     def get_top_verts_pairs(self):
         """
         As constructed in create_hat the top_rim_vertices should be ordered like
@@ -67,34 +200,28 @@ class WoodConnector:
         This function will give the vertices for each pair ([edge_vert, pair_vert, edge_vert])
         :return:
         """
-        if self.top_rim_verts is None:
-            print("WARNING top_rim_verts is None")
-        return self.split_pairs(self.top_rim_verts)
+        if self.top_rim_range is None:
+            raise ValueError("top_rim_verts is None, create_hat has to run first")
+        if self.top_pairs is None:
+            self.top_pairs = [tuple(self.get_verts(pair)) for pair in self.get_pair_indices(self.top_rim_range)]
+        return self.top_pairs
 
     def get_bottom_verts_pairs(self):
-        if self.bottom_rim_verts is None:
-            print("WARNING bottom_rim_verts is None")
-        return self.split_pairs(self.bottom_rim_verts)
-
-    def split_pairs(self, rim_verts):
-        pair_verts = []
-        for i in range(len(self.pairs)):
-            pair_verts.append(rim_verts[i * 2 + 0: i * 2 + 3])
-
-        if self.is_closed:
-            pair_verts[-1].append(rim_verts[0])
-
-        return pair_verts
-
-    def set_bolt_verts(self, top, bottom):
-        self.top_bolt_verts = top
-        self.bottom_bolt_verts = bottom
-
-    def set_nut_verts(self, top, bottom):
-        self.top_nut_verts = top
-        self.bottom_nut_verts = bottom
+        if self.bottom_rim_range is None:
+            raise ValueError("bottom_rim_verts is None, create_thickness has to run first")
+        if self.bottom_pairs is None:
+            self.bottom_pairs = [tuple(self.get_verts(pair)) for pair in self.get_pair_indices(self.bottom_rim_range)]
+        return self.bottom_pairs
 
+    def get_pair_indices(self, rim_range):
+        """
+        The last pair of a closed fan ends at the first rim vertex
 
+        :param rim_range: range of the rim vertices
+        :return: [(edge_vert, pair_vert, edge_vert), ...] indices in verts for every pair
+        """
+        return [(rim_range[i * 2], rim_range[i * 2 + 1], rim_range[(i * 2 + 2) % len(rim_range)])
+                for i in range(self.pair_amount)]
 
 
 def get_vertex_edge_link(mesh):
@@ -151,6 +278,9 @@ def get_vertex_normal(mesh):
     :param mesh: ConnetionMesh
     :return: dict[v1] = Vector((n1, n2, n3))
     """
+    # only needed inside Blender, importing it here keeps the module importable without Blender
+    import mathutils
+
     normal_dict = {}
     for vert, faces in mesh.vertex_face.items():
         av_normal = mathutils.Vector((0.0, 0.0, 0.0))
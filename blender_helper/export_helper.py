@@ -0,0 +1,444 @@
+import os
+import zipfile
+import numpy as np
+from blender_helper import instrument_helper
+
+STL_DTYPE = np.dtype([("normal", "<f4", (3,)), ("verts", "<f4", (3, 3)), ("attribute", "<u2")])
+
+THREE_MF_TYPES = """<?xml version="1.0" encoding="UTF-8"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="model" ContentType="application/vnd.ms-package.3dmanufacturing-3dmodel+xml"/>
+</Types>
+"""
+
+THREE_MF_RELS = """<?xml version="1.0" encoding="UTF-8"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Target="/3D/3dmodel.model" Id="rel0" Type="http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel"/>
+</Relationships>
+"""
+
+THREE_MF_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<model unit="millimeter" xml:lang="en-US" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02">
+<resources>
+"""
+
+
+def get_face_normal(co):
+    """
+    Newell's method for faces of the same size
+
+    :param co: (F, n, 3) coordinates of the face corners
+    :return: (F, 3) normals scaled by twice the face area
+    """
+    return np.cross(co, np.roll(co, -1, axis=1)).sum(axis=1)
+
+
+def get_plane_co(co):
+    """
+    Projects the faces on their own plane, the axes are chosen so the faces are counter clockwise
+
+    :param co: (F, n, 3) coordinates of the face corners
+    :return: (F, n, 2) coordinates in the plane of every face
+    """
+    normal = get_face_normal(co)
+    normal /= np.maximum(np.linalg.norm(normal, axis=1, keepdims=True), 1e-300)
+    helper = np.where(np.abs(normal[:, :1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+    x_axis = np.cross(helper, normal)
+    x_axis /= np.linalg.norm(x_axis, axis=1, keepdims=True)
+    y_axis = np.cross(normal, x_axis)
+    return np.stack((np.einsum("fnj,fj->fn", co, x_axis), np.einsum("fnj,fj->fn", co, y_axis)), axis=2)
+
+
+def cross_2d(a, b):
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def get_plane_eps(plane_co):
+    """
+
+    :param plane_co: (F, n, 2) coordinates in the plane of every face
+    :return: (F) tolerance for doubled triangle areas, relative to the size of the faces
+    """
+    scale = np.abs(plane_co - plane_co.mean(axis=1, keepdims=True)).max(axis=(1, 2))
+    return 1e-9 * np.maximum(scale, 1e-300) ** 2
+
+
+def has_valid_triangles(co, triangles):
+    """
+    A triangulation of a simple face is valid when all the triangles keep the winding of the face
+
+    :param co: (F, n, 3) coordinates of the face corners
+    :param triangles: (F, n - 2, 3) triangles as corner numbers of the faces
+    :return: (F) bool
+    """
+    plane_co = get_plane_co(co)
+    corners = plane_co[np.arange(len(co))[:, None, None], triangles]
+    area = cross_2d(corners[:, :, 1] - corners[:, :, 0], corners[:, :, 2] - corners[:, :, 0])
+    return np.all(area > get_plane_eps(plane_co)[:, None], axis=1)
+
+
+def clip_ears(co):
+    """
+    Ear clipping for a batch of faces that have the same amount of corners. Every step cuts one ear off all
+    the faces at once, so the only python loop is over the corners of a single face. Faces can be concave,
+    like the faces around the holes of the connectors.
+
+    :param co: (F, n, 3) coordinates of the face corners
+    :return: (F, n - 2, 3) triangles as corner numbers of the faces, wound like the faces
+    """
+    face_amount, size = co.shape[:2]
+    plane_co = get_plane_co(co)
+    eps = get_plane_eps(plane_co)[:, None, None]
+
+    faces = np.arange(face_amount)[:, None]
+    ring = np.tile(np.arange(size), (face_amount, 1))
+    triangles = np.empty((face_amount, size - 2, 3), dtype=np.int64)
+    for step in range(size - 3):
+        prev_corner = np.roll(ring, 1, axis=1)
+        next_corner = np.roll(ring, -1, axis=1)
+        a = plane_co[faces, prev_corner]
+        b = plane_co[faces, ring]
+        c = plane_co[faces, next_corner]
+        convexity = cross_2d(b - a, c - b)
+
+        # (F, candidate, other corner) the other corners of the ring may not lie inside the candidate ear
+        p = plane_co[faces, ring][:, None]
+        inside = (cross_2d((b - a)[:, :, None], p - a[:, :, None]) >= -eps) & \
+                 (cross_2d((c - b)[:, :, None], p - b[:, :, None]) >= -eps) & \
+                 (cross_2d((a - c)[:, :, None], p - c[:, :, None]) >= -eps)
+        own_corner = (ring[:, None] == prev_corner[:, :, None]) | (ring[:, None] == ring[:, :, None]) | \
+                     (ring[:, None] == next_corner[:, :, None])
+        is_ear = (convexity > eps[:, :, 0]) & ~np.any(inside & ~own_corner, axis=2)
+
+        # without an ear (degenerate faces) the most convex corner is cut
+        chosen = np.where(np.any(is_ear, axis=1), np.argmax(is_ear, axis=1), np.argmax(convexity, axis=1))
+        triangles[:, step] = np.stack((prev_corner[faces[:, 0], chosen], ring[faces[:, 0], chosen],
+                                       next_corner[faces[:, 0], chosen]), axis=1)
+        keep = np.arange(ring.shape[1]) != chosen[:, None]
+        ring = ring[keep].reshape(face_amount, -1)
+
+    triangles[:, -1] = ring
+    return triangles
+
+
+def get_triangles(verts, face_offsets, face_indices):
+    """
+    Triangulates all the faces, the faces are handled per size so there is no loop over the faces.
+    A batch of meshes that share their faces, like the connectors of one ArrayConnector, is triangulated at once:
+    the ears of the first mesh are reused for the others and only the faces where they are not valid are clipped again.
+
+    :param verts: (V, 3) vertex coordinates or (G, V, 3) for a batch of meshes
+    :param face_offsets: (F + 1) start of every face in face_indices
+    :param face_indices: (C) vertex index of every face corner
+    :return: (T, 3) or (G, T, 3) vertex indices of the triangles, the triangles of a face follow each other
+    """
+    batch_verts = verts.reshape(-1, verts.shape[-2], 3)
+    sizes = np.diff(face_offsets)
+    triangle_offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(np.maximum(sizes - 2, 0), out=triangle_offsets[1:])
+    triangles = np.empty((len(batch_verts), triangle_offsets[-1], 3), dtype=np.int64)
+
+    for size in np.unique(sizes[sizes >= 3]).tolist():
+        faces = np.flatnonzero(sizes == size)
+        corners = face_offsets[faces][:, None] + np.arange(size)
+        face_verts = face_indices[corners]
+        if size == 3:
+            triangles[:, triangle_offsets[faces]] = face_verts
+            continue
+        co = batch_verts[:, face_verts]
+        face_triangles = np.repeat(clip_ears(co[0])[None], len(batch_verts), axis=0)
+        invalid = ~has_valid_triangles(co.reshape(-1, size, 3), face_triangles.reshape(-1, size - 2, 3))
+        invalid = invalid.reshape(len(batch_verts), len(faces))
+        invalid[0] = False
+        if np.any(invalid):
+            face_triangles[invalid] = clip_ears(co[invalid])
+        targets = triangle_offsets[faces][:, None] + np.arange(size - 2)
+        triangles[:, targets.reshape(-1)] = np.take_along_axis(
+            face_verts[None, :, None], face_triangles, axis=3).reshape(len(batch_verts), -1, 3)
+
+    return triangles.reshape(verts.shape[:-2] + (-1, 3))
+
+
+def get_obj_face_format(face_offsets):
+    """
+
+    :param face_offsets: (F + 1) start of every face
+    :return: format string for all the faces, like "f %d %d %d\\nf %d %d %d %d\\n"
+    """
+    corner_amount = face_offsets[-1]
+    tokens = np.full(corner_amount, " %d", dtype="<U5")
+    tokens[face_offsets[1:] - 1] = " %d\n"
+    tokens[face_offsets[:-1]] = np.char.add("f", tokens[face_offsets[:-1]])
+    return "".join(tokens.tolist())
+
+
+class MeshWriter:
+    """
+    Writes meshes to a single file as they come in, nothing is kept in memory after a mesh is written.
+    Used as a context manager, the subclasses write the header in open and finish the file in close.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.mesh_amount = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        self.file = open(self.path, "wb")
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def add_mesh(self, verts, face_offsets, face_indices, offset=None):
+        """
+
+        :param verts: (V, 3) vertex coordinates
+        :param face_offsets: (F + 1) start of every face in face_indices
+        :param face_indices: (C) vertex index of every face corner
+        :param offset: (3) translation of the mesh in the file
+        """
+        offsets = None if offset is None else np.asarray(offset, dtype=np.float64)[None]
+        self.add_meshes(verts[None], face_offsets, face_indices, offsets=offsets)
+
+    def add_meshes(self, verts, face_offsets, face_indices, offsets=None):
+        """
+        Adds a batch of meshes that share their faces
+
+        :param verts: (G, V, 3) vertex coordinates of every mesh
+        :param offsets: (G, 3) translation of every mesh in the file
+        """
+        with instrument_helper.stage("export"):
+            if offsets is not None:
+                verts = verts + offsets[:, None]
+            self.write_meshes(verts, face_offsets, face_indices)
+        self.mesh_amount += len(verts)
+        instrument_helper.count("export.meshes", len(verts))
+
+    def write_meshes(self, verts, face_offsets, face_indices):
+        raise NotImplementedError
+
+
+class StlWriter(MeshWriter):
+    """
+    Binary STL, the triangle count in the header is filled in when the file is closed
+    """
+    def __init__(self, path):
+        super().__init__(path)
+        self.triangle_amount = 0
+
+    def open(self):
+        super().open()
+        self.file.write(b"wood_poly connectors".ljust(80, b" "))
+        self.file.write(np.uint32(0).tobytes())
+
+    def close(self):
+        if self.file is not None:
+            self.file.seek(80)
+            self.file.write(np.array(self.triangle_amount, dtype="<u4").tobytes())
+        super().close()
+
+    def write_meshes(self, verts, face_offsets, face_indices):
+        triangles = get_triangles(verts, face_offsets, face_indices)
+        records = np.zeros(triangles.shape[0] * triangles.shape[1], dtype=STL_DTYPE)
+        records["verts"] = verts[np.arange(len(verts))[:, None, None], triangles].reshape(-1, 3, 3)
+        normal = np.cross(records["verts"][:, 1] - records["verts"][:, 0],
+                          records["verts"][:, 2] - records["verts"][:, 0])
+        length = np.linalg.norm(normal, axis=1, keepdims=True)
+        records["normal"] = normal / np.where(length > 0, length, 1)
+        records.tofile(self.file)
+        self.triangle_amount += len(records)
+        instrument_helper.count("export.triangles", len(records))
+
+
+class ObjWriter(MeshWriter):
+    """
+    Every mesh becomes an object in the .obj file, the faces are not triangulated
+    """
+    def __init__(self, path, name="connector"):
+        super().__init__(path)
+        self.name = name
+        self.vert_amount = 0
+
+    def write_meshes(self, verts, face_offsets, face_indices):
+        vert_format = "v %.6f %.6f %.6f\n" * verts.shape[1]
+        face_format = get_obj_face_format(face_offsets)
+        for i, mesh_verts in enumerate(verts):
+            text = "o " + self.name + "_" + str(self.mesh_amount + i) + "\n"
+            text += vert_format % tuple(mesh_verts.reshape(-1).tolist())
+            text += face_format % tuple((face_indices + self.vert_amount + 1).tolist())
+            self.file.write(text.encode())
+            self.vert_amount += len(mesh_verts)
+
+
+class ThreeMfWriter(MeshWriter):
+    """
+    3MF package with every mesh as its own object, the offset of a mesh is stored in its build item.
+    The model is streamed into the zip file, the build items are written when the file is closed.
+    """
+    def __init__(self, path, name="connector"):
+        super().__init__(path)
+        self.name = name
+        self.build_items = []
+        self.zip_file = None
+
+    def open(self):
+        self.zip_file = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED)
+        self.zip_file.writestr("[Content_Types].xml", THREE_MF_TYPES)
+        self.zip_file.writestr("_rels/.rels", THREE_MF_RELS)
+        self.file = self.zip_file.open("3D/3dmodel.model", "w", force_zip64=True)
+        self.file.write(THREE_MF_HEADER.encode())
+
+    def close(self):
+        if self.file is not None:
+            self.file.write(("</resources>\n<build>\n" + "".join(self.build_items) + "</build>\n</model>\n").encode())
+        super().close()
+        if self.zip_file is not None:
+            self.zip_file.close()
+            self.zip_file = None
+
+    def add_meshes(self, verts, face_offsets, face_indices, offsets=None):
+        for i in range(len(verts)):
+            transform = ""
+            if offsets is not None:
+                transform = ' transform="1 0 0 0 1 0 0 0 1 %.6f %.6f %.6f"' % tuple(offsets[i].tolist())
+            self.build_items.append('<item objectid="%d"%s/>\n' % (self.mesh_amount + i + 1, transform))
+        super().add_meshes(verts, face_offsets, face_indices)
+
+    def write_meshes(self, verts, face_offsets, face_indices):
+        triangles = get_triangles(verts, face_offsets, face_indices)
+        vert_format = '<vertex x="%.6f" y="%.6f" z="%.6f"/>\n' * verts.shape[1]
+        triangle_format = '<triangle v1="%d" v2="%d" v3="%d"/>\n' * triangles.shape[1]
+        for i in range(len(verts)):
+            text = '<object id="%d" name="%s_%d" type="model">\n<mesh>\n<vertices>\n' % (
+                self.mesh_amount + i + 1, self.name, self.mesh_amount + i)
+            text += vert_format % tuple(verts[i].reshape(-1).tolist())
+            text += "</vertices>\n<triangles>\n"
+            text += triangle_format % tuple(triangles[i].reshape(-1).tolist())
+            text += "</triangles>\n</mesh>\n</object>\n"
+            self.file.write(text.encode())
+
+
+WRITERS = {
+    ".stl": StlWriter,
+    ".obj": ObjWriter,
+    ".3mf": ThreeMfWriter,
+}
+
+
+def get_writer(path):
+    """
+
+    :param path: output path, the extension picks the format
+    :return: MeshWriter for the path, it still has to be opened
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError("Can't write " + extension + " files, use one of " + ", ".join(WRITERS))
+    return WRITERS[extension](path)
+
+
+def write_mesh(path, verts, face_offsets, face_indices):
+    """
+    Writes a single mesh, the extension of the path picks the format
+    """
+    with get_writer(path) as writer:
+        writer.add_mesh(verts, face_offsets, face_indices)
+
+
+def write_obj(path, verts, face_offsets, face_indices):
+    """
+
+    :param path: path of the .obj file
+    :param verts: (V, 3) vertex coordinates
+    :param face_offsets: (F + 1) start of every face in face_indices
+    :param face_indices: (C) vertex index of every face corner
+    """
+    with ObjWriter(path) as writer:
+        writer.add_mesh(verts, face_offsets, face_indices)
+
+
+def get_result_batches(results):
+    """
+    Collects the results that follow each other and share their face buffers, the results of one
+    chunk of connector_pipeline.generate_connectors do. The batch can be triangulated at once.
+
+    :param results: iterable of ConnectorResult
+    :return: generator of [ConnectorResult, ...]
+    """
+    batch = []
+    for result in results:
+        if len(batch) > 0 and result.face_offsets is not batch[0].face_offsets:
+            yield batch
+            batch = []
+        batch.append(result)
+    if len(batch) > 0:
+        yield batch
+
+
+def get_placed_verts(batch):
+    """
+    Moves the connectors from their local frames back to their vertices on the mesh
+
+    :param batch: [ConnectorResult, ...] with their frames
+    :return: (G, V, 3) vertex coordinates on the mesh
+    """
+    for result in batch:
+        if result.origin is None:
+            raise ValueError("The connector of vertex " + str(result.index) + " has no frame to place it with")
+    origins = np.stack([result.origin for result in batch])
+    axes = np.stack([result.axes for result in batch])
+    # the axes are the rows of the rotation into the frame, so the transposed rotation moves back
+    return np.einsum("gvi,gij->gvj", np.stack([result.verts for result in batch]), axes) + origins[:, None]
+
+
+def write_results(results, path, spacing=None, columns=10, in_place=False):
+    """
+    Streams ConnectorResults from connector_pipeline into one file, every chunk of results is written as soon as
+    it is generated so the memory use doesn't grow with the amount of connectors.
+
+    :param results: iterable of ConnectorResult, for example connector_pipeline.generate_connectors
+    :param path: output path, the extension picks the format
+    :param spacing: distance between the connectors, they are laid out in rows. None keeps them at the origin
+    :param columns: amount of connectors in a row
+    :param in_place: put every connector back at its vertex with its frame instead, spacing is not used
+    :return: amount of written connectors
+    """
+    with get_writer(path) as writer:
+        for batch in get_result_batches(results):
+            if in_place:
+                writer.add_meshes(get_placed_verts(batch), batch[0].face_offsets, batch[0].face_indices)
+                continue
+            verts = np.stack([result.verts for result in batch])
+            offsets = None
+            if spacing is not None:
+                row, column = np.divmod(np.arange(writer.mesh_amount, writer.mesh_amount + len(batch)), columns)
+                offsets = np.stack((column * spacing, row * spacing, np.zeros(len(batch))), axis=1)
+            writer.add_meshes(verts, batch[0].face_offsets, batch[0].face_indices, offsets=offsets)
+        return writer.mesh_amount
+
+
+def write_result_files(results, directory, extension=".stl", prefix="hat_"):
+    """
+    Writes every ConnectorResult to its own file as soon as it is generated
+
+    :param results: iterable of ConnectorResult
+    :param directory: output directory
+    :param extension: file extension that picks the format
+    :param prefix: the files are named prefix + vertex index
+    :return: amount of written files
+    """
+    amount = 0
+    for result in results:
+        path = os.path.join(directory, prefix + str(result.index) + extension)
+        write_mesh(path, result.verts, result.face_offsets, result.face_indices)
+        amount += 1
+    return amount
@@ -0,0 +1,191 @@
+import numpy as np
+from blender_helper import instrument_helper
+
+
+class HalfEdgeMesh:
+    """
+    Half-edge (corner table) topology of a polygon mesh. Every face corner is a half-edge that starts
+    at the corner vertex and runs to the next corner of the same face.
+
+    The faces around every vertex are walked once when the structure is built, this gives the ordered
+    fans that are used to make the edge pairs of the connectors.
+    """
+    def __init__(self, vert_amount, face_offsets, face_indices, corner_edge):
+        """
+
+        :param vert_amount: amount of vertices in the mesh
+        :param face_offsets: (F + 1) start of every face in face_indices
+        :param face_indices: (C) vertex index of every face corner
+        :param corner_edge: (C) edge index of the side that starts at every face corner
+        """
+        self.vert_amount = vert_amount
+        self.corner_vert = np.asarray(face_indices, dtype=np.int64)
+        self.corner_edge = np.asarray(corner_edge, dtype=np.int64)
+
+        face_offsets = np.asarray(face_offsets, dtype=np.int64)
+        self.corner_next = np.arange(1, face_offsets[-1] + 1)
+        self.corner_next[face_offsets[1:] - 1] = face_offsets[:-1]
+        self.corner_prev = np.empty_like(self.corner_next)
+        self.corner_prev[self.corner_next] = np.arange(len(self.corner_next))
+
+        self.corner_twin = get_corner_twin(self)
+        self.fan_offsets, self.fan_corners, self.fan_closed = get_fans(self)
+        self.non_manifold_verts = get_non_manifold_verts(self)
+
+    @classmethod
+    def from_array_mesh(cls, mesh):
+        """
+
+        :param mesh: ArrayConnectionMesh
+        :return: HalfEdgeMesh
+        """
+        return cls(len(mesh.coords), mesh.faces.offsets, mesh.faces.indices, mesh.corner_edge)
+
+    @classmethod
+    def from_bmesh(cls, mesh):
+        """
+        The bmesh loops are the corners, loop.edge runs from loop.vert to the vert of the next loop
+
+        :param mesh: bmesh object
+        :return: HalfEdgeMesh
+        """
+        mesh.verts.index_update()
+        mesh.edges.index_update()
+
+        face_offsets = [0]
+        face_indices = []
+        corner_edge = []
+        for face in mesh.faces:
+            for loop in face.loops:
+                face_indices.append(loop.vert.index)
+                corner_edge.append(loop.edge.index)
+            face_offsets.append(len(face_indices))
+
+        return cls(len(mesh.verts), face_offsets, face_indices, corner_edge)
+
+    def check_manifold(self):
+        """
+        The fans of non-manifold vertices miss faces, so their connectors would miss struts
+
+        :raises ValueError: when the mesh has non-manifold vertices
+        """
+        amount = len(self.non_manifold_verts)
+        if amount == 0:
+            return
+        instrument_helper.count("fans.non_manifold", amount)
+        shown = ", ".join(str(vert) for vert in self.non_manifold_verts[:10].tolist())
+        raise ValueError("The faces around " + str(amount) + " vertices don't make a single fan (vertices " + shown +
+                         (", ..." if amount > 10 else "") + "). They have more than one fan, edges with more than "
+                         "two faces or neighbouring faces that are wound in opposite directions.")
+
+    def get_fan(self, vert):
+        """
+
+        :param vert: vertex index
+        :return: the outgoing corners of the vertex, ordered around the vertex
+        """
+        return self.fan_corners[self.fan_offsets[vert]:self.fan_offsets[vert + 1]]
+
+    def get_fan_pairs(self, vert):
+        """
+        Every face around the vertex gives one pair, the end of pair n is always the start of pair n + 1
+        and for closed fans the end of the last pair is the start of the first pair
+
+        :param vert: vertex index
+        :return: [[e1, e2], [e2, e3], ...] edge indices
+        """
+        fan = self.get_fan(vert)
+        return np.stack((self.corner_edge[fan], self.corner_edge[self.corner_prev[fan]]), axis=1)
+
+    def get_fan_edges(self, vert):
+        """
+
+        :param vert: vertex index
+        :return: the ordered edges around the vertex, for an open fan the last edge is included as well
+        """
+        fan = self.get_fan(vert)
+        edges = self.corner_edge[fan]
+        if not self.fan_closed[vert] and len(fan) > 0:
+            edges = np.append(edges, self.corner_edge[self.corner_prev[fan[-1]]])
+        return edges
+
+
+def get_corner_twin(half_edge):
+    """
+    The twin of a half-edge runs between the same vertices in the other direction,
+    it is found by searching the reversed vertex pair in the sorted vertex pairs
+
+    :param half_edge: HalfEdgeMesh
+    :return: (C) twin corner of every corner, -1 for boundary sides
+    """
+    v_start = half_edge.corner_vert
+    v_end = v_start[half_edge.corner_next]
+    keys = v_start * half_edge.vert_amount + v_end
+    twin_keys = v_end * half_edge.vert_amount + v_start
+
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    position = np.minimum(np.searchsorted(sorted_keys, twin_keys), len(keys) - 1)
+
+    return np.where(sorted_keys[position] == twin_keys, order[position], -1)
+
+
+def get_fans(half_edge):
+    """
+    Walks the corners around every vertex. From an outgoing corner the next face around the vertex is
+    found through the twin of the previous corner. Open fans are started from a corner that has no twin
+    so the walk covers the whole fan, each corner is visited once.
+
+    :param half_edge: HalfEdgeMesh
+    :return: (V + 1) fan offsets, ordered outgoing corners, (V) bool if the fan closes
+    """
+    corner_amount = len(half_edge.corner_vert)
+    vert_offsets = np.zeros(half_edge.vert_amount + 1, dtype=np.int64)
+    np.cumsum(np.bincount(half_edge.corner_vert, minlength=half_edge.vert_amount), out=vert_offsets[1:])
+
+    # A boundary corner is preferred as start, sorting on has_twin puts them first for every vertex
+    order = np.lexsort((half_edge.corner_twin >= 0, half_edge.corner_vert))
+    starts = order[vert_offsets[:-1][np.diff(vert_offsets) > 0]].tolist()
+
+    step = half_edge.corner_twin[half_edge.corner_prev].tolist()
+    corner_vert = half_edge.corner_vert.tolist()
+
+    fan_corners = []
+    fan_sizes = np.zeros(half_edge.vert_amount, dtype=np.int64)
+    fan_closed = np.zeros(half_edge.vert_amount, dtype=bool)
+    for start in starts:
+        vert = corner_vert[start]
+        corner = start
+        size = 0
+        while corner != -1 and size < corner_amount:
+            fan_corners.append(corner)
+            size += 1
+            corner = step[corner]
+            if corner == start:
+                fan_closed[vert] = True
+                break
+        fan_sizes[vert] = size
+
+    fan_offsets = np.zeros(half_edge.vert_amount + 1, dtype=np.int64)
+    np.cumsum(fan_sizes, out=fan_offsets[1:])
+
+    return fan_offsets, np.array(fan_corners, dtype=np.int64), fan_closed
+
+
+def get_non_manifold_verts(half_edge):
+    """
+    Vertices whose faces can't be ordered in one fan. A vertex with more than one fan (a bow tie) has corners
+    that the walk of get_fans doesn't reach. An edge with more than two faces, or with two faces that are
+    wound in opposite directions, has corners without a twin although the edge has other corners.
+
+    :param half_edge: HalfEdgeMesh
+    :return: (n) sorted vertex indices
+    """
+    corner_amounts = np.bincount(half_edge.corner_vert, minlength=half_edge.vert_amount)
+    non_manifold = np.diff(half_edge.fan_offsets) != corner_amounts
+
+    edge_corners = np.bincount(half_edge.corner_edge)[half_edge.corner_edge]
+    bad_corners = np.flatnonzero((edge_corners > 2) | ((half_edge.corner_twin < 0) & (edge_corners > 1)))
+    non_manifold[half_edge.corner_vert[bad_corners]] = True
+    non_manifold[half_edge.corner_vert[half_edge.corner_next[bad_corners]]] = True
+    return np.flatnonzero(non_manifold)
@@ -0,0 +1,211 @@
+import collections
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import time
+
+# The instrumentation of the current process, None when it is off. Everything below checks this first
+# so the timers and counters cost almost nothing when nothing is measured.
+active = None
+NO_STAGE = contextlib.nullcontext()
+
+
+class Instrumentation:
+    """
+    Collects the time spent in every stage, counters, histograms and optionally a cProfile profile
+    and trace events for chrome://tracing
+    """
+    def __init__(self, profile=False, trace=False):
+        self.stages = {}
+        self.counters = {}
+        self.histograms = {}
+        self.events = [] if trace else None
+        self.profiler = cProfile.Profile() if profile else None
+        self.start_time = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            calls, seconds = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (calls + 1, seconds + end - start)
+            if self.events is not None:
+                self.events.append((name, os.getpid(), start, end - start))
+
+    def count(self, name, amount):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name, values):
+        histogram = self.histograms.setdefault(name, {})
+        for value, amount in collections.Counter(values).items():
+            histogram[value] = histogram.get(value, 0) + amount
+
+    def merge(self, data):
+        """
+        Adds the data of another Instrumentation, for example one of a worker process
+
+        :param data: dict from get_data
+        """
+        for name, (calls, seconds) in data["stages"].items():
+            old_calls, old_seconds = self.stages.get(name, (0, 0.0))
+            self.stages[name] = (old_calls + calls, old_seconds + seconds)
+        for name, amount in data["counters"].items():
+            self.count(name, amount)
+        for name, histogram in data["histograms"].items():
+            own_histogram = self.histograms.setdefault(name, {})
+            for value, amount in histogram.items():
+                own_histogram[value] = own_histogram.get(value, 0) + amount
+        if self.events is not None and data["events"] is not None:
+            self.events.extend(data["events"])
+
+    def get_data(self):
+        """
+
+        :return: dict with plain python values that can be pickled and merged
+        """
+        return {"stages": self.stages, "counters": self.counters, "histograms": self.histograms,
+                "events": self.events}
+
+    def get_profile_rows(self, amount=30):
+        """
+
+        :return: [{function, calls, total, cumulative}, ...] the functions with the highest cumulative time
+        """
+        if self.profiler is None:
+            return None
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = []
+        for (file_name, line, function), (primitive_calls, calls, total, cumulative, callers) in stats.stats.items():
+            rows.append({"function": file_name + ":" + str(line) + "(" + function + ")", "calls": calls,
+                         "total": total, "cumulative": cumulative})
+        rows.sort(key=lambda row: row["cumulative"], reverse=True)
+        return rows[:amount]
+
+    def get_summary(self):
+        """
+
+        :return: dict that can be stored as json
+        """
+        return {
+            "wall_time": time.perf_counter() - self.start_time,
+            "stages": {name: {"calls": calls, "seconds": seconds} for name, (calls, seconds) in self.stages.items()},
+            "counters": self.counters,
+            "histograms": {name: {str(value): amount for value, amount in sorted(histogram.items())}
+                           for name, histogram in self.histograms.items()},
+            "profile": self.get_profile_rows(),
+        }
+
+
+def enable(profile=False, trace=False):
+    """
+    Starts measuring in this process, the data of an earlier enable is dropped
+
+    :param profile: also run cProfile
+    :param trace: also keep every stage as an event, see save_trace
+    :return: Instrumentation
+    """
+    global active
+    disable()
+    active = Instrumentation(profile=profile, trace=trace)
+    if active.profiler is not None:
+        active.profiler.enable()
+    return active
+
+
+def disable():
+    """
+
+    :return: the Instrumentation that was active, None if it was off
+    """
+    global active
+    instrumentation = active
+    if instrumentation is not None and instrumentation.profiler is not None:
+        instrumentation.profiler.disable()
+    active = None
+    return instrumentation
+
+
+def is_enabled():
+    return active is not None
+
+
+def stage(name):
+    """
+    with stage("create_hat"): ... adds the time of the block to the stage
+
+    :param name: name of the stage
+    :return: context manager
+    """
+    if active is None:
+        return NO_STAGE
+    return active.stage(name)
+
+
+def timed(name):
+    """
+    Decorator that measures every call of the function as a stage
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if active is None:
+                return function(*args, **kwargs)
+            with active.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name, amount=1):
+    if active is not None:
+        active.count(name, amount)
+
+
+def record(name, values):
+    """
+    Adds the values to a histogram, for example the valence of every vertex
+
+    :param values: iterable of hashable values
+    """
+    if active is not None:
+        active.record(name, values)
+
+
+def save_summary(path, instrumentation=None):
+    """
+
+    :param instrumentation: Instrumentation to save, the active one when None
+    """
+    instrumentation = instrumentation or active
+    with open(path, "w") as json_file:
+        json.dump(instrumentation.get_summary(), json_file, indent=2)
+
+
+def save_trace(path, instrumentation=None):
+    """
+    Writes the stage events in the chrome://tracing (Trace Event) format, every process gets its own row
+
+    :param instrumentation: Instrumentation that was enabled with trace=True, the active one when None
+    """
+    instrumentation = instrumentation or active
+    events = [{"name": name, "ph": "X", "pid": pid, "tid": 0, "ts": start * 1e6, "dur": duration * 1e6}
+              for name, pid, start, duration in instrumentation.events]
+    with open(path, "w") as json_file:
+        json.dump({"traceEvents": events}, json_file)
+
+
+def save_profile(path, instrumentation=None):
+    """
+    Writes the cProfile stats so they can be opened with pstats or snakeviz
+
+    :param instrumentation: Instrumentation that was enabled with profile=True, the active one when None
+    """
+    instrumentation = instrumentation or active
+    instrumentation.profiler.dump_stats(path)
@@ -1,5 +1,5 @@
-import mathutils
-import math
+import numpy as np
+
 
 def get_norm_from_face(face):
     p1 = face.verts[0]
@@ -30,4 +30,57 @@ def point_to_plane_via_dir(point, dir, plane):
     frac_top = -1 * (plane[0] * point[0] + plane[1] * point[1] + plane[2] * point[2] + plane[3])
     frac_bottom = plane[0] * dir[0] + plane[1] * dir[1] + plane[2] * dir[2]
     dist = frac_top / frac_bottom
-    return dist
\ No newline at end of file
+    return dist
+
+
+def get_face_normals(coords, face_verts):
+    """
+    Batch version of get_norm_from_face
+
+    :param coords: (V, 3) vertex coordinates
+    :param face_verts: (N, >= 3) vertex indices of the faces, the first three are used
+    :return: (N, 3) normalized normals
+    """
+    first = coords[face_verts[:, 0]]
+    normals = np.cross(coords[face_verts[:, 1]] - first, coords[face_verts[:, 2]] - first)
+    normals /= np.linalg.norm(normals, axis=1)[:, None]
+    return normals
+
+
+def dist_points_planes(planes, points, out=None):
+    """
+    Batch version of dist_point_plane
+
+    :param planes: (N, 4) or (4) planes as (a, b, c, d)
+    :param points: (N, 3) points
+    :param out: (N) array for the result
+    :return: (N) distance from every point to its plane, in multiples of the plane normal
+    """
+    planes = np.asarray(planes, dtype=np.float64)
+    return points_to_planes_via_dirs(points, planes[..., :3], planes, out)
+
+
+def points_to_planes_via_dirs(points, dirs, planes, out=None):
+    """
+    Batch version of point_to_plane_via_dir, the arguments are broadcast against each other.
+    The dot products are done with einsum and the result is computed in place, so there are no temporary
+    (N, 3) arrays.
+
+    :param points: (..., 3) points
+    :param dirs: (..., 3) directions
+    :param planes: (..., 4) planes as (a, b, c, d)
+    :param out: array in the broadcast shape for the result
+    :return: (...) for every point the multiple of its direction that moves the point onto its plane
+    """
+    points = np.asarray(points, dtype=np.float64)
+    dirs = np.asarray(dirs, dtype=np.float64)
+    planes = np.asarray(planes, dtype=np.float64)
+    if out is None:
+        out = np.empty(np.broadcast_shapes(points.shape[:-1], dirs.shape[:-1], planes.shape[:-1]))
+
+    normals = planes[..., :3]
+    np.einsum("...i,...i->...", points, normals, out=out)
+    out += planes[..., 3]
+    np.negative(out, out=out)
+    out /= np.einsum("...i,...i->...", dirs, normals)
+    return out
@@ -17,7 +17,6 @@ def pretty_string(obj):
     elif type(obj) == dict or type(obj) == defaultdict:
         return dict_string(obj)
     else:
-        print(type(obj))
         return str(obj)
 
 
@@ -69,7 +68,6 @@ def face_print(f):
 
 
 def vector_print(v):
-    print("vector")
     return f'<Vector ({float_string(v[0])}, {float_string(v[1])}, {float_string(v[2])})>'
 
 
@@ -0,0 +1,366 @@
+import os
+import numpy as np
+from blender_helper import instrument_helper
+from blender_helper import weld_helper
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+
+NEWLINE = ord("\n")
+IS_WHITESPACE = np.zeros(256, dtype=bool)
+IS_WHITESPACE[[ord(" "), ord("\t"), ord("\r"), ord("\n")]] = True
+CHUNK_SIZE = 64 * 1024 * 1024
+
+PLY_TYPES = {
+    "char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+    "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+    "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+    "float": "f4", "float32": "f4", "double": "f8", "float64": "f8",
+}
+
+
+def read_mesh(path, weld_tolerance=None):
+    """
+    Reads an OBJ, PLY or binary STL file depending on the extension
+
+    :param path: path to the mesh file
+    :param weld_tolerance: vertices closer than this are welded before the links are built, None welds nothing
+    :return: ArrayConnectionMesh
+    """
+    coords, face_offsets, face_indices = read_buffers(path)
+    if weld_tolerance is not None:
+        coords, face_offsets, face_indices, _ = weld_helper.weld_vertices(coords, face_offsets, face_indices,
+                                                                          tolerance=weld_tolerance)
+    return ArrayConnectionMesh(coords, face_offsets, face_indices)
+
+
+@instrument_helper.timed("read")
+def read_buffers(path):
+    """
+
+    :param path: path to a .obj, .ply or .stl file
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".obj":
+        return read_obj_buffers(path)
+    elif extension == ".ply":
+        return read_ply_buffers(path)
+    elif extension == ".stl":
+        return read_stl_buffers(path)
+    raise ValueError("Unknown mesh format: " + extension)
+
+
+def read_obj(path):
+    """
+
+    :param path: path to the .obj file
+    :return: ArrayConnectionMesh
+    """
+    return ArrayConnectionMesh(*read_obj_buffers(path))
+
+
+def sizes_to_offsets(sizes):
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    return offsets
+
+
+def get_lines(data):
+    """
+
+    :param data: (N) uint8 text that ends with a newline
+    :return: (L) start of every line, (N) line index of every byte
+    """
+    is_newline = data == NEWLINE
+    line_starts = np.concatenate(([0], np.flatnonzero(is_newline)[:-1] + 1))
+    byte_line = np.cumsum(is_newline) - is_newline
+    return line_starts, byte_line
+
+
+def parse_lines(data, first, dtype):
+    """
+    Parses lines that all start with the same keyword, like the "v" or "f" lines of an OBJ file
+
+    :param data: (N) uint8 copy of the lines, every line ends with a newline
+    :param first: length of the keyword that is skipped
+    :return: (M) all the values, (L) amount of values on every line
+    """
+    line_starts, byte_line = get_lines(data)
+    for i in range(first):
+        data[line_starts + i] = ord(" ")
+    token_counts = get_token_counts(data, byte_line, len(line_starts))
+    values = parse_values(data, dtype)
+    if len(values) != token_counts.sum():
+        raise ValueError("Could not parse the values")
+    return values, token_counts
+
+
+def get_token_counts(data, byte_line, line_amount):
+    """
+    Counts the whitespace separated tokens of every line without splitting the text
+
+    :return: (L) amount of tokens on every line
+    """
+    is_space = IS_WHITESPACE[data]
+    token_start = ~is_space
+    token_start[1:] &= is_space[:-1]
+    return np.bincount(byte_line[token_start], minlength=line_amount)
+
+
+def parse_values(data, dtype):
+    """
+    Parses all the whitespace separated numbers in one call
+
+    :param data: (N) uint8 text that only contains numbers and whitespace
+    :return: (M) values
+    """
+    return np.fromstring(data.tobytes(), dtype=dtype, sep=" ")
+
+
+def read_text_chunks(path):
+    """
+    Memory maps a text file and yields chunks that end at a line end
+
+    :return: generator of (N) uint8 arrays
+    """
+    if os.path.getsize(path) == 0:
+        return
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    start = 0
+    while start < len(data):
+        end = min(start + CHUNK_SIZE, len(data))
+        if end < len(data):
+            end = start + int(np.flatnonzero(data[start:end] == NEWLINE)[-1]) + 1
+        chunk = np.array(data[start:end])
+        if chunk[-1] != NEWLINE:
+            chunk = np.append(chunk, np.uint8(NEWLINE))
+        yield chunk
+        start = end
+
+
+def read_obj_buffers(path):
+    """
+    Parses an OBJ file in chunks. Every chunk is split in lines with numpy, the vertex and face lines are
+    selected with masks and all their numbers are parsed at once, there are no python objects per line.
+    Texture and normal indices (v/vt/vn) are dropped, negative indices are resolved.
+
+    :param path: path to the .obj file
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    coord_blocks = []
+    size_blocks = []
+    index_blocks = []
+    vert_amount = 0
+
+    for data in read_text_chunks(path):
+        line_starts, byte_line = get_lines(data)
+        second = IS_WHITESPACE[data[np.minimum(line_starts + 1, len(data) - 1)]]
+        is_vert_line = (data[line_starts] == ord("v")) & second
+        is_face_line = (data[line_starts] == ord("f")) & second
+
+        if np.any(is_vert_line):
+            values, value_counts = parse_lines(data[is_vert_line[byte_line]], 1, np.float64)
+            if value_counts.min() < 3:
+                raise ValueError("Vertex with less than 3 coordinates in " + path)
+            # lines can have extra values like colors, only the first three are used
+            value_starts = sizes_to_offsets(value_counts)[:-1]
+            coord_blocks.append(values[value_starts[:, None] + np.arange(3)])
+
+        if np.any(is_face_line):
+            # everything from a slash up to the end of the corner (v/vt/vn) is removed
+            face_bytes = data[is_face_line[byte_line]]
+            positions = np.arange(len(face_bytes))
+            last_space = np.maximum.accumulate(np.where(IS_WHITESPACE[face_bytes], positions, -1))
+            last_slash = np.maximum.accumulate(np.where(face_bytes == ord("/"), positions, -1))
+            indices, sizes = parse_lines(face_bytes[last_slash <= last_space], 1, np.int64)
+
+            # negative indices count back from the last vertex defined before the face
+            verts_before = vert_amount + np.cumsum(is_vert_line)[is_face_line]
+            indices = np.where(indices > 0, indices - 1, np.repeat(verts_before, sizes) + indices)
+
+            size_blocks.append(sizes)
+            index_blocks.append(indices)
+
+        vert_amount += int(np.count_nonzero(is_vert_line))
+
+    coords = np.concatenate(coord_blocks) if coord_blocks else np.empty((0, 3))
+    sizes = np.concatenate(size_blocks) if size_blocks else np.empty(0, dtype=np.int64)
+    indices = np.concatenate(index_blocks) if index_blocks else np.empty(0, dtype=np.int64)
+    return coords, sizes_to_offsets(sizes), indices
+
+
+def read_ply_header(ply_file):
+    """
+
+    :return: format, [(element name, amount, [(property name, type, list count type or None), ...]), ...]
+    """
+    if ply_file.readline().strip() != b"ply":
+        raise ValueError("Not a PLY file")
+
+    ply_format = None
+    elements = []
+    for line in ply_file:
+        words = line.decode("ascii").split()
+        if len(words) == 0 or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "format":
+            ply_format = words[1]
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property":
+            if words[1] == "list":
+                elements[-1][2].append((words[4], PLY_TYPES[words[3]], PLY_TYPES[words[2]]))
+            else:
+                elements[-1][2].append((words[2], PLY_TYPES[words[1]], None))
+        elif words[0] == "end_header":
+            return ply_format, elements
+
+    raise ValueError("PLY header without end_header")
+
+
+def read_ply_buffers(path):
+    """
+    Reads the vertex and face elements of an ASCII or binary PLY file. Binary vertices are read with a
+    structured dtype straight from a memory map. Binary faces are read in runs of faces with the same amount
+    of corners, so a triangle or quad mesh is read in a single step.
+
+    :param path: path to the .ply file
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    with open(path, "rb") as ply_file:
+        ply_format, elements = read_ply_header(ply_file)
+        header_size = ply_file.tell()
+
+    if ply_format == "ascii":
+        return read_ply_ascii(path, header_size, elements)
+
+    byte_order = "<" if ply_format == "binary_little_endian" else ">"
+    data = np.memmap(path, dtype=np.uint8, mode="r", offset=header_size)
+    coords = None
+    sizes = np.empty(0, dtype=np.int64)
+    indices = np.empty(0, dtype=np.int64)
+    position = 0
+
+    for name, amount, properties in elements:
+        if all(list_type is None for _, _, list_type in properties):
+            dtype = np.dtype([(prop, byte_order + prop_type) for prop, prop_type, _ in properties])
+            values = np.frombuffer(data, dtype=dtype, count=amount, offset=position)
+            position += amount * dtype.itemsize
+            if name == "vertex":
+                coords = np.stack((values["x"], values["y"], values["z"]), axis=1).astype(np.float64)
+        elif name == "face":
+            sizes, indices, position = read_ply_binary_lists(data, position, amount, properties, byte_order, path)
+        else:
+            raise ValueError("Can't skip the list element " + name + " in " + path)
+
+    return coords, sizes_to_offsets(sizes), indices
+
+
+def read_ply_binary_lists(data, position, amount, properties, byte_order, path):
+    """
+    Reads the first list property of a binary element. The element is read in runs: the corner amount of
+    the first face is assumed for the faces after it and checked with one strided view of the counts.
+
+    :param path: path of the file, for the errors
+    :return: (F) sizes, (C) indices, position after the element
+    :raises ValueError: when the file ends before the last face
+    """
+    list_index = [list_type is not None for _, _, list_type in properties].index(True)
+    _, index_type, count_type = properties[list_index]
+    count_type = np.dtype(byte_order + count_type)
+    index_type = np.dtype(byte_order + index_type)
+    before = sum(np.dtype(prop_type).itemsize for _, prop_type, _ in properties[:list_index])
+    after_properties = properties[list_index + 1:]
+    if any(list_type is not None for _, _, list_type in after_properties):
+        raise ValueError("Only one list property per face is supported")
+    after = sum(np.dtype(prop_type).itemsize for _, prop_type, _ in after_properties)
+
+    if amount == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), position
+
+    size_blocks = []
+    index_blocks = []
+    face = 0
+    while face < amount:
+        if position + before + count_type.itemsize > len(data):
+            raise ValueError("Truncated face element in " + path)
+        size = int(np.frombuffer(data, dtype=count_type, count=1, offset=position + before)[0])
+        stride = before + count_type.itemsize + size * index_type.itemsize + after
+        run = min(amount - face, (len(data) - position) // stride)
+        if run == 0:
+            raise ValueError("Truncated face element in " + path)
+
+        counts = np.ndarray((run,), dtype=count_type, buffer=data, offset=position + before, strides=(stride,))
+        different = np.flatnonzero(counts != size)
+        if len(different) > 0:
+            run = int(different[0])
+
+        run_indices = np.ndarray((run, size), dtype=index_type, buffer=data,
+                                 offset=position + before + count_type.itemsize,
+                                 strides=(stride, index_type.itemsize))
+        size_blocks.append(np.full(run, size, dtype=np.int64))
+        index_blocks.append(run_indices.astype(np.int64).reshape(-1))
+        face += run
+        position += run * stride
+
+    return np.concatenate(size_blocks), np.concatenate(index_blocks), position
+
+
+def read_ply_ascii(path, header_size, elements):
+    """
+    The lines of every element are parsed at once, the corner amount of every face comes from the
+    amount of numbers on its line.
+
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    data = np.fromfile(path, dtype=np.uint8, offset=header_size)
+    if len(data) == 0 or data[-1] != NEWLINE:
+        data = np.append(data, np.uint8(NEWLINE))
+    line_starts, byte_line = get_lines(data)
+
+    coords = None
+    sizes = np.empty(0, dtype=np.int64)
+    indices = np.empty(0, dtype=np.int64)
+    line = 0
+    for name, amount, properties in elements:
+        start = line_starts[line]
+        end = line_starts[line + amount] if line + amount < len(line_starts) else len(data)
+        element_bytes = data[start:end]
+
+        if name == "vertex":
+            values = parse_values(element_bytes, np.float64).reshape(amount, -1)
+            names = [prop for prop, _, _ in properties]
+            coords = values[:, [names.index("x"), names.index("y"), names.index("z")]]
+        elif name == "face":
+            if len(properties) != 1:
+                raise ValueError("Only faces with just a vertex list are supported in ASCII PLY")
+            token_counts = get_token_counts(element_bytes, byte_line[start:end] - line, amount)
+            values = parse_values(element_bytes, np.int64)
+            list_starts = sizes_to_offsets(token_counts)[:-1]
+            sizes = values[list_starts]
+            is_index = np.ones(len(values), dtype=bool)
+            is_index[list_starts] = False
+            indices = values[is_index]
+        line += amount
+
+    return coords, sizes_to_offsets(sizes), indices
+
+
+def read_stl_buffers(path):
+    """
+    Reads a binary STL file through a memory map. STL stores every triangle with its own corners,
+    equal corners are merged with one np.unique so the mesh has connectivity.
+
+    :param path: path to the .stl file
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    header = np.fromfile(path, dtype=np.uint8, count=84)
+    amount = int(header[80:84].view("<u4")[0])
+    if 84 + amount * 50 != os.path.getsize(path):
+        raise ValueError("Only binary STL files are supported: " + path)
+
+    stl_dtype = np.dtype([("normal", "<f4", (3,)), ("verts", "<f4", (3, 3)), ("attribute", "<u2")])
+    triangles = np.memmap(path, dtype=stl_dtype, mode="r", offset=84, shape=(amount,))
+
+    corners = triangles["verts"].reshape(-1, 3)
+    coords, indices = np.unique(corners, axis=0, return_inverse=True)
+    return coords.astype(np.float64), np.arange(0, 3 * amount + 1, 3, dtype=np.int64), indices.reshape(-1)
@@ -0,0 +1,165 @@
+import os
+import numpy as np
+from blender_helper import instrument_helper
+
+# files are written through a buffer of this size instead of a write call for every part
+BUFFER_SIZE = 1 << 20
+
+SVG_HEADER = ('<svg xmlns="http://www.w3.org/2000/svg" width="{width:g}mm" height="{height:g}mm" '
+              'viewBox="0 0 {view_width} {view_height}">\n'
+              '<rect width="{view_width}" height="{view_height}" fill="none" stroke="blue" stroke-width="{stroke}"/>\n'
+              '<g fill="none" fill-rule="evenodd" stroke="red" stroke-width="{stroke}">\n')
+SVG_FOOTER = "</g>\n</svg>\n"
+
+DXF_HEADER = "0\nSECTION\n2\nHEADER\n9\n$INSUNITS\n70\n4\n0\nENDSEC\n0\nSECTION\n2\nENTITIES\n"
+DXF_FOOTER = "0\nENDSEC\n0\nEOF\n"
+
+
+class SheetWriter:
+    """
+    Writes the parts of one sheet to a file as they come in, there is no document tree in memory.
+    Used as a context manager like export_helper.MeshWriter.
+    """
+    def __init__(self, path, width, height, precision=3):
+        """
+
+        :param path: output path
+        :param width: width of the sheet in mm
+        :param height: height of the sheet in mm
+        :param precision: decimals of the coordinates
+        """
+        self.path = path
+        self.width = width
+        self.height = height
+        self.precision = precision
+        self.file = None
+        self.part_amount = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self):
+        self.file = open(self.path, "w", buffering=BUFFER_SIZE)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def add_part(self, points, holes=None):
+        """
+
+        :param points: (n, 2) outline of the part on the sheet
+        :param holes: (h, 3) center x, center y and radius of the circular holes in the part
+        """
+        self.write_part(np.asarray(points, dtype=np.float64), None if holes is None or len(holes) == 0 else
+                        np.asarray(holes, dtype=np.float64))
+        self.part_amount += 1
+        instrument_helper.count("sheet_export.parts")
+        if holes is not None:
+            instrument_helper.count("sheet_export.holes", len(holes))
+
+    def write_part(self, points, holes):
+        raise NotImplementedError
+
+
+class SvgWriter(SheetWriter):
+    """
+    Every part is one path with the outline and the holes as sub paths. The view box is scaled so the
+    coordinates are whole numbers, after the first point of a loop only the relative steps are written.
+    """
+    def __init__(self, path, width, height, precision=3):
+        super().__init__(path, width, height, precision)
+        self.scale = 10 ** precision
+        self.view_height = int(round(height * self.scale))
+
+    def open(self):
+        super().open()
+        self.file.write(SVG_HEADER.format(width=self.width, height=self.height,
+                                          view_width=int(round(self.width * self.scale)),
+                                          view_height=self.view_height, stroke=int(0.1 * self.scale) or 1))
+
+    def close(self):
+        if self.file is not None:
+            self.file.write(SVG_FOOTER)
+        super().close()
+
+    def write_part(self, points, holes):
+        # svg has the y axis pointing down
+        quantized = np.rint(points * (self.scale, -self.scale)).astype(np.int64) + (0, self.view_height)
+        steps = np.diff(quantized, axis=0)
+        # points that are closer than the precision would only add zero steps
+        steps = steps[np.any(steps != 0, axis=1)]
+        text = '<path d="M%d %d' % tuple(quantized[0].tolist())
+        if len(steps):
+            text += "l" + ("%d %d " * len(steps)) % tuple(steps.reshape(-1).tolist())
+        text = text.rstrip() + "z"
+
+        if holes is not None:
+            circles = np.rint(holes * (self.scale, -self.scale, self.scale)).astype(np.int64) + (0, self.view_height, 0)
+            radius = circles[:, 2]
+            circles = np.stack((circles[:, 0] - radius, circles[:, 1], radius, radius, 2 * radius,
+                                radius, radius, -2 * radius), axis=1)
+            text += ("M%d %da%d %d 0 1 0 %d 0a%d %d 0 1 0 %d 0z" * len(circles)) % tuple(circles.reshape(-1).tolist())
+        self.file.write(text + '"/>\n')
+
+
+class DxfWriter(SheetWriter):
+    """
+    ASCII DXF with only an entities section, the outlines are closed POLYLINE entities and the holes CIRCLE
+    entities, so it also opens in programs that only read R12
+    """
+    def open(self):
+        super().open()
+        self.file.write(DXF_HEADER)
+
+    def close(self):
+        if self.file is not None:
+            self.file.write(DXF_FOOTER)
+        super().close()
+
+    def write_part(self, points, holes):
+        number = "%." + str(self.precision) + "f"
+        vertex_format = "0\nVERTEX\n8\nCUT\n10\n" + number + "\n20\n" + number + "\n"
+        text = "0\nPOLYLINE\n8\nCUT\n66\n1\n70\n1\n10\n0.0\n20\n0.0\n"
+        text += (vertex_format * len(points)) % tuple(points.reshape(-1).tolist())
+        text += "0\nSEQEND\n8\nCUT\n"
+        if holes is not None:
+            circle_format = "0\nCIRCLE\n8\nHOLES\n10\n" + number + "\n20\n" + number + "\n40\n" + number + "\n"
+            text += (circle_format * len(holes)) % tuple(holes.reshape(-1).tolist())
+        self.file.write(text)
+
+
+WRITERS = {
+    ".svg": SvgWriter,
+    ".dxf": DxfWriter,
+}
+
+
+def get_sheet_writer(path, width, height, precision=3):
+    """
+
+    :param path: output path, the extension picks the format
+    :return: SheetWriter
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError("Unknown sheet format " + extension + ", use one of " + ", ".join(WRITERS))
+    return WRITERS[extension](path, width, height, precision)
+
+
+def write_sheet(path, width, height, parts, precision=3):
+    """
+
+    :param parts: [(outline, holes), ...] outlines and holes on the sheet, holes can be None
+    :return: path
+    """
+    with instrument_helper.stage("sheet_export"):
+        with get_sheet_writer(path, width, height, precision) as writer:
+            for points, holes in parts:
+                writer.add_part(points, holes)
+    return path
@@ -1,11 +1,17 @@
-from blender_helper.print_helper import pretty_print
+import numpy as np
 
-def get_dir_edge(edge, starting_vert=None, normalized=True):
+
+def get_dir_edge(edge, starting_index=None, normalized=True):
+    """
+
+    :param edge: edge with two vertices
+    :param starting_index: index of the vertex of the edge the direction should start at, None keeps the
+                           order of edge.verts
+    :return: direction of the edge
+    """
     first_vert, second_vert = edge.verts
-    if starting_vert is not None:
-        diff = sum(starting_vert.co - first_vert.co)
-        if diff > 1 or diff < -1:
-            first_vert, second_vert = second_vert,  first_vert
+    if starting_index is not None and second_vert.index == starting_index:
+        first_vert, second_vert = second_vert, first_vert
 
     dir_vec = second_vert.co - first_vert.co
     if normalized:
@@ -13,3 +19,25 @@ def get_dir_edge(edge, starting_vert=None, normalized=True):
     else:
         return dir_vec
 
+
+def get_dir_edges(coords, edge_verts, starting_verts=None, normalized=True, out=None):
+    """
+    Batch version of get_dir_edge, the edges are oriented by vertex index like get_dir_edge
+
+    :param coords: (V, 3) vertex coordinates
+    :param edge_verts: (N, 2) vertex indices of the edges
+    :param starting_verts: (N) index of the vertex every direction should start at, None keeps the order of
+                           edge_verts
+    :param out: (N, 3) array for the result
+    :return: (N, 3) direction of every edge
+    """
+    first = edge_verts[:, 0]
+    second = edge_verts[:, 1]
+    if starting_verts is not None:
+        flip = second == starting_verts
+        first, second = np.where(flip, second, first), np.where(flip, first, second)
+
+    out = np.subtract(coords[second], coords[first], out=out)
+    if normalized:
+        out /= np.linalg.norm(out, axis=1)[:, None]
+    return out
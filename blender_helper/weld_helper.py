@@ -0,0 +1,182 @@
+import numpy as np
+from blender_helper import instrument_helper
+
+# odd 64 bit constants for the hash of the grid cells
+HASH_FACTORS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+
+# the neighbour cells that come after a cell, together with the cell itself every pair of cells is visited once
+NEIGHBOUR_OFFSETS = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)
+                              if (x, y, z) > (0, 0, 0)], dtype=np.int64)
+
+
+def get_cell_keys(cells):
+    """
+    64 bit hash of the grid cells, the multiplications wrap around
+
+    :param cells: (n, 3) integer cell coordinates
+    :return: (n) uint64 keys
+    """
+    keys = np.ascontiguousarray(cells).view(np.uint64) @ HASH_FACTORS
+    return keys ^ (keys >> np.uint64(29))
+
+
+def get_group_pairs(first_starts, first_counts, second_starts, second_counts):
+    """
+    All the pairs between the members of two groups, for many groups at once
+
+    :return: (P) index of the first member, (P) index of the second member, in the sorted order
+    """
+    pair_counts = first_counts * second_counts
+    pair_group = np.repeat(np.arange(len(pair_counts)), pair_counts)
+    pair_offsets = np.zeros(len(pair_counts) + 1, dtype=np.int64)
+    np.cumsum(pair_counts, out=pair_offsets[1:])
+    local = np.arange(pair_offsets[-1]) - pair_offsets[pair_group]
+    second_count = second_counts[pair_group]
+    return first_starts[pair_group] + local // second_count, second_starts[pair_group] + local % second_count
+
+
+def get_close_pairs(coords, tolerance):
+    """
+    Pairs of vertices that are closer than the tolerance, enough of them to connect all the vertices that
+    have to be welded together but not every close pair. The vertices are put in a grid of cells that are twice
+    as large as the tolerance, so close vertices are in the same or in a neighbouring cell. The cells are hashed
+    and sorted, so the neighbours of all the cells are found with one searchsorted per direction.
+
+    :param coords: (V, 3) vertex coordinates
+    :param tolerance: largest distance between vertices that are welded
+    :return: (P) first vertex, (P) second vertex of every pair
+    """
+    cell_size = 2 * tolerance
+    cells = np.floor(coords / cell_size).astype(np.int64)
+    keys = get_cell_keys(cells)
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    is_start = np.concatenate(([True], sorted_keys[1:] != sorted_keys[:-1]))
+    starts = np.flatnonzero(is_start)
+    counts = np.diff(np.append(starts, len(keys)))
+    group_keys = sorted_keys[starts]
+    group_cells = cells[order[starts]]
+
+    # the pairs are made in the sorted order, so the coordinates of a pair are close together in memory
+    sorted_coords = coords[order]
+    member_group = np.repeat(np.arange(len(starts)), counts)
+
+    # the members of a cell are paired with its first member, that connects them all when they are all close
+    # to it. Only the cells where that is not the case get all the pairs of their members.
+    difference = sorted_coords - sorted_coords[starts][member_group]
+    far = np.einsum("ij,ij->i", difference, difference) > tolerance * tolerance
+    far_groups = np.unique(member_group[far])
+    first, second = get_group_pairs(starts[far_groups], counts[far_groups], starts[far_groups], counts[far_groups])
+    members = np.flatnonzero(~far & (counts[member_group] > 1))
+    candidates = [(starts[member_group[members]], members), (first[first < second], second[first < second])]
+
+    # a cell only has to look at a neighbour when one of its members is in the half of the cell next to it
+    fraction = sorted_coords / cell_size - cells[order]
+    reaches_low = np.minimum.reduceat(fraction, starts, axis=0) <= 0.5
+    reaches_high = np.maximum.reduceat(fraction, starts, axis=0) >= 0.5
+    for offset in NEIGHBOUR_OFFSETS:
+        needed = np.ones(len(starts), dtype=bool)
+        for axis in np.flatnonzero(offset):
+            needed &= reaches_high[:, axis] if offset[axis] > 0 else reaches_low[:, axis]
+        groups = np.flatnonzero(needed)
+
+        neighbour_cells = group_cells[groups] + offset
+        neighbour_keys = get_cell_keys(neighbour_cells)
+        found = np.minimum(np.searchsorted(group_keys, neighbour_keys), len(group_keys) - 1)
+        # the cells are compared as well, so a hash that two cells share never pairs cells that are far apart
+        has_neighbour = np.flatnonzero((group_keys[found] == neighbour_keys) &
+                                       np.all(group_cells[found] == neighbour_cells, axis=1))
+        if len(has_neighbour):
+            groups, neighbours = groups[has_neighbour], found[has_neighbour]
+            candidates.append(get_group_pairs(starts[groups], counts[groups], starts[neighbours], counts[neighbours]))
+
+    first = np.concatenate([pair[0] for pair in candidates])
+    second = np.concatenate([pair[1] for pair in candidates])
+    difference = sorted_coords[first] - sorted_coords[second]
+    close = (first != second) & (np.einsum("ij,ij->i", difference, difference) <= tolerance * tolerance)
+    return order[first[close]], order[second[close]]
+
+
+def get_weld_map(coords, tolerance):
+    """
+    Vertices that are connected by close pairs become one vertex, the one with the lowest index.
+    The groups are found by spreading the lowest index over the pairs and jumping along the labels.
+
+    :param coords: (V, 3) vertex coordinates
+    :param tolerance: largest distance between vertices that are welded
+    :return: (V) index of the vertex that every vertex is welded to
+    """
+    first, second = get_close_pairs(coords, tolerance)
+    labels = np.arange(len(coords))
+    while len(first):
+        lowest = np.minimum(labels[first], labels[second])
+        previous = labels.copy()
+        np.minimum.at(labels, first, lowest)
+        np.minimum.at(labels, second, lowest)
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, previous):
+            break
+    return labels
+
+
+def remove_degenerate_faces(face_offsets, face_indices):
+    """
+    Removes the corners that are equal to the next corner of their face, the faces that are left with
+    less than three corners or that still use a vertex twice are removed
+
+    :return: (F' + 1) face offsets, (C') face vertex indices, (F') index of every face that is kept
+    """
+    sizes = np.diff(face_offsets)
+    corner_face = np.repeat(np.arange(len(sizes)), sizes)
+    corner_next = np.arange(len(face_indices)) + 1
+    face_ends = face_offsets[1:][sizes > 0] - 1
+    corner_next[face_ends] = face_offsets[:-1][sizes > 0]
+    keep_corner = face_indices != face_indices[corner_next]
+
+    kept_sizes = np.bincount(corner_face[keep_corner], minlength=len(sizes))
+    # a vertex that is used twice in a face after removing the repeated corners gives a bow tie
+    vert_amount = face_indices.max(initial=0) + 1
+    sorted_keys = np.sort(corner_face[keep_corner] * vert_amount + face_indices[keep_corner])
+    repeated = np.unique(sorted_keys[1:][sorted_keys[1:] == sorted_keys[:-1]] // vert_amount)
+    keep_face = kept_sizes >= 3
+    keep_face[repeated] = False
+
+    keep_corner &= keep_face[corner_face]
+    new_offsets = np.zeros(keep_face.sum() + 1, dtype=np.int64)
+    np.cumsum(kept_sizes[keep_face], out=new_offsets[1:])
+    return new_offsets, face_indices[keep_corner], np.flatnonzero(keep_face)
+
+
+@instrument_helper.timed("weld")
+def weld_vertices(coords, face_offsets, face_indices, tolerance=1e-6):
+    """
+    Merge by distance: welds the vertices that are closer than the tolerance, remaps the faces to the welded
+    vertices and removes the faces that became degenerate. Chains of close vertices are welded together,
+    like remove doubles in Blender. The result can go straight into ArrayConnectionMesh.
+
+    :param coords: (V, 3) vertex coordinates
+    :param face_offsets: (F + 1) start of every face in face_indices
+    :param face_indices: (C) vertex index of every face corner
+    :param tolerance: largest distance between vertices that are welded
+    :return: (V', 3) coordinates, (F' + 1) face offsets, (C') face vertex indices, (V) new index of every old vertex
+    """
+    coords = np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 3)
+    face_offsets = np.asarray(face_offsets, dtype=np.int64)
+    face_indices = np.asarray(face_indices, dtype=np.int64)
+    if len(coords) == 0 or tolerance <= 0:
+        return coords, face_offsets, face_indices, np.arange(len(coords))
+
+    face_amount = len(face_offsets) - 1
+    labels = get_weld_map(coords, tolerance)
+    kept = labels == np.arange(len(coords))
+    new_index = np.cumsum(kept) - 1
+    vertex_map = new_index[labels]
+
+    face_offsets, face_indices, kept_faces = remove_degenerate_faces(face_offsets, vertex_map[face_indices])
+    instrument_helper.count("weld.vertices", len(coords) - int(kept.sum()))
+    instrument_helper.count("weld.faces", face_amount - len(kept_faces))
+    return coords[kept], face_offsets, face_indices, vertex_map
@@ -0,0 +1,454 @@
+# Command line entry point that runs without Blender, for example:
+#
+#     python -m wood_poly generate input.obj -o out/
+#
+# Only the standard library is imported at module level, the numeric modules are imported when a command runs
+# so the startup stays fast.
+import argparse
+import json
+import os
+import sys
+
+
+def add_input_arguments(parser):
+    parser.add_argument("input", help="mesh file with the polyhedron (.obj, .ply or binary .stl)")
+    parser.add_argument("--weld", type=float, default=None, metavar="TOLERANCE",
+                        help="weld the vertices that are closer than TOLERANCE, for meshes with split vertices")
+
+
+def read_input(args):
+    """
+    Reads the input mesh of a command, welded when --weld is given
+    """
+    from blender_helper import read_helper
+
+    mesh = read_helper.read_mesh(args.input, weld_tolerance=args.weld)
+    if args.weld is not None:
+        print("Welded the mesh to " + str(len(mesh.verts)) + " vertices and " + str(len(mesh.faces)) + " faces")
+    return mesh
+
+
+def add_parameter_arguments(parser):
+    parser.add_argument("--distance", type=float, default=20, help="distance from the vertex to the rim")
+    parser.add_argument("--thickness", type=float, default=7, help="thickness of the connectors")
+    parser.add_argument("--hole-radius", type=float, default=1.5, help="radius of the bolt holes")
+    parser.add_argument("--nut-radius", type=float, default=3, help="radius of the nut holes")
+    parser.add_argument("--location", type=float, default=5, help="distance from the rim to the holes")
+    parser.add_argument("--bolt-thickness", type=float, default=2.5, help="material left around the bolt head")
+    parser.add_argument("--detail", choices=["outline", "preview", "default", "print"], default="default",
+                        help="resolution of the bolt and nut circles, preview is coarse and print is fine")
+
+
+def add_instrument_arguments(parser):
+    parser.add_argument("--stats", default=None, metavar="PATH",
+                        help="write the stage timings and counters of the run to this json file")
+    parser.add_argument("--profile", default=None, metavar="PATH", help="run cProfile and write the stats to PATH")
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="write the stages as a chrome://tracing json file")
+
+
+def get_parameters(args):
+    import connector_pipeline
+
+    return connector_pipeline.get_detail_parameters(args.detail, {
+        "distance": args.distance,
+        "thickness": args.thickness,
+        "hole_radius": args.hole_radius,
+        "nut_radius": args.nut_radius,
+        "location": args.location,
+        "bolt_thickness": args.bolt_thickness,
+    })
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="wood_poly", description="Generate wooden polyhedron connectors")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="generate a connector for every vertex of a mesh")
+    add_input_arguments(generate)
+    generate.add_argument("-o", "--output", default="out", help="output directory, or the output file with --merge")
+    generate.add_argument("--format", choices=["obj", "stl", "3mf", "npz"], default="obj",
+                          help="format of the written files, npz writes one archive that other commands can read")
+    generate.add_argument("--merge", action="store_true", help="stream all the connectors into one file")
+    generate.add_argument("--spacing", type=float, default=None,
+                          help="lay the merged connectors out in rows with this distance between them")
+    generate.add_argument("--in-place", action="store_true",
+                          help="put the merged connectors back at their vertices, to preview the assembly")
+    generate.add_argument("--processes", type=int, default=None, help="worker processes, 1 disables the pool")
+    generate.add_argument("--dedupe", type=float, default=None, metavar="TOLERANCE",
+                          help="write every connector type once, with the counts in connectors.json")
+    generate.add_argument("--cache", default=None, metavar="DIR",
+                          help="keep the generated connectors in DIR and reuse them in the next runs")
+    generate.add_argument("--cache-size", type=float, default=1024, metavar="MB",
+                          help="size limit of the cache, the least recently used connectors are removed")
+    generate.add_argument("--budget", type=int, default=None, metavar="TRIANGLES",
+                          help="make the circles of the holes coarser until all the connectors have at most "
+                               "this many triangles")
+    add_parameter_arguments(generate)
+    add_instrument_arguments(generate)
+
+    benchmark = commands.add_parser("benchmark", help="time the pipeline stages on generated meshes")
+    benchmark.add_argument("--case", action="append", default=None, metavar="NAME:SIZE",
+                           help="generated mesh like icosphere:8, dome:4, prism:6 or hub:16, can be repeated")
+    benchmark.add_argument("--quick", action="store_true", help="only run a few small cases")
+    benchmark.add_argument("--repeat", type=int, default=3, help="timed runs per case, the fastest is kept")
+    benchmark.add_argument("--chunk-size", type=int, default=256, help="connectors that are built in one batch")
+    benchmark.add_argument("--no-memory", action="store_true", help="skip the peak memory run")
+    benchmark.add_argument("--save", default=None, metavar="PATH", help="store the results as json baseline")
+    benchmark.add_argument("--compare", default=None, metavar="PATH", help="baseline json to compare with")
+    benchmark.add_argument("--threshold", type=float, default=1.25,
+                           help="allowed slowdown compared to the baseline before it counts as a regression")
+    add_parameter_arguments(benchmark)
+
+    pack = commands.add_parser("pack", help="nest the flattened faces or connectors on sheets for cutting")
+    add_input_arguments(pack)
+    pack.add_argument("-o", "--output", default="sheets", help="output directory for the sheet files")
+    pack.add_argument("--format", choices=["svg", "dxf"], default="svg", help="format of the sheet files")
+    pack.add_argument("--parts", choices=["faces", "connectors", "all"], default="faces",
+                      help="the flattened faces of the mesh, the connector outlines or both")
+    pack.add_argument("--connectors", default=None, metavar="ARCHIVE",
+                      help="read the connectors from an archive of generate --format npz instead of generating them")
+    pack.add_argument("--sheet", default="1200x600", metavar="WIDTHxHEIGHT", help="size of the sheets")
+    pack.add_argument("--margin", type=float, default=5, help="free border of the sheets")
+    pack.add_argument("--gap", type=float, default=2, help="free space between the parts, for the kerf")
+    pack.add_argument("--resolution", type=float, default=None,
+                      help="column width of the skyline, by default 1/500 of the sheet width")
+    pack.add_argument("--heuristic", choices=["skyline", "boxes"], default="skyline",
+                      help="nest the outlines or only their bounding boxes")
+    pack.add_argument("--no-rotate", action="store_true", help="keep the orientation of the parts")
+    pack.add_argument("--processes", type=int, default=None,
+                      help="worker processes for the connectors and the sheet files, 1 disables the pool")
+    pack.add_argument("--report", default=None, metavar="PATH", help="write the sheet utilization to a json file")
+    add_parameter_arguments(pack)
+    add_instrument_arguments(pack)
+
+    struts = commands.add_parser("struts", help="write the cut list of the struts between the connectors")
+    add_input_arguments(struts)
+    struts.add_argument("-o", "--output", default="struts.csv", help="cut list file, .csv or .json with the edges")
+    struts.add_argument("--distance", type=float, default=20, help="distance from the vertex to the connector rim")
+    struts.add_argument("--length-tolerance", type=float, default=0.5,
+                        help="struts with lengths that differ less than this are one type")
+    struts.add_argument("--angle-tolerance", type=float, default=0.5,
+                        help="struts with end angles that differ less than this (degrees) are one type")
+    add_instrument_arguments(struts)
+
+    check = commands.add_parser("check", help="test the connectors and struts for collisions and thin walls, "
+                                              "the exit code is 1 when something is found")
+    add_input_arguments(check)
+    check.add_argument("--wall", type=float, default=1.0,
+                       help="thinnest material that is allowed between a hole and the border of its face")
+    check.add_argument("--strut-width", type=float, default=10, help="width of the struts")
+    check.add_argument("--strut-height", type=float, default=10, help="height of the struts")
+    check.add_argument("--no-struts", action="store_true", help="only test the connectors")
+    check.add_argument("--report", default=None, metavar="PATH", help="write everything that was found to a json file")
+    add_parameter_arguments(check)
+    add_instrument_arguments(check)
+
+    sweep = commands.add_parser("sweep", help="evaluate a grid of parameter sets on one mesh and write their metrics, "
+                                              "the topology of the mesh is only computed once")
+    add_input_arguments(sweep)
+    sweep.add_argument("--set", action="append", required=True, dest="values", metavar="NAME=V1,V2,...",
+                       help="values of a parameter to sweep, for example --set thickness=5,7,9. Can be repeated, "
+                            "every combination is evaluated")
+    sweep.add_argument("-o", "--output", default="sweep.csv", help="metrics file, .csv or .json")
+    sweep.add_argument("--wall", type=float, default=1.0,
+                       help="holes with less material than this to the border of their face are hole breakouts")
+    sweep.add_argument("--dedupe", type=float, default=None, metavar="TOLERANCE",
+                       help="only build one connector of every type, the metrics count it for the whole type")
+    sweep.add_argument("--processes", type=int, default=None, help="worker processes, 1 disables the pool")
+    sweep.add_argument("--export", default=None, metavar="DIR",
+                       help="also write the connectors of every parameter set to DIR/variant_<n>.stl")
+    add_parameter_arguments(sweep)
+    add_instrument_arguments(sweep)
+
+    return parser
+
+
+def get_sweep_values(parser, args):
+    """
+
+    :return: {parameter name: [value, ...], ...} from the --set arguments
+    """
+    import connector_pipeline
+
+    values = {}
+    for argument in args.values:
+        name, _, text = argument.partition("=")
+        name = name.strip().replace("-", "_")
+        if name not in connector_pipeline.DEFAULT_PARAMETERS:
+            parser.error("unknown parameter " + name + " in --set, choose from " +
+                         ", ".join(connector_pipeline.DEFAULT_PARAMETERS))
+        try:
+            # the circle resolutions are amounts of vertices
+            value_type = int if name.endswith("_vertices") else float
+            values[name] = [value_type(value) for value in text.split(",")]
+        except ValueError:
+            parser.error("--set " + argument + " needs NAME=V1,V2,... with numbers as values")
+        if name.endswith("_vertices") and any(value % 2 or value < 4 for value in values[name]):
+            parser.error("--set " + argument + " needs even circle resolutions of at least 4")
+    return values
+
+
+def run_generate(args):
+    import connector_pipeline
+
+    mesh = read_input(args)
+    jobs = connector_pipeline.get_connector_jobs(mesh)
+    parameters = get_parameters(args)
+    if args.budget is not None:
+        parameters = connector_pipeline.fit_triangle_budget(jobs, args.budget, parameters)
+        triangle_amount = connector_pipeline.get_triangle_amount(jobs, parameters["bolt_vertices"],
+                                                                 parameters["nut_vertices"])
+        print("Bolt circles with " + str(parameters["bolt_vertices"]) + " and nut circles with " +
+              str(parameters["nut_vertices"]) + " vertices give " + str(triangle_amount) + " triangles")
+        if triangle_amount > args.budget:
+            print("The connectors have more triangles than the budget even with the coarsest circles")
+    extension = "." + args.format
+    cache = None
+    if args.cache is not None:
+        import connector_cache
+        cache = connector_cache.ConnectorCache(args.cache, max_bytes=int(args.cache_size * 2 ** 20))
+    try:
+        write_connectors(args, jobs, parameters, extension, cache)
+    finally:
+        if cache is not None:
+            print("Cache: " + str(cache.hits) + " hits, " + str(cache.misses) + " misses")
+
+
+def write_connectors(args, jobs, parameters, extension, cache):
+    import connector_pipeline
+    from blender_helper import export_helper
+
+    if extension == ".npz":
+        write_archive(args, jobs, parameters, cache)
+        return
+
+    if args.merge:
+        path = args.output
+        if os.path.splitext(path)[1].lower() != extension:
+            path = os.path.join(path, "connectors" + extension)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        results = connector_pipeline.generate_connectors(jobs, parameters, processes=args.processes, cache=cache)
+        amount = export_helper.write_results(results, path, spacing=args.spacing, in_place=args.in_place)
+        print("Wrote " + str(amount) + " connectors to " + path)
+        return
+
+    os.makedirs(args.output, exist_ok=True)
+    if args.dedupe is None:
+        results = connector_pipeline.generate_connectors(jobs, parameters, processes=args.processes, cache=cache)
+        amount = export_helper.write_result_files(results, args.output, extension)
+        print("Wrote " + str(amount) + " connectors to " + args.output)
+        return
+
+    groups = connector_pipeline.group_jobs(jobs, tolerance=args.dedupe)
+    summary = []
+    for type_index, (group, result) in enumerate(
+            connector_pipeline.generate_connector_groups(groups, parameters, processes=args.processes, cache=cache)):
+        name = "connector_" + str(type_index)
+        export_helper.write_mesh(os.path.join(args.output, name + extension), result.verts, result.face_offsets,
+                                 result.face_indices)
+        summary.append({"name": name, "count": group.get_count(), "vertices": group.get_indices()})
+
+    with open(os.path.join(args.output, "connectors.json"), "w") as json_file:
+        json.dump(summary, json_file, indent=2)
+    print("Wrote " + str(len(groups)) + " connector types for " + str(len(jobs)) + " vertices to " + args.output)
+
+
+def write_archive(args, jobs, parameters, cache):
+    import connector_archive
+    import connector_pipeline
+
+    path = args.output
+    if os.path.splitext(path)[1].lower() != ".npz":
+        path = os.path.join(path, "connectors.npz")
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if args.dedupe is None:
+        results = connector_pipeline.generate_connectors(jobs, parameters, processes=args.processes, cache=cache)
+    else:
+        groups = connector_pipeline.group_jobs(jobs, tolerance=args.dedupe)
+        results = connector_pipeline.generate_connector_groups(groups, parameters, processes=args.processes,
+                                                               cache=cache)
+    amount = connector_archive.write_archive(path, results, parameters)
+    print("Wrote " + str(amount) + " connectors to " + path)
+
+
+def run_pack(args):
+    import connector_pipeline
+    import create_svg_functions
+
+    mesh = read_input(args)
+    outlines = []
+    holes = []
+    if args.parts in ("faces", "all"):
+        outlines += create_svg_functions.get_face_outlines(mesh)
+        holes += [None] * (len(outlines) - len(holes))
+    if args.parts in ("connectors", "all") and args.connectors is not None:
+        import connector_archive
+
+        archive = connector_archive.ConnectorArchive(args.connectors)
+        results = list(archive.get_results())
+        outlines += create_svg_functions.get_connector_outlines(results)
+        holes += create_svg_functions.get_connector_holes(results, archive.parameters["hole_radius"],
+                                                          archive.parameters["bolt_vertices"],
+                                                          archive.parameters["nut_vertices"])
+    elif args.parts in ("connectors", "all"):
+        jobs = connector_pipeline.get_connector_jobs(mesh)
+        # the sheets draw the holes as circles, so the connectors are only needed for their outlines and hole centers
+        parameters = connector_pipeline.get_detail_parameters("outline", get_parameters(args))
+        results = list(connector_pipeline.generate_connectors(jobs, parameters, processes=args.processes))
+        outlines += create_svg_functions.get_connector_outlines(results)
+        holes += create_svg_functions.get_connector_holes(results, args.hole_radius, parameters["bolt_vertices"],
+                                                          parameters["nut_vertices"])
+
+    width, height = (float(size) for size in args.sheet.lower().split("x"))
+    packing = create_svg_functions.pack_tris(outlines, width, height, margin=args.margin, spacing=args.gap,
+                                             resolution=args.resolution, heuristic=args.heuristic,
+                                             rotate=not args.no_rotate)
+    os.makedirs(args.output, exist_ok=True)
+    create_svg_functions.write_sheets(args.output, packing, "." + args.format, holes=holes, processes=args.processes)
+
+    report = packing.get_report()
+    print("Packed " + str(len(outlines) - len(packing.unplaced)) + " parts on " + str(report["sheets"]) +
+          " sheets, utilization " + str(round(report["utilization"] * 100, 1)) + "%")
+    if packing.unplaced:
+        print(str(len(packing.unplaced)) + " parts are larger than a sheet")
+    if args.report is not None:
+        with open(args.report, "w") as json_file:
+            json.dump(report, json_file, indent=2)
+
+
+def run_struts(args):
+    import strut_cut_list
+
+    mesh = read_input(args)
+    struts = strut_cut_list.get_struts(mesh, distance=args.distance)
+    strut_types = strut_cut_list.group_struts(struts, length_tolerance=args.length_tolerance,
+                                              angle_tolerance=args.angle_tolerance)
+    strut_cut_list.write_cut_list(args.output, strut_types)
+
+    print("Wrote " + str(len(strut_types)) + " strut types for " + str(len(struts)) + " edges to " + args.output)
+    too_short = int((struts.length <= 0).sum())
+    if too_short:
+        print(str(too_short) + " edges are shorter than two times the distance, their struts have no length")
+
+
+def run_check(args):
+    import interference_check
+
+    mesh = read_input(args)
+    strut_size = None if args.no_struts else (args.strut_width, args.strut_height)
+    report = interference_check.check_interference(mesh, get_parameters(args), wall=args.wall, strut_size=strut_size)
+    if args.report is not None:
+        with open(args.report, "w") as json_file:
+            json.dump(report.get_summary(), json_file, indent=2)
+
+    for vert, amount in report.self_intersections:
+        print("Connector " + str(vert) + " intersects itself in " + str(amount) + " triangle pairs")
+    for kind1, index1, kind2, index2 in report.interferences:
+        print("The " + kind1 + " " + str(index1) + " and the " + kind2 + " " + str(index2) + " intersect")
+    for vert, pair, hole, wall in report.hole_breakouts:
+        print("The " + hole + " hole of pair " + str(pair) + " of connector " + str(vert) + " has a wall of " +
+              str(round(wall, 3)))
+    print("Tested " + str(report.tested_pairs) + " triangle pairs of " + str(report.triangle_amount) + " triangles, " +
+          ("no problems found" if report.is_ok() else "found " + str(len(report.self_intersections)) +
+           " self intersections, " + str(len(report.interferences)) + " interferences and " +
+           str(len(report.hole_breakouts)) + " hole breakouts"))
+    return 0 if report.is_ok() else 1
+
+
+def run_sweep(args):
+    import connector_pipeline
+    import parameter_sweep
+    from blender_helper import export_helper
+
+    mesh = read_input(args)
+    sweep = parameter_sweep.Sweep(mesh, dedupe=args.dedupe)
+    parameter_sets = parameter_sweep.get_parameter_grid(args.sweep_values, get_parameters(args))
+    results = parameter_sweep.run_sweep(sweep, parameter_sets, processes=args.processes, wall=args.wall)
+    parameter_sweep.write_sweep(args.output, args.sweep_values,
+                                parameter_sweep.get_rows(args.sweep_values, parameter_sets, results))
+    print("Evaluated " + str(len(parameter_sets)) + " parameter sets on " + str(sweep.get_connector_amount()) +
+          " connectors (" + str(sweep.type_amount) + " built per set), metrics written to " + args.output)
+
+    if args.export is not None:
+        os.makedirs(args.export, exist_ok=True)
+        for number, parameters in enumerate(parameter_sets):
+            results = connector_pipeline.generate_connectors(sweep.jobs, parameters, processes=args.processes)
+            export_helper.write_results(results, os.path.join(args.export, "variant_" + str(number) + ".stl"))
+        print("Wrote the connectors of every parameter set to " + args.export)
+
+
+def run_benchmark(args):
+    import benchmark
+
+    if args.case is not None:
+        cases = []
+        for case in args.case:
+            name, size = case.split(":")
+            cases.append((name, int(size)))
+    elif args.quick:
+        cases = benchmark.QUICK_CASES
+    else:
+        cases = benchmark.DEFAULT_CASES
+
+    results = benchmark.run_benchmarks(cases, parameters=get_parameters(args), chunk_size=args.chunk_size,
+                                       repeat=args.repeat, memory=not args.no_memory)
+    if args.save is not None:
+        benchmark.save_results(args.save, results)
+
+    if args.compare is not None:
+        regressions = benchmark.compare_results(results, benchmark.load_results(args.compare), args.threshold)
+        for regression in regressions:
+            print("Regression " + regression)
+        if len(regressions) > 0:
+            return 1
+        print("No regressions compared to " + args.compare)
+    return 0
+
+
+def run_instrumented(command, args):
+    """
+    Runs the command with the instrumentation on when one of its outputs is asked for
+    """
+    if args.stats is None and args.profile is None and args.trace is None:
+        return command(args)
+
+    from blender_helper import instrument_helper
+
+    instrument_helper.enable(profile=args.profile is not None, trace=args.trace is not None)
+    try:
+        return command(args)
+    finally:
+        instrumentation = instrument_helper.disable()
+        if args.stats is not None:
+            instrument_helper.save_summary(args.stats, instrumentation)
+        if args.profile is not None:
+            instrument_helper.save_profile(args.profile, instrumentation)
+        if args.trace is not None:
+            instrument_helper.save_trace(args.trace, instrumentation)
+
+
+def main(argv=None):
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    if args.command == "generate" and args.merge and args.dedupe is not None:
+        parser.error("--merge writes every connector, it can't be combined with --dedupe")
+    if args.command == "generate" and args.in_place and (not args.merge or args.spacing is not None):
+        parser.error("--in-place needs --merge and can't be combined with --spacing")
+    if args.command == "generate":
+        run_instrumented(run_generate, args)
+    elif args.command == "benchmark":
+        return run_benchmark(args)
+    elif args.command == "pack":
+        run_instrumented(run_pack, args)
+    elif args.command == "struts":
+        run_instrumented(run_struts, args)
+    elif args.command == "check":
+        return run_instrumented(run_check, args)
+    elif args.command == "sweep":
+        args.sweep_values = get_sweep_values(parser, args)
+        run_instrumented(run_sweep, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+import hashlib
+import json
+import zipfile
+import numpy as np
+import connector_pipeline
+from blender_helper import instrument_helper
+
+# Changes to the arrays of the archive have to change this, older readers refuse newer archives
+ARCHIVE_VERSION = 2
+
+
+def get_signature_hash(signature):
+    """
+
+    :param signature: signature of connector_pipeline.get_fan_signatures, None for connectors that were not grouped
+    :return: 64 bit hash that is the same in every run, 0 for None
+    """
+    if signature is None:
+        return 0
+    return int.from_bytes(hashlib.blake2b(repr(signature).encode(), digest_size=8).digest(), "little")
+
+
+def concatenate_blocks(blocks, dtype, shape=()):
+    if len(blocks) == 0:
+        return np.empty((0,) + shape, dtype=dtype)
+    return np.concatenate(blocks).astype(dtype, copy=False)
+
+
+def get_block_offsets(blocks):
+    offsets = np.zeros(len(blocks) + 1, dtype=np.int64)
+    np.cumsum([len(block) for block in blocks], out=offsets[1:])
+    return offsets
+
+
+class ArchiveWriter:
+    """
+    Collects generated connectors and writes them as one uncompressed .npz file, see ConnectorArchive.
+    A connector type (a dedupe group, or a single connector) stores its vertices once and the face layouts
+    that connectors of one shape bucket share are stored once, the connectors only point to their type.
+    Every connector has its local frame, the connectors of a group get frames in which the shared vertices fit
+    their own vertex. Only results that come without a frame get NaN.
+    """
+    def __init__(self, path, parameters=None):
+        """
+
+        :param path: path of the .npz file
+        :param parameters: dict with the parameters the connectors were generated with
+        """
+        self.path = path
+        self.parameters = connector_pipeline.get_parameters(parameters)
+        self.vert_blocks = []
+        self.type_layouts = []
+        self.type_signatures = []
+        self.layout_dict = {}
+        self.layout_offsets = []
+        self.layout_indices = []
+        self.connector_vertex = []
+        self.connector_type = []
+        self.frame_origins = []
+        self.frame_axes = []
+        self.last_layout = (None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+
+    def __len__(self):
+        return len(self.connector_vertex)
+
+    def get_layout(self, face_offsets, face_indices):
+        """
+
+        :return: index of the face layout, the layouts are compared by their content
+        """
+        if face_offsets is self.last_layout[0]:
+            return self.last_layout[1]
+        key = (face_offsets.tobytes(), face_indices.tobytes())
+        if key not in self.layout_dict:
+            self.layout_dict[key] = len(self.layout_offsets)
+            self.layout_offsets.append(np.asarray(face_offsets, dtype=np.int64))
+            self.layout_indices.append(np.asarray(face_indices, dtype=np.int64))
+        self.last_layout = (face_offsets, self.layout_dict[key])
+        return self.last_layout[1]
+
+    def add_type(self, result, vertex_indices, signature=None, origins=None, axes=None):
+        """
+
+        :param result: ConnectorResult of the type
+        :param vertex_indices: [vertex index, ...] of all the connectors of the type
+        :param signature: fan signature of the type, None when the connectors were not grouped
+        :param origins: (k, 3) origins of the frames of all the connectors, None when they are not known
+        :param axes: (k, 3, 3) axes of the frames of all the connectors
+        """
+        type_index = len(self.vert_blocks)
+        self.vert_blocks.append(np.asarray(result.verts, dtype=np.float64))
+        self.type_layouts.append(self.get_layout(result.face_offsets, result.face_indices))
+        self.type_signatures.append(get_signature_hash(signature))
+        self.connector_vertex.extend(vertex_indices)
+        self.connector_type.extend([type_index] * len(vertex_indices))
+
+        if origins is None:
+            origins = np.full((len(vertex_indices), 3), np.nan)
+            axes = np.full((len(vertex_indices), 3, 3), np.nan)
+        self.frame_origins.append(np.asarray(origins, dtype=np.float64).reshape(-1, 3))
+        self.frame_axes.append(np.asarray(axes, dtype=np.float64).reshape(-1, 3, 3))
+
+    def add_result(self, result):
+        if result.origin is None:
+            self.add_type(result, [result.index])
+        else:
+            self.add_type(result, [result.index], origins=[result.origin], axes=[result.axes])
+
+    def add_group(self, group, result):
+        """
+        The frames of the other jobs of the group are computed from their own fans, see
+        connector_pipeline.get_group_frames
+
+        :param group: ConnectorGroup, all its jobs share the result
+        """
+        if group.get_count() == 1 and result.origin is not None:
+            origins, axes = [result.origin], [result.axes]
+        else:
+            origins, axes = connector_pipeline.get_group_frames(group, self.parameters)
+        self.add_type(result, group.get_indices(), group.signature, origins, axes)
+
+    def close(self):
+        with instrument_helper.stage("archive_write"):
+            np.savez(self.path,
+                     version=np.array(ARCHIVE_VERSION),
+                     parameters=np.array(json.dumps(self.parameters, sort_keys=True)),
+                     verts=concatenate_blocks(self.vert_blocks, np.float64, (3,)),
+                     type_vert_offsets=get_block_offsets(self.vert_blocks),
+                     type_layout=np.array(self.type_layouts, dtype=np.int64),
+                     type_signature=np.array(self.type_signatures, dtype=np.uint64),
+                     face_offsets=concatenate_blocks(self.layout_offsets, np.int64),
+                     layout_offset_starts=get_block_offsets(self.layout_offsets),
+                     face_indices=concatenate_blocks(self.layout_indices, np.int64),
+                     layout_index_starts=get_block_offsets(self.layout_indices),
+                     connector_vertex=np.array(self.connector_vertex, dtype=np.int64),
+                     connector_type=np.array(self.connector_type, dtype=np.int64),
+                     frame_origin=concatenate_blocks(self.frame_origins, np.float64, (3,)),
+                     frame_axes=concatenate_blocks(self.frame_axes, np.float64, (3, 3)))
+        instrument_helper.count("archive.connectors", len(self.connector_vertex))
+
+
+def write_archive(path, results, parameters=None):
+    """
+
+    :param results: iterable of ConnectorResult, or of (ConnectorGroup, ConnectorResult) for grouped connectors
+    :return: amount of connectors in the archive
+    """
+    with ArchiveWriter(path, parameters) as writer:
+        for item in results:
+            if isinstance(item, tuple):
+                writer.add_group(*item)
+            else:
+                writer.add_result(item)
+        return len(writer)
+
+
+def open_members(path):
+    """
+    Memory maps the arrays of an uncompressed .npz file. The data of every member starts after its local zip header
+    and its .npy header, so a np.memmap at that offset reads it without loading or copying anything.
+
+    :return: {name: array}
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as zip_file, open(path, "rb") as npz_file:
+        for info in zip_file.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError("Compressed archives can't be memory mapped: " + path)
+            # the local header has a fixed part of 30 bytes followed by the name and the extra field
+            npz_file.seek(info.header_offset + 26)
+            name_length, extra_length = np.frombuffer(npz_file.read(4), dtype="<u2")
+            npz_file.seek(info.header_offset + 30 + int(name_length) + int(extra_length))
+            if np.lib.format.read_magic(npz_file) == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(npz_file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(npz_file)
+            name = info.filename[:-len(".npy")]
+            if dtype.hasobject:
+                raise ValueError("The archive has an object array " + name + ": " + path)
+            # single values like the version are read, memory maps need at least one axis with values
+            if len(shape) == 0:
+                arrays[name] = np.fromfile(npz_file, dtype=dtype, count=1).reshape(())
+            elif int(np.prod(shape)) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(path, dtype=dtype, mode="r", offset=npz_file.tell(), shape=shape,
+                                         order="F" if fortran_order else "C")
+    return arrays
+
+
+class ConnectorArchive:
+    """
+    Connectors written by ArchiveWriter. Opening it only reads the headers, every array is a memory map,
+    so reading a few connectors of a large archive only touches their part of the file. The results are views
+    into the maps and the connectors of one face layout share the same face arrays, like the results of
+    connector_pipeline.generate_connectors. It can be read with np.load as well.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.arrays = open_members(path)
+        version = int(self.arrays["version"])
+        if version > ARCHIVE_VERSION:
+            raise ValueError("The archive has version " + str(version) + ", this reader knows up to " +
+                             str(ARCHIVE_VERSION) + ": " + path)
+        self.parameters = json.loads(str(self.arrays["parameters"][()]))
+        self.connector_vertex = self.arrays["connector_vertex"]
+        self.connector_type = self.arrays["connector_type"]
+        self.layouts = {}
+
+    def __len__(self):
+        return len(self.connector_vertex)
+
+    def get_type_amount(self):
+        return len(self.arrays["type_layout"])
+
+    def get_layout(self, layout):
+        """
+
+        :return: (F + 1) face offsets, (C) face vertex indices, the same arrays for every call
+        """
+        if layout not in self.layouts:
+            offset_starts = self.arrays["layout_offset_starts"]
+            index_starts = self.arrays["layout_index_starts"]
+            self.layouts[layout] = (self.arrays["face_offsets"][offset_starts[layout]:offset_starts[layout + 1]],
+                                    self.arrays["face_indices"][index_starts[layout]:index_starts[layout + 1]])
+        return self.layouts[layout]
+
+    def get_frame(self, index):
+        """
+
+        :param index: position of the connector in the archive
+        :return: (3) origin, (3, 3) axes of the local frame, None, None when it is not known
+        """
+        # archives of version 1 have no frames, NaN marks results that were written without one
+        if "frame_origin" not in self.arrays or np.isnan(self.arrays["frame_origin"][index, 0]):
+            return None, None
+        return self.arrays["frame_origin"][index], self.arrays["frame_axes"][index]
+
+    def get_type_result(self, type_index, vertex_index):
+        vert_offsets = self.arrays["type_vert_offsets"]
+        verts = self.arrays["verts"][vert_offsets[type_index]:vert_offsets[type_index + 1]]
+        face_offsets, face_indices = self.get_layout(int(self.arrays["type_layout"][type_index]))
+        return connector_pipeline.ConnectorResult(vertex_index, verts, face_offsets, face_indices)
+
+    def get_result(self, index):
+        """
+
+        :param index: position of the connector in the archive
+        :return: ConnectorResult
+        """
+        result = self.get_type_result(int(self.connector_type[index]), int(self.connector_vertex[index]))
+        result.origin, result.axes = self.get_frame(index)
+        return result
+
+    def get_results(self, indices=None):
+        """
+
+        :param indices: positions of the connectors to read, None reads all of them
+        :return: generator of ConnectorResult
+        """
+        if indices is None:
+            indices = range(len(self))
+        for index in indices:
+            yield self.get_result(index)
+
+    def get_signatures(self):
+        """
+
+        :return: (N) 64 bit hash of the fan signature of every connector, 0 when they were not grouped
+        """
+        return self.arrays["type_signature"][self.connector_type]
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import numbers
+import os
+import struct
+import numpy as np
+import connector_pipeline
+from blender_helper import instrument_helper
+
+# Changes to the connector geometry have to change this, otherwise old records would be used
+CACHE_VERSION = 3
+RECORD_MAGIC = b"WPCR"
+# magic, record version, flags, vertex amount, face amount, corner amount
+RECORD_HEADER = struct.Struct("<4sHHIII")
+# flag of the records that end with the local frame: 3 float64 origin relative to the vertex and 9 float64 axes
+RECORD_FRAME = 1
+RECORD_EXTENSION = ".wpc"
+
+
+def get_canonical_parameters(parameters):
+    """
+    The numbers as float, so 3 and 3.0 or numpy numbers give the same key
+
+    :param parameters: dict with all the parameters
+    :return: [(name, value), ...] sorted by name
+    """
+    canonical = []
+    for name, value in sorted(parameters.items()):
+        if isinstance(value, numbers.Real) and not isinstance(value, bool):
+            value = float(value)
+        canonical.append((name, value))
+    return canonical
+
+
+def get_job_key(job, parameters):
+    """
+    Hash of everything the connector of a job depends on: the ordered edge directions, the normal,
+    if the fan is closed and all the parameters. The position of the vertex is not part of it because
+    to_middle_point moves every connector to the origin, so equal fans at different places share a record.
+
+    :param job: ConnectorJob
+    :param parameters: dict with all the parameters, see connector_pipeline.get_parameters
+    :return: hex string
+    """
+    key = hashlib.blake2b(digest_size=16)
+    key.update(json.dumps([CACHE_VERSION, bool(job.is_closed), get_canonical_parameters(parameters)]).encode())
+    key.update(np.ascontiguousarray(job.av_normal, dtype=np.float64).tobytes())
+    key.update(np.ascontiguousarray(job.edge_dirs, dtype=np.float64).tobytes())
+    return key.hexdigest()
+
+
+def encode_record(verts, face_offsets, face_indices, frame=None):
+    """
+    Binary record: RECORD_HEADER, the vertices as float64, the face sizes as uint16, the face corners as uint32
+    and with RECORD_FRAME the frame as float64
+
+    :param frame: (12) origin relative to the vertex and the axes of the local frame, None leaves it out
+    :return: bytes
+    """
+    sizes = np.diff(face_offsets)
+    flags = 0 if frame is None else RECORD_FRAME
+    header = RECORD_HEADER.pack(RECORD_MAGIC, 1, flags, len(verts), len(sizes), len(face_indices))
+    blocks = [header, np.ascontiguousarray(verts, dtype="<f8").tobytes(), sizes.astype("<u2").tobytes(),
+              np.ascontiguousarray(face_indices, dtype="<u4").tobytes()]
+    if frame is not None:
+        blocks.append(np.ascontiguousarray(frame, dtype="<f8").tobytes())
+    return b"".join(blocks)
+
+
+def decode_record(data):
+    """
+
+    :param data: bytes from encode_record
+    :return: (V, 3) vertex coordinates, (F + 1) face offsets, (C) face vertex indices, (12) frame or None,
+             None if the record is broken
+    """
+    if len(data) < RECORD_HEADER.size:
+        return None
+    magic, version, flags, vert_amount, face_amount, corner_amount = RECORD_HEADER.unpack_from(data)
+    if magic != RECORD_MAGIC or version != 1:
+        return None
+    frame_size = 96 if flags & RECORD_FRAME else 0
+    if len(data) != RECORD_HEADER.size + vert_amount * 24 + face_amount * 2 + corner_amount * 4 + frame_size:
+        return None
+
+    start = RECORD_HEADER.size
+    verts = np.frombuffer(data, dtype="<f8", count=vert_amount * 3, offset=start).reshape(-1, 3)
+    start += vert_amount * 24
+    sizes = np.frombuffer(data, dtype="<u2", count=face_amount, offset=start)
+    start += face_amount * 2
+    face_indices = np.frombuffer(data, dtype="<u4", count=corner_amount, offset=start).astype(np.int64)
+    start += corner_amount * 4
+    frame = np.frombuffer(data, dtype="<f8", count=12, offset=start) if frame_size else None
+
+    face_offsets = np.zeros(face_amount + 1, dtype=np.int64)
+    np.cumsum(sizes, out=face_offsets[1:])
+    return verts, face_offsets, face_indices, frame
+
+
+class ConnectorCache:
+    """
+    Generated connectors on disk, one record file per key. Reading a record touches the file, so the
+    modification times give the least recently used records, those are removed when the cache grows
+    over max_bytes. Files are written to a temporary name and renamed, so other processes never see
+    half written records.
+    """
+    def __init__(self, directory, max_bytes=1 << 30):
+        """
+
+        :param directory: folder of the cache, it is created when needed
+        :param max_bytes: size limit of all the records together
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # records with the same faces share the arrays, so they can be batched like pipeline results
+        self.layouts = {}
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(size for path, time, size in self.get_entries())
+        if self.total_bytes > max_bytes:
+            self.evict(max_bytes * 0.9)
+
+    def get_key(self, job, parameters):
+        return get_job_key(job, parameters)
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key[:2], key + RECORD_EXTENSION)
+
+    def get_entries(self):
+        """
+
+        :return: [(path, modification time, size), ...] of all the records
+        """
+        entries = []
+        for folder in os.scandir(self.directory):
+            if not folder.is_dir():
+                continue
+            for entry in os.scandir(folder.path):
+                if entry.name.endswith(RECORD_EXTENSION):
+                    stat = entry.stat()
+                    entries.append((entry.path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def get_layout(self, face_offsets, face_indices):
+        key = (face_offsets.tobytes(), face_indices.tobytes())
+        if key not in self.layouts:
+            self.layouts[key] = (face_offsets, face_indices)
+        return self.layouts[key]
+
+    def get(self, key, index, middle=None):
+        """
+
+        :param key: key from get_job_key
+        :param index: vertex index for the result
+        :param middle: (3) coordinates of the vertex, the stored frame is moved there. None leaves out the frame
+        :return: ConnectorResult, None if the key is not in the cache
+        """
+        path = self.get_path(key)
+        try:
+            with open(path, "rb") as record_file:
+                record = decode_record(record_file.read())
+        except FileNotFoundError:
+            record = None
+
+        if record is None:
+            self.misses += 1
+            instrument_helper.count("cache.misses")
+            return None
+
+        os.utime(path)
+        self.hits += 1
+        instrument_helper.count("cache.hits")
+        verts, face_offsets, face_indices, frame = record
+        result = connector_pipeline.ConnectorResult(index, verts, *self.get_layout(face_offsets, face_indices))
+        if frame is not None and middle is not None:
+            result.origin = np.asarray(middle, dtype=np.float64) + frame[:3]
+            result.axes = frame[3:].reshape(3, 3)
+        return result
+
+    def put(self, key, result, middle=None):
+        """
+
+        :param key: key from get_job_key
+        :param result: ConnectorResult
+        :param middle: (3) coordinates of the vertex, the frame is stored relative to it like the key is.
+                       None or a result without a frame stores no frame
+        """
+        path = self.get_path(key)
+        try:
+            # a record written again for the same key replaces the old file instead of adding to the cache
+            replaced_bytes = os.path.getsize(path)
+        except FileNotFoundError:
+            replaced_bytes = 0
+        frame = None
+        if middle is not None and result.origin is not None:
+            frame = np.concatenate((result.origin - np.asarray(middle, dtype=np.float64), np.ravel(result.axes)))
+        data = encode_record(result.verts, result.face_offsets, result.face_indices, frame)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + "." + str(os.getpid()) + ".tmp"
+        with open(temp_path, "wb") as record_file:
+            record_file.write(data)
+        os.replace(temp_path, path)
+
+        self.total_bytes += len(data) - replaced_bytes
+        if self.total_bytes > self.max_bytes:
+            self.evict(self.max_bytes * 0.9)
+
+    def evict(self, target_bytes):
+        """
+        Removes the least recently used records until the cache is smaller than target_bytes
+        """
+        entries = sorted(self.get_entries(), key=lambda entry: entry[1])
+        total_bytes = sum(size for path, time, size in entries)
+        for path, time, size in entries:
+            if total_bytes <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            instrument_helper.count("cache.evictions")
+        self.total_bytes = total_bytes
+
+    def clear(self):
+        self.evict(0)
@@ -0,0 +1,697 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import functools
+import os
+import time
+import numpy as np
+import create_array_functions
+from blender_helper import instrument_helper
+from blender_helper import vector_helper
+
+DEFAULT_PARAMETERS = {
+    "distance": 20,
+    "thickness": 7,
+    "hole_radius": 1.5,
+    "nut_radius": 3,
+    "bolt_dist": 4,
+    "location": 5,
+    "bolt_thickness": 2.5,
+    "bolt_vertices": create_array_functions.BOLT_VERTICES,
+    "nut_vertices": create_array_functions.NUT_VERTICES,
+}
+
+# amount of vertices of the bolt and nut circles for every use of the connectors. The nut stays a hexagon
+# because it holds a hex nut. The sheets of create_svg_functions draw the holes as exact circles, so their
+# connectors only need the coarsest circles for the hole centers.
+LEVELS_OF_DETAIL = {
+    "outline": (4, 4),
+    "preview": (6, 6),
+    "default": (create_array_functions.BOLT_VERTICES, create_array_functions.NUT_VERTICES),
+    "print": (32, 6),
+}
+
+# chunks per worker process that are in the pool at the same time, more only keeps more results in memory
+POOL_WINDOW = 2
+
+
+class ConnectorJob:
+    """
+    Everything that is needed to build the connector of one vertex. Only plain numbers and arrays are stored
+    so the job can be pickled and sent to another process.
+    """
+    def __init__(self, index, middle, av_normal, edge_dirs, is_closed):
+        """
+
+        :param index: index of the vertex in the original mesh
+        :param middle: (3) coordinate of the vertex
+        :param av_normal: (3) vertex normal
+        :param edge_dirs: (k, 3) ordered normalized edge directions, see ArrayConnector
+        :param is_closed: bool if the fan around the vertex is closed
+        """
+        self.index = index
+        self.middle = middle
+        self.av_normal = av_normal
+        self.edge_dirs = edge_dirs
+        self.is_closed = is_closed
+
+
+class ConnectorGroup:
+    """
+    Jobs whose vertex fans have the same signature, they all give the same connector so it only has to be
+    generated once. The amount of jobs is the amount of parts that have to be produced.
+    """
+    def __init__(self, signature, jobs, starts=None):
+        """
+
+        :param starts: [edge, ...] for every job the edge where the fan of the signature starts, None when
+                       all the fans start at their first edge
+        """
+        self.signature = signature
+        self.jobs = jobs
+        self.starts = [0] * len(jobs) if starts is None else starts
+
+    def get_count(self):
+        return len(self.jobs)
+
+    def get_indices(self):
+        return [job.index for job in self.jobs]
+
+
+class ConnectorResult:
+    """
+    The generated connector as plain buffers, the faces are stored like the faces of ArrayConnectionMesh.
+    The vertices are in the local frame of the connector, origin and axes give that frame on the mesh.
+    """
+    def __init__(self, index, verts, face_offsets, face_indices, origin=None, axes=None):
+        """
+
+        :param origin: (3) origin of the local frame on the mesh, None when it is not known
+        :param axes: (3, 3) x, y and z axis of the local frame as rows
+        """
+        self.index = index
+        self.verts = verts
+        self.face_offsets = face_offsets
+        self.face_indices = face_indices
+        self.origin = origin
+        self.axes = axes
+
+    def get_matrix(self):
+        """
+
+        :return: (4, 4) affine matrix that moves the connector from its local frame back to its vertex on the mesh,
+                 None when the frame is not known
+        """
+        if self.origin is None or self.axes is None:
+            return None
+        matrix = np.eye(4)
+        matrix[:3, :3] = np.transpose(self.axes)
+        matrix[:3, 3] = self.origin
+        return matrix
+
+    def get_faces(self):
+        """
+
+        :return: [[v1, v2, v3, v4], ...] like bmesh or from_pydata expects them
+        """
+        indices = self.face_indices.tolist()
+        offsets = self.face_offsets.tolist()
+        return [indices[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+def get_parameters(parameters=None):
+    """
+
+    :param parameters: dict with the parameters that differ from DEFAULT_PARAMETERS
+    :return: dict with all the parameters
+    """
+    full_parameters = dict(DEFAULT_PARAMETERS)
+    if parameters is not None:
+        full_parameters.update(parameters)
+    return full_parameters
+
+
+def get_detail_parameters(level, parameters=None):
+    """
+
+    :param level: key of LEVELS_OF_DETAIL
+    :param parameters: dict with the parameters that differ from DEFAULT_PARAMETERS
+    :return: dict with all the parameters, the circle resolutions are the ones of the level
+    """
+    full_parameters = get_parameters(parameters)
+    full_parameters["bolt_vertices"], full_parameters["nut_vertices"] = LEVELS_OF_DETAIL[level]
+    return full_parameters
+
+
+def get_triangle_amount(jobs, bolt_vertices, nut_vertices):
+    """
+    Amount of triangles of all the connectors after triangulating them, counted from the face layout without
+    building anything. Every pair adds the faces of the hole and fill templates, the rim adds a quad per side.
+
+    :param jobs: [ConnectorJob, ...]
+    :return: int
+    """
+    pair_triangles = (create_array_functions.get_hole_template(bolt_vertices, nut_vertices).get_triangle_amount() +
+                      create_array_functions.get_fill_template(bolt_vertices, False).get_triangle_amount() +
+                      create_array_functions.get_fill_template(nut_vertices, True).get_triangle_amount())
+    total = 0
+    for job in jobs:
+        # a closed fan has a rim side per rim vertex, an open one has one side less and the two middle sides
+        pair_amount = len(job.edge_dirs) if job.is_closed else len(job.edge_dirs) - 1
+        side_amount = 2 * pair_amount if job.is_closed else 2 * pair_amount + 2
+        total += 2 * side_amount + pair_amount * pair_triangles
+    return total
+
+
+def fit_triangle_budget(jobs, budget, parameters=None):
+    """
+    Lowers the circle resolutions of the parameters until all the connectors together have at most budget
+    triangles. The bolt circles are made coarser first, the nut hexagon only when the bolt circles have reached
+    it. All the connectors get the same resolution, so they keep sharing their face layouts.
+
+    :param jobs: [ConnectorJob, ...]
+    :param budget: largest amount of triangles of all the connectors
+    :param parameters: dict with the parameters that differ from DEFAULT_PARAMETERS
+    :return: dict with all the parameters, the coarsest circles of 4 vertices when even those don't fit.
+             The resolutions are always even and at least 4, odd ones are rounded down first
+    """
+    parameters = get_parameters(parameters)
+    bolt_vertices = max(int(parameters["bolt_vertices"]) // 2 * 2, 4)
+    nut_vertices = max(int(parameters["nut_vertices"]) // 2 * 2, 4)
+    while get_triangle_amount(jobs, bolt_vertices, nut_vertices) > budget and max(bolt_vertices, nut_vertices) > 4:
+        if bolt_vertices > nut_vertices or nut_vertices == 4:
+            bolt_vertices -= 2
+        else:
+            nut_vertices -= 2
+            bolt_vertices = min(bolt_vertices, nut_vertices)
+    parameters["bolt_vertices"], parameters["nut_vertices"] = bolt_vertices, nut_vertices
+    return parameters
+
+
+@instrument_helper.timed("connector_jobs")
+def get_connector_jobs(mesh, vertex_normal=None):
+    """
+    Creates a job for every vertex that has faces around it. The edge directions of all the vertices
+    are computed at once from the half-edge fans, the other vertex of an edge is the end of the outgoing corner
+    and for open fans also the start of the corner before the last one.
+
+    :param mesh: ArrayConnectionMesh
+    :param vertex_normal: (V, 3) normals to use instead of mesh.vertex_normal
+    :return: [ConnectorJob, ...]
+    :raises ValueError: when the mesh has non-manifold vertices, see HalfEdgeMesh.check_manifold
+    """
+    mesh.half_edge.check_manifold()
+    if vertex_normal is None:
+        vertex_normal = mesh.vertex_normal
+
+    half_edge = mesh.half_edge
+    fan_corners = half_edge.fan_corners
+    fan_sizes = np.diff(half_edge.fan_offsets)
+    fan_vert = half_edge.corner_vert[fan_corners]
+
+    other_vert = half_edge.corner_vert[half_edge.corner_next[fan_corners]]
+    fan_dirs = vector_helper.get_dir_edges(mesh.coords, np.stack((fan_vert, other_vert), axis=1))
+
+    last_corners = fan_corners[half_edge.fan_offsets[1:][fan_sizes > 0] - 1]
+    last_vert = half_edge.corner_vert[last_corners]
+    last_other = half_edge.corner_vert[half_edge.corner_prev[last_corners]]
+    last_dirs = vector_helper.get_dir_edges(mesh.coords, np.stack((last_vert, last_other), axis=1))
+
+    if instrument_helper.is_enabled():
+        # the amount of edges, an open fan has one edge more than it has faces
+        valence = fan_sizes + ~half_edge.fan_closed
+        instrument_helper.record("valence", valence[fan_sizes > 0].tolist())
+
+    jobs = []
+    offsets = half_edge.fan_offsets.tolist()
+    for fan_index, vert in enumerate(last_vert.tolist()):
+        edge_dirs = fan_dirs[offsets[vert]:offsets[vert + 1]]
+        is_closed = bool(half_edge.fan_closed[vert])
+        if not is_closed:
+            edge_dirs = np.concatenate((edge_dirs, last_dirs[fan_index:fan_index + 1]))
+
+        jobs.append(ConnectorJob(vert, mesh.coords[vert], vertex_normal[vert], edge_dirs, is_closed))
+
+    return jobs
+
+
+def get_fan_signatures(jobs, tolerance=1e-3, with_starts=False):
+    """
+    Makes a signature of the vertex fan of every job that doesn't change when the fan is rotated.
+    Every edge is described by its elevation along the normal and the angle around the normal to the next edge,
+    both quantized to the tolerance. For closed fans the sequence that is the smallest of all its cyclic
+    rotations is used, so the start of the fan doesn't matter. Open fans always start at the boundary.
+
+    :param jobs: [ConnectorJob, ...]
+    :param tolerance: quantization step for the elevations (unit vectors) and angles (radians)
+    :param with_starts: also return the edge where the signature of every fan starts
+    :return: [signature, ...] hashable signature for every job, with with_starts also [edge, ...]
+    """
+    if len(jobs) == 0:
+        return ([], []) if with_starts else []
+
+    sizes = np.array([len(job.edge_dirs) for job in jobs])
+    edge_dirs = np.concatenate([job.edge_dirs for job in jobs])
+    normals = np.array([job.av_normal for job in jobs], dtype=np.float64)
+    normal_length = np.linalg.norm(normals, axis=1)
+
+    # Local frame for every fan, the x axis is arbitrary because only angle differences are used
+    z_axis = normals / normal_length[:, None]
+    helper = np.where(np.abs(z_axis[:, :1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+    x_axis = create_array_functions.normalized(np.cross(helper, z_axis))
+    y_axis = np.cross(z_axis, x_axis)
+
+    edge_job = np.repeat(np.arange(len(jobs)), sizes)
+    elevation = np.einsum("ij,ij->i", edge_dirs, z_axis[edge_job])
+    azimuth = np.arctan2(np.einsum("ij,ij->i", edge_dirs, y_axis[edge_job]),
+                         np.einsum("ij,ij->i", edge_dirs, x_axis[edge_job]))
+
+    offsets = np.zeros(len(jobs) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=offsets[1:])
+    next_edge = np.arange(1, offsets[-1] + 1)
+    next_edge[offsets[1:] - 1] = offsets[:-1]
+    turn = np.mod(azimuth[next_edge] - azimuth, 2 * np.pi)
+
+    q_elevation = np.round(elevation / tolerance).astype(np.int64).tolist()
+    q_turn = np.round(turn / tolerance).astype(np.int64).tolist()
+    q_length = np.round(normal_length / tolerance).astype(np.int64).tolist()
+
+    signatures = []
+    starts = []
+    for job_index, job in enumerate(jobs):
+        start, end = offsets[job_index], offsets[job_index + 1]
+        if job.is_closed:
+            sequence = tuple(zip(q_elevation[start:end], q_turn[start:end]))
+            first = min(range(len(sequence)), key=lambda i: sequence[i:] + sequence[:i])
+            sequence = sequence[first:] + sequence[:first]
+        else:
+            # the turn of the last edge wraps back to the first edge, which is not a face of an open fan
+            sequence = tuple(zip(q_elevation[start:end], q_turn[start:end - 1] + [0]))
+            first = 0
+        signatures.append((bool(job.is_closed), q_length[job_index], sequence))
+        starts.append(first)
+
+    return (signatures, starts) if with_starts else signatures
+
+
+@instrument_helper.timed("dedupe")
+def group_jobs(jobs, tolerance=1e-3):
+    """
+    Groups the jobs that give the same connector, see get_fan_signatures
+
+    :param jobs: [ConnectorJob, ...]
+    :param tolerance: quantization step of the signature
+    :return: [ConnectorGroup, ...] in order of the first job of every group
+    """
+    group_dict = {}
+    for job, signature, start in zip(jobs, *get_fan_signatures(jobs, tolerance, with_starts=True)):
+        if signature not in group_dict:
+            group_dict[signature] = ConnectorGroup(signature, [], [])
+        group_dict[signature].jobs.append(job)
+        group_dict[signature].starts.append(start)
+
+    instrument_helper.count("connector_types", len(group_dict))
+    return list(group_dict.values())
+
+
+def get_shape_buckets(jobs):
+    """
+    Connectors with the same amount of edges that are all closed or all open share their face layout,
+    so they can be built together as one ArrayConnector batch
+
+    :param jobs: [ConnectorJob, ...]
+    :return: [[job1, ..., job k], ...] the jobs for every shape
+    """
+    bucket_dict = {}
+    for job in jobs:
+        key = (len(job.edge_dirs), bool(job.is_closed))
+        if key not in bucket_dict:
+            bucket_dict[key] = []
+        bucket_dict[key].append(job)
+
+    return list(bucket_dict.values())
+
+
+def get_stages(parameters):
+    """
+    The steps of create_connector_meshes in order, every step changes the ArrayConnector in place
+
+    :param parameters: dict with all the parameters, see get_parameters
+    :return: [(name, function), ...]
+    """
+    return [
+        ("create_hat", functools.partial(create_array_functions.create_hat, distance=parameters["distance"])),
+        ("create_thickness", functools.partial(create_array_functions.create_thickness,
+                                               thickness=parameters["thickness"])),
+        ("add_holes", functools.partial(create_array_functions.add_holes, hole_radius=parameters["hole_radius"],
+                                        nut_radius=parameters["nut_radius"], bolt_dist=parameters["bolt_dist"],
+                                        location=parameters["location"],
+                                        bolt_thickness=parameters["bolt_thickness"],
+                                        bolt_vertices=parameters["bolt_vertices"],
+                                        nut_vertices=parameters["nut_vertices"])),
+        ("fill_hole_faces", create_array_functions.fill_hole_faces),
+        ("to_middle_point", create_array_functions.to_middle_point),
+    ]
+
+
+def get_batch_connector(jobs):
+    """
+
+    :param jobs: [ConnectorJob, ...] from one bucket of get_shape_buckets
+    :return: ArrayConnector without any geometry besides the middle vertices
+    """
+    middle = np.array([job.middle for job in jobs], dtype=np.float64)
+    av_normal = np.array([job.av_normal for job in jobs], dtype=np.float64)
+    edge_dirs = np.array([job.edge_dirs for job in jobs], dtype=np.float64)
+    return create_array_functions.ArrayConnector(middle, av_normal, edge_dirs, jobs[0].is_closed)
+
+
+def get_group_frames(group, parameters=None):
+    """
+    The local frames of all the connectors of a group as to_middle_point makes them, only the hat and the rim
+    are built for them. The fans are turned to start at the edge that matches the first edge of the first job,
+    so the connector that was built for the first job fits every frame.
+
+    :param group: ConnectorGroup, all its jobs are in one shape bucket
+    :param parameters: dict with the parameters that differ from DEFAULT_PARAMETERS
+    :return: (k, 3) origins, (k, 3, 3) axes as rows, in the order of group.jobs
+    """
+    parameters = get_parameters(parameters)
+    jobs = [ConnectorJob(job.index, job.middle, job.av_normal, np.roll(job.edge_dirs, group.starts[0] - start, axis=0),
+                         job.is_closed) for job, start in zip(group.jobs, group.starts)]
+    wood_con = get_batch_connector(jobs)
+    create_array_functions.create_hat(wood_con, distance=parameters["distance"])
+    create_array_functions.create_thickness(wood_con, thickness=parameters["thickness"])
+    return create_array_functions.get_frames(wood_con)
+
+
+def build_batch(jobs, parameters, stages=None):
+    """
+    Runs the same steps as create_connector_meshes for all the jobs at once,
+    all the jobs need to be in the same shape bucket
+
+    :param jobs: [ConnectorJob, ...] from one bucket of get_shape_buckets
+    :param parameters: dict with all the parameters, see get_parameters
+    :param stages: [(name, function), ...] to run instead of get_stages(parameters)
+    :return: ArrayConnector
+    """
+    if stages is None:
+        stages = get_stages(parameters)
+
+    with instrument_helper.stage("batch_setup"):
+        wood_con = get_batch_connector(jobs)
+
+    for name, stage in stages:
+        vert_amount = wood_con.vert_amount
+        face_amount = wood_con.get_face_amount()
+        with instrument_helper.stage(name):
+            stage(wood_con)
+        # the vertices and faces that the stage added to all the connectors of the batch
+        instrument_helper.count(name + ".vertices", (wood_con.vert_amount - vert_amount) * len(jobs))
+        instrument_helper.count(name + ".faces", (wood_con.get_face_amount() - face_amount) * len(jobs))
+
+    instrument_helper.count("connectors", len(jobs))
+    return wood_con
+
+
+def get_chunks(jobs, chunk_size=256):
+    """
+
+    :param jobs: [ConnectorJob, ...]
+    :param chunk_size: maximum amount of jobs in a chunk
+    :return: [[job1, ..., job k], ...] every chunk only has jobs of one shape bucket
+    """
+    chunks = []
+    for bucket in get_shape_buckets(jobs):
+        chunks.extend(bucket[i:i + chunk_size] for i in range(0, len(bucket), chunk_size))
+    return chunks
+
+
+def build_connector_chunk(jobs, parameters):
+    """
+
+    :param jobs: [ConnectorJob, ...] from one bucket of get_shape_buckets
+    :return: [ConnectorResult, ...] the results share the face buffers
+    """
+    wood_con = build_batch(jobs, parameters)
+    verts = wood_con.get_verts()
+    face_offsets, face_indices = wood_con.get_face_buffers()
+    if wood_con.frame_origin is None:
+        return [ConnectorResult(job.index, verts[i], face_offsets, face_indices) for i, job in enumerate(jobs)]
+    return [ConnectorResult(job.index, verts[i], face_offsets, face_indices, wood_con.frame_origin[i],
+                            wood_con.frame_axes[i]) for i, job in enumerate(jobs)]
+
+
+def build_instrumented_chunk(jobs, parameters, trace=False):
+    """
+    build_connector_chunk for a worker process, the instrumentation of the worker is sent back with the results
+
+    :return: [ConnectorResult, ...], data for Instrumentation.merge
+    """
+    instrument_helper.enable(trace=trace)
+    results = build_connector_chunk(jobs, parameters)
+    return results, instrument_helper.disable().get_data()
+
+
+def build_connector(job, parameters):
+    """
+
+    :param job: ConnectorJob
+    :param parameters: dict with all the parameters, see get_parameters
+    :return: ConnectorResult
+    """
+    return build_connector_chunk([job], parameters)[0]
+
+
+def generate_connectors(jobs, parameters=None, processes=None, chunk_size=256, cache=None):
+    """
+    Builds the connectors of all the jobs. The jobs are split in shape buckets and every chunk of a bucket
+    is built as one batch. With more than one process the chunks are sent to a process pool, the results
+    are yielded per chunk in the order of the buckets.
+
+    :param jobs: [ConnectorJob, ...]
+    :param parameters: dict with the parameters that differ from DEFAULT_PARAMETERS
+    :param processes: amount of worker processes, None uses all cores and 1 runs in this process
+    :param chunk_size: amount of jobs that are built in one batch
+    :param cache: connector_cache.ConnectorCache, the connectors in it are read instead of built
+                  and the built ones are added to it
+    :return: generator of ConnectorResult
+    """
+    parameters = get_parameters(parameters)
+    if cache is not None:
+        yield from generate_cached_connectors(jobs, parameters, processes, chunk_size, cache)
+        return
+
+    chunks = get_chunks(jobs, chunk_size)
+
+    if processes == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from build_connector_chunk(chunk, parameters)
+        return
+
+    instrumentation = instrument_helper.active
+    window = POOL_WINDOW * (processes or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        if instrumentation is None:
+            for results in map_bounded(pool, build_connector_chunk, chunks, (parameters,), window):
+                yield from results
+            return
+
+        trace = instrumentation.events is not None
+        for results, data in map_bounded(pool, build_instrumented_chunk, chunks, (parameters, trace), window):
+            instrumentation.merge(data)
+            yield from results
+
+
+def map_bounded(pool, function, items, arguments, window):
+    """
+    Like pool.map, but at most window items are submitted ahead of the one that is yielded. The next item is
+    only submitted after the oldest result was used, so the results don't pile up in the pool when the caller
+    is slower than the workers. Items that were not started are cancelled when the caller stops early.
+
+    :param pool: ProcessPoolExecutor
+    :param function: function(item, *arguments)
+    :param arguments: tuple with the arguments that are the same for every item
+    :param window: amount of items that are submitted at the same time
+    :return: generator of the results in the order of the items
+    """
+    futures = deque()
+    try:
+        for item in items:
+            futures.append(pool.submit(function, item, *arguments))
+            if len(futures) >= window:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+
+
+def generate_cached_connectors(jobs, parameters, processes, chunk_size, cache):
+    """
+    The cached connectors are yielded first, per shape bucket so the results with the same faces follow
+    each other. Then the others are built and stored.
+
+    :param parameters: dict with all the parameters
+    :return: generator of ConnectorResult
+    """
+    missing_jobs = []
+    keys = {}
+    for bucket in get_shape_buckets(jobs):
+        for job in bucket:
+            key = cache.get_key(job, parameters)
+            result = cache.get(key, job.index, job.middle)
+            if result is None:
+                missing_jobs.append(job)
+                keys[job.index] = (key, job.middle)
+            else:
+                yield result
+
+    for result in generate_connectors(missing_jobs, parameters, processes=processes, chunk_size=chunk_size):
+        key, middle = keys[result.index]
+        cache.put(key, result, middle)
+        yield result
+
+
+def generate_connector_groups(groups, parameters=None, processes=None, chunk_size=256, cache=None):
+    """
+    Builds only the first job of every group, the other jobs of the group share its connector
+
+    :param groups: [ConnectorGroup, ...]
+    :return: generator of (ConnectorGroup, ConnectorResult)
+    """
+    group_dict = {group.jobs[0].index: group for group in groups}
+    jobs = [group.jobs[0] for group in groups]
+    for result in generate_connectors(jobs, parameters=parameters, processes=processes, chunk_size=chunk_size,
+                                      cache=cache):
+        yield group_dict[result.index], result
+
+
+class BackgroundGeneration:
+    """
+    Generates the connectors of groups without blocking the caller, for a user interface that has to stay
+    responsive. The chunks are submitted to a process pool and poll collects the ones that are finished,
+    with one process the chunks are built in poll until its time is up. Cancelling keeps the results that
+    were already collected.
+    """
+    def __init__(self, groups, parameters=None, processes=None, chunk_size=256):
+        """
+
+        :param groups: [ConnectorGroup, ...] only the first job of every group is built
+        :param parameters: dict with the parameters that differ from DEFAULT_PARAMETERS
+        :param processes: amount of worker processes, None uses all cores and 1 runs in poll
+        :param chunk_size: amount of jobs that are built in one batch
+        """
+        self.group_dict = {group.jobs[0].index: group for group in groups}
+        self.chunks = get_chunks([group.jobs[0] for group in groups], chunk_size)
+        self.parameters = get_parameters(parameters)
+        self.processes = processes
+        self.total = sum(group.get_count() for group in groups)
+        self.done = 0
+        self.pool = None
+        # the futures of the chunks, or the chunks themselves when they are built in poll
+        self.pending = []
+        self.start_time = None
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        if self.processes == 1 or len(self.chunks) <= 1:
+            self.pending = list(self.chunks)
+            return
+        self.pool = ProcessPoolExecutor(max_workers=self.processes)
+        self.pending = [self.pool.submit(build_connector_chunk, chunk, self.parameters) for chunk in self.chunks]
+
+    def poll(self, time_limit=0.05):
+        """
+        Never waits for the pool. Without a pool at least one chunk is built, so every poll makes progress.
+
+        :param time_limit: seconds that chunks are built in this process
+        :return: [(ConnectorGroup, ConnectorResult), ...] the connectors that were finished since the last poll
+        """
+        results = []
+        if self.pool is None:
+            end = time.perf_counter() + time_limit
+            while self.pending and (not results or time.perf_counter() < end):
+                results.extend(build_connector_chunk(self.pending.pop(0), self.parameters))
+        else:
+            finished = [future.done() for future in self.pending]
+            for future in [future for future, is_done in zip(self.pending, finished) if is_done]:
+                results.extend(future.result())
+            self.pending = [future for future, is_done in zip(self.pending, finished) if not is_done]
+            if not self.pending:
+                self.pool.shutdown()
+                self.pool = None
+
+        pairs = [(self.group_dict[result.index], result) for result in results]
+        self.done += sum(group.get_count() for group, result in pairs)
+        return pairs
+
+    def is_finished(self):
+        return self.start_time is not None and not self.pending
+
+    def get_eta(self):
+        """
+
+        :return: estimated seconds until all the connectors are done, None before the first ones are done
+        """
+        if self.done == 0:
+            return None
+        return (time.perf_counter() - self.start_time) / self.done * (self.total - self.done)
+
+    def cancel(self):
+        """
+        Stops the chunks that have not started, the workers finish their current chunk in the background
+        """
+        if self.pool is not None:
+            for future in self.pending:
+                future.cancel()
+            self.pool.shutdown(wait=False)
+            self.pool = None
+        self.pending = []
+
+
+def get_grid_offsets(start, amount, spacing, columns=10):
+    """
+    Lays the connectors out in rows so they don't overlap at the origin
+
+    :param start: number of the first connector
+    :param amount: amount of connectors
+    :param spacing: distance between the connectors
+    :param columns: amount of connectors in a row
+    :return: (amount, 3) translation of every connector
+    """
+    row, column = np.divmod(np.arange(start, start + amount), columns)
+    return np.stack((column * spacing, row * spacing, np.zeros(amount)), axis=1)
+
+
+def merge_results(results, spacing=None, columns=10):
+    """
+    Puts all the connectors in one set of buffers, for a single mesh that contains all of them
+
+    :param results: iterable of ConnectorResult
+    :param spacing: distance between the connectors, see get_grid_offsets. None keeps them at the origin
+    :return: (V, 3) vertex coordinates, (F + 1) face offsets, (C) face vertex indices,
+             (F) index of the original vertex of every face
+    """
+    vert_blocks = []
+    size_blocks = []
+    index_blocks = []
+    face_vertex_blocks = []
+    vert_amount = 0
+    for result in results:
+        verts = result.verts
+        if spacing is not None:
+            verts = verts + get_grid_offsets(len(vert_blocks), 1, spacing, columns)
+        vert_blocks.append(verts)
+        size_blocks.append(np.diff(result.face_offsets))
+        index_blocks.append(result.face_indices + vert_amount)
+        face_vertex_blocks.append(np.full(len(result.face_offsets) - 1, result.index, dtype=np.int64))
+        vert_amount += len(verts)
+
+    if len(vert_blocks) == 0:
+        return np.empty((0, 3)), np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    sizes = np.concatenate(size_blocks)
+    face_offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=face_offsets[1:])
+    return np.concatenate(vert_blocks), face_offsets, np.concatenate(index_blocks), np.concatenate(face_vertex_blocks)
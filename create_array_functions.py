@@ -0,0 +1,456 @@
+import numpy as np
+import functools
+import math
+from blender_helper import lin_alg_helper
+
+BOLT_VERTICES = 12
+NUT_VERTICES = 6
+
+
+class ArrayConnector:
+    """
+    Array counterpart of WoodConnector for a batch of connectors that all have the same amount of edges and
+    are all closed or all open. Because of that the connectors share one face layout and every step
+    is done for the whole batch at once, all the coordinate arrays have the connectors as first axis.
+
+    The vertices are added in blocks, the attributes like top_rim_verts hold the local indices of those
+    blocks (the same for every connector) and the attributes ending in _co hold the coordinates.
+
+    There is no bmesh.ops.recalc_face_normals afterwards, so unlike create_mesh_functions all the faces are
+    wound to point outwards.
+    """
+    def __init__(self, middle, av_normal, edge_dirs, is_closed):
+        """
+
+        :param middle: (G, 3) coordinates of the vertices of the original mesh
+        :param av_normal: (G, 3) normals of the original vertices
+        :param edge_dirs: (G, k, 3) normalized direction of the edges leaving the vertex, ordered around the vertex.
+                          When the fans are closed the edges make k pairs, otherwise k - 1 pairs.
+        :param is_closed: bool if the faces around the vertices make a complete circle
+        """
+        self.av_normal = np.asarray(av_normal, dtype=np.float64).reshape(-1, 3)
+        self.edge_dirs = np.asarray(edge_dirs, dtype=np.float64).reshape(len(self.av_normal), -1, 3)
+        self.is_closed = bool(is_closed)
+        self.connector_amount = len(self.av_normal)
+        self.pair_amount = self.edge_dirs.shape[1] if self.is_closed else self.edge_dirs.shape[1] - 1
+
+        self.vert_blocks = []
+        self.vert_amount = 0
+        self.face_blocks = []
+
+        self.middle_co = np.asarray(middle, dtype=np.float64).reshape(-1, 3)
+        self.middle_vert = int(self.add_verts(self.middle_co[:, None])[0])
+
+        self.top_rim_co = None
+        self.top_rim_verts = None
+        self.bottom_rim_co = None
+        self.bottom_rim_verts = None
+        self.extended_middle_co = None
+        self.extended_middle = None
+        self.bottom_plane = None
+        # local frame of every connector after to_middle_point, (G, 3) origin and (G, 3, 3) x, y and z axis as rows
+        self.frame_origin = None
+        self.frame_axes = None
+
+        self.hole_verts = None
+        self.top_bolt_verts = None
+        self.bottom_bolt_verts = None
+        self.top_nut_verts = None
+        self.bottom_nut_verts = None
+
+    def add_verts(self, co):
+        """
+
+        :param co: (G, ..., 3) coordinates for every connector
+        :return: local indices of the new vertices, in the shape of co without the first and last axis
+        """
+        co = np.asarray(co, dtype=np.float64)
+        amount = co[0].size // 3
+        indices = np.arange(self.vert_amount, self.vert_amount + amount).reshape(co.shape[1:-1])
+        self.vert_blocks.append(co.reshape(self.connector_amount, amount, 3))
+        self.vert_amount += amount
+        return indices
+
+    def add_faces(self, faces):
+        """
+
+        :param faces: [[v1, v2, v3, v4], ...] local vertex indices
+        """
+        sizes = np.array([len(face) for face in faces], dtype=np.int64)
+        indices = np.array([vert for face in faces for vert in face], dtype=np.int64)
+        self.face_blocks.append((sizes, indices))
+
+    def add_face_block(self, sizes, indices):
+        """
+
+        :param sizes: (F) amount of vertices of every face
+        :param indices: (C) local vertex indices of all the faces after each other
+        """
+        self.face_blocks.append((sizes, indices))
+
+    def get_face_amount(self):
+        """
+
+        :return: amount of faces of a single connector
+        """
+        return sum(len(sizes) for sizes, indices in self.face_blocks)
+
+    def get_pair_indices(self, rim_verts):
+        """
+        Same as WoodConnector.split_pairs, but for every pair only the indices of [edge_vert, pair_vert, edge_vert]
+
+        :param rim_verts: (r) rim vertices ordered like [edge_vert, pair_vert, edge_vert, pair_verts, ...]
+        :return: (pairs, 3)
+        """
+        first = np.arange(self.pair_amount) * 2
+        pair_indices = np.stack((first, first + 1, first + 2), axis=1) % len(rim_verts)
+        return rim_verts[pair_indices]
+
+    def get_verts(self):
+        """
+
+        :return: (G, V, 3) the vertices of every connector
+        """
+        if len(self.vert_blocks) > 1:
+            self.vert_blocks = [np.concatenate(self.vert_blocks, axis=1)]
+        return self.vert_blocks[0]
+
+    def get_face_buffers(self):
+        """
+
+        :return: (F + 1) face offsets, (C) face vertex indices of a single connector
+        """
+        sizes = np.concatenate([sizes for sizes, indices in self.face_blocks])
+        face_offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+        np.cumsum(sizes, out=face_offsets[1:])
+        face_indices = np.concatenate([indices for sizes, indices in self.face_blocks])
+        return face_offsets, face_indices
+
+    def get_buffers(self):
+        """
+        All the connectors of the batch in one buffer, the faces of connector g use the vertices
+        g * V up to (g + 1) * V
+
+        :return: (G * V, 3) vertex coordinates, (G * F + 1) face offsets, (G * C) face vertex indices
+        """
+        face_offsets, face_indices = self.get_face_buffers()
+        connector_offsets = np.arange(self.connector_amount)[:, None]
+
+        all_offsets = (face_offsets[1:] + connector_offsets * face_offsets[-1]).reshape(-1)
+        all_indices = (face_indices + connector_offsets * self.vert_amount).reshape(-1)
+        return self.get_verts().reshape(-1, 3), np.concatenate(([0], all_offsets)), all_indices
+
+
+def normalized(vectors):
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def dot(vectors1, vectors2):
+    return np.sum(vectors1 * vectors2, axis=-1)
+
+
+def points_to_plane_via_dir(points, dirs, planes):
+    """
+    Array version of lin_alg_helper.point_to_plane_via_dir, all arguments are broadcast against each other
+
+    :param points: (..., 3)
+    :param dirs: (..., 3)
+    :param planes: (..., 4) every plane as (a, b, c, d)
+    :return: (...) for every point the multiple of dir that moves the point onto the plane
+    """
+    return lin_alg_helper.points_to_planes_via_dirs(points, dirs, planes)
+
+
+class FaceTemplate:
+    """
+    Faces that are repeated for every pair of a connector. The faces index slots instead of vertices,
+    a slot table with the vertices of every repeat turns the template into faces without building them one by one.
+    """
+    def __init__(self, faces):
+        """
+
+        :param faces: [[s1, s2, s3, s4], ...] slot indices
+        """
+        self.sizes = np.array([len(face) for face in faces], dtype=np.int64)
+        self.slots = np.array([slot for face in faces for slot in face], dtype=np.int64)
+
+    def get_triangle_amount(self):
+        """
+
+        :return: amount of triangles of the faces of one repeat after triangulating them
+        """
+        return int((self.sizes - 2).sum())
+
+    def get_faces(self, slot_table):
+        """
+
+        :param slot_table: (P, S) local vertex index of every slot for every repeat
+        :return: (P * F) face sizes, (P * C) face vertex indices
+        """
+        return np.tile(self.sizes, len(slot_table)), slot_table[:, self.slots].reshape(-1)
+
+
+@functools.lru_cache(maxsize=None)
+def get_circle_template(resolution):
+    """
+    Points on the unit circle, cached per resolution. The array is shared so it is read only.
+
+    :param resolution: amount of points
+    :return: (resolution, 2) cos and sin of every point
+    """
+    angles = np.arange(resolution) * (2 * math.pi) / resolution
+    template = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+    template.setflags(write=False)
+    return template
+
+
+def get_pipe_faces(top_slots, bottom_slots):
+    amount = len(top_slots)
+    faces = []
+    for i in range(amount):
+        faces.append((top_slots[i], bottom_slots[i], bottom_slots[(i + 1) % amount], top_slots[(i + 1) % amount]))
+    return faces
+
+
+@functools.lru_cache(maxsize=None)
+def get_hole_template(bolt_vertices, nut_vertices):
+    """
+    The faces of the bolt pipe, the nut pipe and the two faces between them, as built in add_holes.
+    The slots are the hole vertices of one pair: top bolt, bottom bolt, top nut and bottom nut.
+
+    :return: FaceTemplate
+    """
+    slots = list(range(2 * bolt_vertices + 2 * nut_vertices))
+    top_bolt = slots[:bolt_vertices]
+    bottom_bolt = slots[bolt_vertices:2 * bolt_vertices]
+    top_nut = slots[2 * bolt_vertices:2 * bolt_vertices + nut_vertices]
+    bottom_nut = slots[2 * bolt_vertices + nut_vertices:]
+
+    faces = get_pipe_faces(top_bolt, bottom_bolt) + get_pipe_faces(top_nut, bottom_nut)
+
+    bolt_half = bolt_vertices // 2
+    nut_half = nut_vertices // 2
+    first_half_bolt = bottom_bolt[0:bolt_half + 1] + top_nut[nut_half::-1]
+    second_half_bolt = bottom_bolt[bolt_half:] + [bottom_bolt[0], top_nut[0]] + top_nut[:nut_half - 1:-1]
+    faces += [first_half_bolt[::-1], second_half_bolt[::-1]]
+
+    return FaceTemplate(faces)
+
+
+@functools.lru_cache(maxsize=None)
+def get_fill_template(hole_vertices, flip):
+    """
+    The two faces of fill_single_hole. The slots are the hole vertices, the three rim vertices of the pair
+    and the middle vertex.
+
+    :return: FaceTemplate
+    """
+    hole_verts = list(range(hole_vertices))
+    pair_verts = [hole_vertices, hole_vertices + 1, hole_vertices + 2]
+    middle_vert = hole_vertices + 3
+
+    circle_amount_half = hole_vertices // 2
+    first_half = hole_verts[0:circle_amount_half + 1] + [pair_verts[1], pair_verts[2], middle_vert]
+    second_half = hole_verts[circle_amount_half:] + [hole_verts[0], middle_vert, pair_verts[0], pair_verts[1]]
+    if flip:
+        return FaceTemplate([first_half[::-1], second_half[::-1]])
+    return FaceTemplate([first_half, second_half])
+
+
+def create_hat(wood_con, distance=20):
+    """
+    Same as create_mesh_functions.create_hat
+
+    :param wood_con: ArrayConnector
+    :param distance: distance from the middle vertex to the rim along the edges
+    """
+    # new vertices are ordered like [edge_vert, pair_vert, edge_vert, pair_verts, edge_vert]
+    dirs = wood_con.edge_dirs
+    dir_edge1 = dirs[:, :wood_con.pair_amount]
+    dir_edge2 = np.roll(dirs, -1, axis=1)[:, :wood_con.pair_amount]
+    dir_middle = normalized((dir_edge1 + dir_edge2) / 2)
+
+    rim_dirs = np.empty((wood_con.connector_amount, wood_con.pair_amount * 2, 3))
+    rim_dirs[:, 0::2] = dir_edge1
+    rim_dirs[:, 1::2] = dir_middle
+    if not wood_con.is_closed:
+        rim_dirs = np.concatenate((rim_dirs, dirs[:, -1:]), axis=1)
+
+    wood_con.top_rim_co = wood_con.middle_co[:, None] + distance * rim_dirs
+    wood_con.top_rim_verts = wood_con.add_verts(wood_con.top_rim_co)
+
+
+def create_thickness(wood_con, thickness=10):
+    """
+    Same as create_mesh_functions.create_thickness
+
+    :param wood_con: ArrayConnector
+    :param thickness: thickness of the connector, measured along the normal from the lowest rim vertex
+    """
+    av_normal = -1 * wood_con.av_normal
+    normal_sq = dot(av_normal, av_normal)
+
+    d = -1 * dot(av_normal, wood_con.middle_co)
+    planes = np.concatenate((av_normal, d[:, None]), axis=1)
+
+    # Find the point that is furthest from the middle point according to the normal vector
+    dists = np.abs(points_to_plane_via_dir(wood_con.top_rim_co, av_normal[:, None], planes[:, None]))
+    max_co = wood_con.top_rim_co[np.arange(wood_con.connector_amount), np.argmax(dists, axis=1)]
+
+    # Create new vertices that are the rim vertices extended along the normal vector
+    dn = -1 * dot(av_normal, max_co) - thickness * normal_sq
+    f_planes = np.concatenate((av_normal, dn[:, None]), axis=1)
+
+    dists = points_to_plane_via_dir(wood_con.top_rim_co, av_normal[:, None], f_planes[:, None])
+    wood_con.bottom_rim_co = wood_con.top_rim_co + dists[:, :, None] * av_normal[:, None]
+    wood_con.bottom_rim_verts = wood_con.add_verts(wood_con.bottom_rim_co)
+
+    dist = points_to_plane_via_dir(wood_con.middle_co, av_normal, f_planes)
+    wood_con.extended_middle_co = wood_con.middle_co + dist[:, None] * av_normal
+    wood_con.extended_middle = int(wood_con.add_verts(wood_con.extended_middle_co[:, None])[0])
+
+    top = wood_con.top_rim_verts.tolist()
+    bottom = wood_con.bottom_rim_verts.tolist()
+    for i in range(len(bottom) - 1):
+        wood_con.add_faces([(top[i], bottom[i], bottom[i + 1], top[i + 1])])
+
+    if wood_con.is_closed:
+        wood_con.add_faces([(top[-1], bottom[-1], bottom[0], top[0])])
+    else:
+        middle = wood_con.middle_vert
+        extended = wood_con.extended_middle
+        wood_con.add_faces([(middle, extended, bottom[0], top[0]), (top[-1], bottom[-1], extended, middle)])
+
+    wood_con.bottom_plane = f_planes
+
+
+def check_circle_vertices(bolt_vertices, nut_vertices):
+    """
+    The hole template splits the circles in two halves, so they need an even amount of vertices
+
+    :raises ValueError: when one of the circles has an odd amount or less than 4 vertices
+    """
+    if bolt_vertices % 2 or nut_vertices % 2 or min(bolt_vertices, nut_vertices) < 4:
+        raise ValueError("The bolt and nut circles need an even amount of at least 4 vertices, got " +
+                         str(bolt_vertices) + " and " + str(nut_vertices))
+
+
+def add_holes(wood_con, hole_radius=1.5, nut_radius=3, bolt_dist=4, location=5, bolt_thickness=2.5,
+              bolt_vertices=BOLT_VERTICES, nut_vertices=NUT_VERTICES):
+    """
+    Same as create_mesh_functions.add_holes, all the pairs of all the connectors are handled at once.
+    The unit circles are transformed by the stacked frames of all the pairs and the faces come from
+    the hole template, the hole vertices of every pair are one consecutive block.
+
+    :param wood_con: ArrayConnector
+    :param bolt_vertices: amount of vertices of the bolt circles
+    :param nut_vertices: amount of vertices of the nut circles, 6 gives the hexagon of a nut
+    """
+    check_circle_vertices(bolt_vertices, nut_vertices)
+
+    pair_co = wood_con.top_rim_co[:, wood_con.get_pair_indices(np.arange(wood_con.top_rim_co.shape[1]))]
+
+    y_new = normalized(pair_co[:, :, 2] - pair_co[:, :, 0])
+    x_new = normalized(wood_con.middle_co[:, None] - pair_co[:, :, 1])
+    z_new = normalized(np.cross(x_new, y_new))
+    co_middle = pair_co[:, :, 1] + x_new * location
+    b_planes = wood_con.bottom_plane[:, None]
+
+    # Calculate bolt distance
+    meas_co = co_middle - nut_radius * x_new
+    circle_dist = points_to_plane_via_dir(meas_co, z_new, b_planes)
+    circle_dist = np.where(circle_dist < 0, circle_dist + bolt_thickness, circle_dist - bolt_thickness)
+
+    # the circles are made per pair, so the pair axes get an extra axis for the circle points
+    xy_frames = np.stack((x_new, y_new), axis=2)
+    z_new = z_new[:, :, None]
+    co_middle = co_middle[:, :, None]
+    circle_dist = circle_dist[:, :, None, None]
+
+    # create pipe for bolt
+    bolt_circle = np.einsum("ck,gpkj->gpcj", get_circle_template(bolt_vertices), xy_frames)
+    top_bolt_co = co_middle + hole_radius * bolt_circle
+    bottom_bolt_co = top_bolt_co + circle_dist * z_new
+
+    # create pipe for nut
+    nut_circle = np.einsum("ck,gpkj->gpcj", get_circle_template(nut_vertices), xy_frames)
+    top_nut_co = co_middle + circle_dist * z_new + nut_radius * nut_circle
+    dists = points_to_plane_via_dir(top_nut_co, z_new, b_planes[:, :, None])
+    bottom_nut_co = top_nut_co + dists[..., None] * z_new
+
+    hole_verts = wood_con.add_verts(np.concatenate((top_bolt_co, bottom_bolt_co, top_nut_co, bottom_nut_co),
+                                                   axis=2))
+    wood_con.hole_verts = hole_verts
+    wood_con.top_bolt_verts = hole_verts[:, :bolt_vertices]
+    wood_con.bottom_bolt_verts = hole_verts[:, bolt_vertices:2 * bolt_vertices]
+    wood_con.top_nut_verts = hole_verts[:, 2 * bolt_vertices:2 * bolt_vertices + nut_vertices]
+    wood_con.bottom_nut_verts = hole_verts[:, 2 * bolt_vertices + nut_vertices:]
+
+    wood_con.add_face_block(*get_hole_template(bolt_vertices, nut_vertices).get_faces(hole_verts))
+
+
+def fill_hole_faces(wood_con):
+    top_pairs = wood_con.get_pair_indices(wood_con.top_rim_verts)
+    bottom_pairs = wood_con.get_pair_indices(wood_con.bottom_rim_verts)
+    pair_amount = wood_con.pair_amount
+
+    top_slots = np.concatenate((wood_con.top_bolt_verts, top_pairs,
+                                np.full((pair_amount, 1), wood_con.middle_vert)), axis=1)
+    bottom_slots = np.concatenate((wood_con.bottom_nut_verts, bottom_pairs,
+                                   np.full((pair_amount, 1), wood_con.extended_middle)), axis=1)
+
+    wood_con.add_face_block(*get_fill_template(wood_con.top_bolt_verts.shape[1], False).get_faces(top_slots))
+    wood_con.add_face_block(*get_fill_template(wood_con.bottom_nut_verts.shape[1], True).get_faces(bottom_slots))
+
+
+def get_frame_matrices(origin, axes):
+    """
+    Affine transformations from the mesh into the local frames of the connectors
+
+    :param origin: (G, 3) origin of every frame
+    :param axes: (G, 3, 3) x, y and z axis of every frame as rows
+    :return: (G, 4, 4) matrices that move a point p of the mesh to axes @ (p - origin)
+    """
+    matrices = np.zeros((len(origin), 4, 4))
+    matrices[:, :3, :3] = axes
+    matrices[:, :3, 3] = -np.einsum("gij,gj->gi", axes, origin)
+    matrices[:, 3, 3] = 1
+    return matrices
+
+
+def transform_points(matrices, points):
+    """
+
+    :param matrices: (G, 4, 4) affine matrices
+    :param points: (G, V, 3) points of every connector
+    :return: (G, V, 3) the points transformed by the matrix of their connector
+    """
+    return np.einsum("gij,gvj->gvi", matrices[:, :3, :3], points) + matrices[:, None, :3, 3]
+
+
+def get_frames(wood_con):
+    """
+    The frames of to_middle_point: the extended middle is the origin, the normal the z axis and the x axis
+    points to the first bottom rim vertex
+
+    :param wood_con: ArrayConnector after create_thickness
+    :return: (G, 3) origin, (G, 3, 3) x, y and z axis of every frame as rows
+    """
+    new_z = wood_con.av_normal
+    new_x = normalized(wood_con.bottom_rim_co[:, 0] - wood_con.extended_middle_co)
+    new_y = np.cross(new_z, new_x)
+    return wood_con.extended_middle_co, np.stack((new_x, new_y, new_z), axis=1)
+
+
+def to_middle_point(wood_con):
+    """
+    Moves the extended middle to the origin and rotates every connector so its normal becomes the z axis.
+    The frames are kept in frame_origin and frame_axes, the vertices of all the connectors are transformed
+    by their frame matrix in a single einsum.
+
+    :param wood_con: ArrayConnector
+    """
+    wood_con.frame_origin, wood_con.frame_axes = get_frames(wood_con)
+
+    matrices = get_frame_matrices(wood_con.frame_origin, wood_con.frame_axes)
+    wood_con.vert_blocks = [transform_points(matrices, wood_con.get_verts())]
@@ -1,62 +1,337 @@
 import bpy
 import bmesh
+import os
 import sys
 
-module_path = "E:/Programmeer projecten/wood_poly"
+# The folder of this script, WOOD_POLY_PATH can be set when the script is run from a text block in a .blend
+module_path = os.environ.get("WOOD_POLY_PATH", os.path.dirname(os.path.abspath(__file__)))
 if module_path not in sys.path:
     sys.path.insert(0, module_path)
 
 import blender_helper.collection_helper
+import blender_helper.array_collection_helper
+import blender_helper.half_edge_helper
 import blender_helper.print_helper
 import blender_helper.vector_helper
 import blender_helper.lin_alg_helper
+import blender_helper.instrument_helper
+import blender_helper.export_helper
+import blender_helper.blender_mesh_helper
+import blender_helper.weld_helper
 import create_mesh_functions
+import create_array_functions
+import connector_pipeline
+import connector_cache
+import connector_archive
 
-import importlib
-importlib.reload(blender_helper.collection_helper)
-importlib.reload(blender_helper.print_helper)
-importlib.reload(blender_helper.vector_helper)
-importlib.reload(blender_helper.lin_alg_helper)
-importlib.reload(create_mesh_functions)
+# Blender keeps imported modules until it is restarted. Set WOOD_POLY_RELOAD=1 while editing the helpers so every
+# run of the script picks up the changes, the helpers are reloaded before the modules that use them.
+if os.environ.get("WOOD_POLY_RELOAD"):
+    import importlib
 
+    for module in (blender_helper.collection_helper, blender_helper.array_collection_helper,
+                   blender_helper.half_edge_helper, blender_helper.print_helper, blender_helper.vector_helper,
+                   blender_helper.lin_alg_helper, blender_helper.instrument_helper, blender_helper.export_helper,
+                   blender_helper.blender_mesh_helper, blender_helper.weld_helper, create_mesh_functions,
+                   create_array_functions, connector_pipeline, connector_cache, connector_archive):
+        importlib.reload(module)
 
 import blender_helper.collection_helper as collection_helper
 import blender_helper.print_helper as print_helper
+import blender_helper.instrument_helper as instrument_helper
+import blender_helper.export_helper as export_helper
+import blender_helper.blender_mesh_helper as blender_mesh_helper
+from blender_helper.array_collection_helper import ArrayConnectionMesh
 
-if __name__ == "__main__":
+# Vertices closer than this are welded before the connectors are made, meshes from CAD often have split vertices
+# that open the fans. None uses the vertices of the mesh as they are.
+WELD_TOLERANCE = 1e-4
+# Resolution of the hole circles, see connector_pipeline.LEVELS_OF_DETAIL. The scene gets coarse circles so large
+# domes stay responsive in the viewport, exported files are made for printing.
+LEVEL_OF_DETAIL = "preview"
+EXPORT_LEVEL_OF_DETAIL = "print"
+# Largest amount of triangles of all the connectors together, the circles are made coarser to stay below it
+TRIANGLE_BUDGET = None
+# The array pipeline builds the connectors in a process pool, set to False to use the bmesh functions
+USE_ARRAY_PIPELINE = True
+PROCESSES = None
+# Vertices with the same fan share one generated mesh, set to None to generate every connector
+DEDUPE_TOLERANCE = 1e-3
+# Puts all the connectors in one mesh with a "connector" face attribute instead of an object for every vertex
+MERGE_CONNECTORS = False
+MERGE_SPACING = 60
+# Streams the connectors into this .stl, .3mf, .obj or .npz archive instead of creating objects, None creates them
+EXPORT_PATH = None
+EXPORT_SPACING = 60
+# Creates the objects from a modal operator: Blender stays responsive, the progress and the time left are shown
+# in the header and Esc stops the run while keeping the connectors that are done. Not used with MERGE_CONNECTORS.
+USE_MODAL_OPERATOR = True
+# Seconds between the updates of the operator and the longest time an update should take
+MODAL_TIMER_STEP = 0.1
+MODAL_TIME_SLICE = 0.05
+# Stage timings, counters and a cProfile profile of the run are written to this json file, None measures nothing
+INSTRUMENT_PATH = None
+# Generated connectors are kept in this folder and reused when the same fan comes back, None disables the cache
+CACHE_DIR = None
+CACHE_SIZE = 1 << 30
 
-    print("============== Starting script ====================")
 
-    obj = bpy.context.active_object
-    scene = bpy.context.scene
+def create_bmesh_connectors(obj, scene):
     or_bmesh = bmesh.new()
     or_bmesh.from_mesh(obj.data)
+    if WELD_TOLERANCE is not None:
+        bmesh.ops.remove_doubles(or_bmesh, verts=or_bmesh.verts, dist=WELD_TOLERANCE)
     or_colmesh = collection_helper.ConnectionMesh(or_bmesh)
 
     pair_dict = create_mesh_functions.get_edge_face_pairs(or_colmesh)
-    pair_dict = create_mesh_functions.sort_pair_list(pair_dict)
+    closed_dict = create_mesh_functions.get_closed_fans(or_colmesh)
+    bolt_vertices, nut_vertices = connector_pipeline.LEVELS_OF_DETAIL[LEVEL_OF_DETAIL]
 
     for vert, pairs in pair_dict.items():
         bm = bmesh.new()
         new_middle = bm.verts.new(vert.co)
-        # Boolean to check if the faces surrounding the vertex close
-        closed_pairs = pairs[0][0] == pairs[-1][1]
         av_normal = or_colmesh.vertex_normal[vert]
-        wood_con = blender_helper.collection_helper.WoodConnector(bm, new_middle, av_normal, pair_dict[vert])
-
-        create_mesh_functions.create_hat(wood_con)
-        create_mesh_functions.create_thickness(wood_con, thickness=7)
-        create_mesh_functions.add_holes(wood_con)
-        create_mesh_functions.fill_hole_faces(wood_con)
-        create_mesh_functions.to_middle_point(wood_con)
-
-        name = "hat_" + str(vert.index)
-        mesh = bpy.data.meshes.new("mesh")
-        obj = bpy.data.objects.new(name, mesh)
-        scene.objects.link(obj)
-        bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
-        bm.to_mesh(mesh)
-        bm.free()
+        wood_con = blender_helper.collection_helper.WoodConnector(bm, new_middle, av_normal, pair_dict[vert],
+                                                                  origin_index=vert.index)
+        # Boolean to check if the faces surrounding the vertex close
+        wood_con.set_closed_pair(closed_dict[vert])
+
+        with instrument_helper.stage("create_hat"):
+            create_mesh_functions.create_hat(wood_con)
+        with instrument_helper.stage("create_thickness"):
+            create_mesh_functions.create_thickness(wood_con, thickness=7)
+        with instrument_helper.stage("add_holes"):
+            create_mesh_functions.add_holes(wood_con, bolt_vertices=bolt_vertices, nut_vertices=nut_vertices)
+        with instrument_helper.stage("fill_hole_faces"):
+            create_mesh_functions.fill_hole_faces(wood_con)
+        with instrument_helper.stage("to_middle_point"):
+            create_mesh_functions.to_middle_point(wood_con)
+
+        with instrument_helper.stage("blender_objects"):
+            name = "hat_" + str(vert.index)
+            mesh = bpy.data.meshes.new("mesh")
+            obj = bpy.data.objects.new(name, mesh)
+            scene.objects.link(obj)
+            bmesh.ops.recalc_face_normals(bm, faces=bm.faces)
+            bm.to_mesh(mesh)
+            bm.free()
+        instrument_helper.count("connectors")
+
+
+def get_parameters(jobs, level):
+    """
+    The default parameters with the circles of the level of detail, made coarser when they don't fit the budget
+    """
+    parameters = connector_pipeline.get_detail_parameters(level)
+    if TRIANGLE_BUDGET is not None:
+        parameters = connector_pipeline.fit_triangle_budget(jobs, TRIANGLE_BUDGET, parameters)
+    return parameters
+
+
+def get_cache():
+    if CACHE_DIR is None:
+        return None
+    return connector_cache.ConnectorCache(bpy.path.abspath(CACHE_DIR), max_bytes=CACHE_SIZE)
+
+
+def export_array_connectors(obj, path):
+    """
+    Writes every connector to the file while it is generated, the scene is not changed
+    """
+    or_mesh = ArrayConnectionMesh.from_blender_mesh(obj.data, weld_tolerance=WELD_TOLERANCE)
+    jobs = connector_pipeline.get_connector_jobs(or_mesh)
+    parameters = get_parameters(jobs, EXPORT_LEVEL_OF_DETAIL)
+    results = connector_pipeline.generate_connectors(jobs, parameters, processes=PROCESSES, cache=get_cache())
+    if path.lower().endswith(".npz"):
+        amount = connector_archive.write_archive(bpy.path.abspath(path), results, parameters)
+    else:
+        amount = export_helper.write_results(results, bpy.path.abspath(path), spacing=EXPORT_SPACING)
+    print("Wrote " + str(amount) + " connectors to " + path)
+
+
+def get_groups(obj):
+    """
+
+    :return: [ConnectorJob, ...], [ConnectorGroup, ...] a group for every job when DEDUPE_TOLERANCE is None
+    """
+    or_mesh = ArrayConnectionMesh.from_blender_mesh(obj.data, weld_tolerance=WELD_TOLERANCE)
+    jobs = connector_pipeline.get_connector_jobs(or_mesh)
+
+    if DEDUPE_TOLERANCE is None:
+        groups = [connector_pipeline.ConnectorGroup(None, [job]) for job in jobs]
+    else:
+        groups = connector_pipeline.group_jobs(jobs, tolerance=DEDUPE_TOLERANCE)
+    print("Connector types: " + str(len(groups)) + " for " + str(len(jobs)) + " vertices")
+    return jobs, groups
+
+
+def create_group_objects(type_index, group, result):
+    """
+    The mesh of a connector type and an object for every vertex of the group, the objects are not linked yet
+
+    :return: [bpy.types.Object, ...]
+    """
+    with instrument_helper.stage("blender_objects"):
+        mesh = blender_mesh_helper.new_mesh("connector_" + str(type_index), result.verts, result.face_offsets,
+                                            result.face_indices)
+
+        # all the vertices of the group share the mesh (linked duplicates)
+        objects = [bpy.data.objects.new("hat_" + str(job.index), mesh) for job in group.jobs]
+    instrument_helper.record("group_size", [group.get_count()])
+    return objects
+
+
+def create_array_connectors(obj, scene):
+    """
+    The connectors are generated without touching bpy, only the objects are created here in one serial step
+    """
+    jobs, groups = get_groups(obj)
+    objects = []
+    for type_index, (group, result) in enumerate(
+            connector_pipeline.generate_connector_groups(groups, get_parameters(jobs, LEVEL_OF_DETAIL),
+                                                         processes=PROCESSES, cache=get_cache())):
+        objects += create_group_objects(type_index, group, result)
+
+    with instrument_helper.stage("blender_link"):
+        blender_mesh_helper.link_objects(scene, objects)
+
+
+def create_merged_connectors(obj, scene):
+    """
+    All the connectors in a single object, the faces store the index of their vertex in the "connector" attribute
+    """
+    or_mesh = ArrayConnectionMesh.from_blender_mesh(obj.data, weld_tolerance=WELD_TOLERANCE)
+    jobs = connector_pipeline.get_connector_jobs(or_mesh)
+    results = connector_pipeline.generate_connectors(jobs, get_parameters(jobs, LEVEL_OF_DETAIL), processes=PROCESSES,
+                                                     cache=get_cache())
+    verts, face_offsets, face_indices, face_vertex = connector_pipeline.merge_results(results,
+                                                                                      spacing=MERGE_SPACING)
+
+    with instrument_helper.stage("blender_objects"):
+        mesh = blender_mesh_helper.new_mesh("connectors", verts, face_offsets, face_indices)
+        blender_mesh_helper.set_face_attribute(mesh, "connector", face_vertex)
+        blender_mesh_helper.link_objects(scene, [bpy.data.objects.new("connectors", mesh)])
+    print("Merged " + str(len(jobs)) + " connectors")
+
+
+class OBJECT_OT_wood_poly_connectors(bpy.types.Operator):
+    """Create the connectors of the active object in the background, Esc stops and keeps the finished ones"""
+    bl_idname = "object.wood_poly_connectors"
+    bl_label = "Create Wood Poly Connectors"
+
+    def invoke(self, context, event):
+        jobs, groups = get_groups(context.active_object)
+        # the numeric work is done by the worker pool of BackgroundGeneration, bpy is only used in modal
+        self.generation = connector_pipeline.BackgroundGeneration(groups, get_parameters(jobs, LEVEL_OF_DETAIL),
+                                                                  processes=PROCESSES)
+        self.generation.start()
+        self.objects = []
+        self.type_amount = 0
+
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(MODAL_TIMER_STEP, window=context.window)
+        window_manager.progress_begin(0, max(self.generation.total, 1))
+        window_manager.modal_handler_add(self)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type == "ESC":
+            self.generation.cancel()
+            self.finish(context)
+            self.report({"WARNING"}, "Stopped, kept " + str(len(self.objects)) + " of " +
+                        str(self.generation.total) + " connectors")
+            return {"CANCELLED"}
+        if event.type != "TIMER":
+            return {"PASS_THROUGH"}
+
+        for group, result in self.generation.poll(MODAL_TIME_SLICE):
+            self.objects += create_group_objects(self.type_amount, group, result)
+            self.type_amount += 1
+
+        context.window_manager.progress_update(self.generation.done)
+        set_header_text(context, get_progress_text(self.generation))
+        if self.generation.is_finished():
+            self.finish(context)
+            self.report({"INFO"}, "Created " + str(len(self.objects)) + " connectors")
+            return {"FINISHED"}
+        return {"RUNNING_MODAL"}
+
+    def cancel(self, context):
+        # Blender stops the operator, for example when the file is closed
+        self.generation.cancel()
+        self.finish(context)
+
+    def finish(self, context):
+        """
+        Links the objects that were made, also when the run was stopped
+        """
+        context.window_manager.event_timer_remove(self.timer)
+        context.window_manager.progress_end()
+        set_header_text(context, None)
+        with instrument_helper.stage("blender_link"):
+            blender_mesh_helper.link_objects(context.scene, self.objects)
+        save_instrumentation()
+
+
+def get_progress_text(generation):
+    text = "Connectors " + str(generation.done) + " / " + str(generation.total)
+    eta = generation.get_eta()
+    if eta is not None:
+        text += ", " + str(int(round(eta))) + " s left"
+    return text + ", Esc to stop"
+
+
+def set_header_text(context, text):
+    if context.area is None:
+        return
+    if text is None and bpy.app.version < (2, 80, 0):
+        # before 2.80 the header text is cleared by calling without arguments
+        context.area.header_text_set()
+    else:
+        context.area.header_text_set(text)
+    context.area.tag_redraw()
+
+
+def register():
+    # running the script again replaces the operator of the previous run
+    if hasattr(bpy.types, OBJECT_OT_wood_poly_connectors.__name__):
+        bpy.utils.unregister_class(getattr(bpy.types, OBJECT_OT_wood_poly_connectors.__name__))
+    bpy.utils.register_class(OBJECT_OT_wood_poly_connectors)
+
+
+def save_instrumentation():
+    if INSTRUMENT_PATH is not None and instrument_helper.is_enabled():
+        instrument_helper.save_summary(bpy.path.abspath(INSTRUMENT_PATH), instrument_helper.disable())
+        print("Instrumentation written to " + INSTRUMENT_PATH)
+
+
+if __name__ == "__main__":
+
+    print("============== Starting script ====================")
+
+    obj = bpy.context.active_object
+    scene = bpy.context.scene
+    if INSTRUMENT_PATH is not None:
+        instrument_helper.enable(profile=True)
+
+    # a modal operator gets no events when Blender runs in the background, the objects are made directly then
+    use_modal = EXPORT_PATH is None and USE_ARRAY_PIPELINE and not MERGE_CONNECTORS and USE_MODAL_OPERATOR and \
+        not bpy.app.background
+
+    if EXPORT_PATH is not None:
+        export_array_connectors(obj, EXPORT_PATH)
+    elif USE_ARRAY_PIPELINE and MERGE_CONNECTORS:
+        create_merged_connectors(obj, scene)
+    elif use_modal:
+        # the operator keeps running after the script, it saves the instrumentation when it is done
+        register()
+        bpy.ops.object.wood_poly_connectors("INVOKE_DEFAULT")
+    elif USE_ARRAY_PIPELINE:
+        create_array_connectors(obj, scene)
+    else:
+        create_bmesh_connectors(obj, scene)
 
+    if not use_modal:
+        save_instrumentation()
 
     print("============== End script ====================")
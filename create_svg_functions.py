@@ -1,2 +1,718 @@
-def pack_tris(mesh):
-    pass
\ No newline at end of file
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import math
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import create_array_functions
+from blender_helper import bvh_helper, instrument_helper, sheet_export_helper
+
+# skyline drops the real outlines on the height map so triangles interlock, boxes only uses the bounding boxes
+# and places them bottom left
+HEURISTICS = ("skyline", "boxes")
+# a position is scored by the top of the part plus this times the average gap between the part and the skyline,
+# without the gaps the parts that interlock lose against the ones that are just a bit lower
+GAP_WEIGHT = 4.0
+# columns of a block of the bounds in Sheet.find_position, a power of two
+BOUND_BLOCK = 8
+# longest miter of the grown outlines in units of the grow distance, sharper corners are beveled. Without
+# the limit the corner of a sliver grows by distance / sin(half its angle) and the part no longer fits anywhere.
+MITER_LIMIT = 2.0
+
+
+class PartShape:
+    """
+    The rotations that are tried for one outline. Every rotation is moved so its bounding box starts at (0, 0)
+    and stores the lowest and the highest point of the outline on the column borders of the sheet grid.
+    The lowest points of all the rotations are also stacked, so a sheet scores every rotation at once.
+    See get_part_shapes.
+    """
+    def __init__(self, angles, area, shifts, heights, columns, lower, upper):
+        """
+
+        :param angles: [angle, ...] rotations in radians that are tried
+        :param area: area of the outline
+        :param shifts: (R, 2) moves the rotated outlines to (0, 0)
+        :param heights: (R) heights of the rotated outlines
+        :param columns: (R) amount of columns of the rotated outlines
+        :param lower: (R, W + 1) lowest point on the column borders, only the first columns + 1 are used
+        :param upper: (R, W + 1) highest point on the column borders
+        """
+        self.area = area
+        self.rotations = [(angle, shift, height, low[:amount + 1], high[:amount + 1])
+                          for angle, shift, height, low, high, amount in zip(angles, shifts, heights, lower, upper,
+                                                                              columns.tolist())]
+        # (R) column borders of every rotation, (R, W) their lowest points with inf after the borders
+        self.spans = columns + 1
+        self.lower = np.where(np.arange(lower.shape[1]) < self.spans[:, None], lower, np.inf)
+        self.lower_sums = np.array([rotation[3].sum() for rotation in self.rotations])
+        self.heights = heights
+        self.min_height = heights.min()
+
+        # (R, K) lowest and highest of the lowest points in blocks of BOUND_BLOCK borders. Blocks after the borders
+        # have no lowest point, blocks that are not complete no highest one.
+        block_amount = -(-lower.shape[1] // BOUND_BLOCK)
+        blocks = np.full((len(angles), block_amount * BOUND_BLOCK), np.inf)
+        blocks[:, :lower.shape[1]] = self.lower
+        blocks = blocks.reshape(len(angles), block_amount, BOUND_BLOCK)
+        self.block_low = blocks.min(axis=2)
+        self.block_high = np.where(np.arange(1, block_amount + 1) * BOUND_BLOCK <= self.spans[:, None],
+                                   blocks.max(axis=2), np.inf)
+
+
+class Placement:
+    """
+    Where a part ended up, the outline on the sheet is the part outline rotated by angle and moved by offset
+    """
+    def __init__(self, part, sheet, angle, offset, points):
+        self.part = part
+        self.sheet = sheet
+        self.angle = angle
+        self.offset = offset
+        self.points = points
+
+
+class Sheet:
+    """
+    The skyline of a sheet is a height map with the highest used point on every column border, a new part is
+    dropped from the top until its lowest points touch it. The space under overhanging parts is not used again.
+    """
+    def __init__(self, index, width, height, margin, resolution, gap_weight=GAP_WEIGHT):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.margin = margin
+        self.resolution = resolution
+        self.gap_weight = gap_weight
+        self.usable_height = height - 2 * margin
+        borders = get_column_amount(width - 2 * margin, resolution, math.floor) + 1
+        # the height map is followed by borders that are too high for any part, so the windows of the widest
+        # rotation can start on every border and the parts that stick out of the sheet are never placed
+        self.padded_heights = np.full(2 * borders + BOUND_BLOCK, self.usable_height + 1.0)
+        self.heights = self.padded_heights[:borders]
+        self.heights[:] = 0.0
+        self.placements = []
+        self.used_area = 0.0
+        # the skyline only grows, a shape that did not fit will never fit again
+        self.failed_shapes = set()
+        # views of the padded height map for every part width, they follow the changes of the height map
+        self.windows = {}
+        # sums and block maxima of the height map, see get_height_tables. They are made again after a part is added.
+        self.height_tables = None
+
+    def get_height_tables(self):
+        """
+
+        :return: (P + 1) prefix sums of the padded height map, (B, K) highest border of the K blocks of
+                 BOUND_BLOCK borders of a part that starts on every border
+        """
+        if self.height_tables is None:
+            sums = np.concatenate(([0.0], np.cumsum(self.padded_heights)))
+            # maxima of 2, 4 and 8 following borders
+            block_max = self.padded_heights
+            step = 1
+            while step < BOUND_BLOCK:
+                block_max = np.maximum(block_max[:-step], block_max[step:])
+                step *= 2
+            block_amount = (len(block_max) - len(self.heights)) // BOUND_BLOCK + 1
+            self.height_tables = (sums, sliding_window_view(block_max, (block_amount - 1) * BOUND_BLOCK + 1)
+                                  [:len(self.heights), ::BOUND_BLOCK])
+        return self.height_tables
+
+    def find_position(self, shape):
+        """
+        Best scored position over all the rotations and columns, see GAP_WEIGHT. The leftmost column wins a tie.
+
+        :param shape: PartShape
+        :return: (score, rotation index, column, bottom), None if the part does not fit
+        """
+        if id(shape) in self.failed_shapes:
+            return None
+        # every column of the part is at least on the lowest point of the skyline
+        lowest = self.heights.min()
+        if lowest + shape.min_height > self.usable_height:
+            return None
+
+        borders = len(self.heights)
+        fits = (shape.spans <= borders) & (lowest + shape.heights <= self.usable_height)
+        best = None
+        if fits.any():
+            # the bottom of a part is the highest border minus the lowest point of the part above it. With the
+            # highest border of every block of the part it is known up to the range of the lowest points in the
+            # block. Only the positions whose lowest score can beat the highest score of a position that surely
+            # fits get their exact bottom.
+            sums, block_max = self.get_height_tables()
+            block_amount = shape.block_low.shape[1]
+            block_max = block_max[:, :block_amount]
+            low_bottom = (block_max[None] - shape.block_high[:, None, :block_max.shape[1]]).max(axis=2)
+            high_bottom = (block_max[None] - shape.block_low[:, None, :block_max.shape[1]]).max(axis=2)
+
+            starts = np.arange(borders)
+            spans = shape.spans[:, None]
+            tops = shape.heights[:, None]
+            under = (shape.lower_sums[:, None] - (sums[starts + spans] - sums[starts])) / spans
+            possible = fits[:, None] & (low_bottom + tops <= self.usable_height)
+            sure = possible & (high_bottom + tops <= self.usable_height)
+            base = tops + self.gap_weight * under
+            bound = ((1 + self.gap_weight) * high_bottom + base)[sure].min(initial=np.inf)
+            rotation_indices, columns = np.nonzero(possible & ((1 + self.gap_weight) * low_bottom + base <=
+                                                               bound + 1e-6))
+
+            width = min(shape.lower.shape[1], borders)
+            if width not in self.windows:
+                self.windows[width] = sliding_window_view(self.padded_heights, width)[:borders]
+            # the positions that are not checked are too high
+            bottoms = np.full((len(shape.spans), borders), self.usable_height + 1.0)
+            bottoms[rotation_indices, columns] = (self.windows[width][columns] -
+                                                  shape.lower[rotation_indices, :width]).max(axis=1)
+            tops = bottoms + tops
+            scores = np.where(tops > self.usable_height, np.inf, tops + self.gap_weight * (bottoms + under))
+            columns = np.argmin(scores, axis=1)
+            for rotation_index, column in enumerate(columns.tolist()):
+                score = scores[rotation_index, column]
+                if score != np.inf and (best is None or score < best[0] - 1e-9):
+                    best = (score, rotation_index, column, bottoms[rotation_index, column])
+        if best is None:
+            self.failed_shapes.add(id(shape))
+        return best
+
+    def add(self, part, outline, shape, position):
+        """
+        Places the part at a position from find_position and raises the skyline under it
+
+        :return: Placement
+        """
+        score, rotation_index, column, bottom = position
+        angle, shift, height, lower, upper = shape.rotations[rotation_index]
+        end = column + len(upper)
+        self.heights[column:end] = np.maximum(self.heights[column:end], bottom + upper)
+        self.height_tables = None
+
+        offset = shift + (self.margin + column * self.resolution, self.margin + bottom)
+        placement = Placement(part, self.index, angle, offset, rotate_points(outline, angle) + offset)
+        self.placements.append(placement)
+        self.used_area += shape.area
+        return placement
+
+    def get_utilization(self):
+        return self.used_area / (self.width * self.height)
+
+
+class Packing:
+    """
+    Result of pack_tris
+    """
+    def __init__(self, sheets, placements, unplaced, heuristic):
+        """
+
+        :param sheets: [Sheet, ...]
+        :param placements: [Placement, ...] in the order of the parts, None for the parts that did not fit
+        :param unplaced: [part index, ...] of the parts that are larger than a sheet
+        """
+        self.sheets = sheets
+        self.placements = placements
+        self.unplaced = unplaced
+        self.heuristic = heuristic
+
+    def get_utilization(self):
+        """
+
+        :return: area of the parts / area of all the used sheets
+        """
+        if not self.sheets:
+            return 0.0
+        sheet_area = self.sheets[0].width * self.sheets[0].height
+        return sum(sheet.used_area for sheet in self.sheets) / (sheet_area * len(self.sheets))
+
+    def get_report(self):
+        """
+
+        :return: dict that can be stored as json
+        """
+        return {
+            "heuristic": self.heuristic,
+            "parts": len(self.placements),
+            "sheets": len(self.sheets),
+            "unplaced": self.unplaced,
+            "utilization": self.get_utilization(),
+            "sheet_utilization": [sheet.get_utilization() for sheet in self.sheets],
+        }
+
+
+def get_column_amount(width, resolution, rounding=math.ceil):
+    return max(int(rounding(width / resolution - 1e-9)), 1)
+
+
+def rotate_points(points, angle):
+    cos, sin = math.cos(angle), math.sin(angle)
+    return points @ np.array([[cos, sin], [-sin, cos]])
+
+
+def get_polygon_area(points):
+    x, y = points[:, 0], points[:, 1]
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(y, np.roll(x, -1))) / 2
+
+
+def get_convex_hull(points):
+    """
+    Monotone chain
+
+    :param points: (n, 2) points
+    :return: (h, 2) corners of the convex hull, counterclockwise
+    """
+    points = np.asarray(points, dtype=np.float64)
+    points = points[np.lexsort((points[:, 1], points[:, 0]))]
+    points = points[np.concatenate(([True], (points[1:] != points[:-1]).any(axis=1)))]
+    if len(points) < 3:
+        return points
+
+    def half_hull(ordered):
+        hull = []
+        for point in ordered:
+            while len(hull) >= 2 and ((hull[-1][0] - hull[-2][0]) * (point[1] - hull[-2][1]) -
+                                      (hull[-1][1] - hull[-2][1]) * (point[0] - hull[-2][0])) <= 0:
+                hull.pop()
+            hull.append(point)
+        return hull[:-1]
+
+    ordered = points.tolist()
+    return np.array(half_hull(ordered) + half_hull(ordered[::-1]))
+
+
+def get_rotation_angles(outline, max_rotations=8):
+    """
+    Straight sides are the best candidates to lie against the skyline, so every side of the convex hull
+    is tried at the bottom and at the top. Outlines with many sides only use their longest sides.
+
+    :param outline: (n, 2) points
+    :param max_rotations: largest amount of angles
+    :return: [angle, ...] in radians
+    """
+    hull = get_convex_hull(outline)
+    if len(hull) < 3:
+        return [0.0]
+    sides = np.roll(hull, -1, axis=0) - hull
+    order = np.argsort(-np.linalg.norm(sides, axis=1), kind="stable")
+
+    angles = []
+    for side in order:
+        angle = -math.atan2(sides[side, 1], sides[side, 0])
+        for candidate in (angle % (2 * math.pi), (angle + math.pi) % (2 * math.pi)):
+            if all(abs((candidate - other + math.pi) % (2 * math.pi) - math.pi) > 1e-6 for other in angles):
+                angles.append(candidate)
+        if len(angles) >= max_rotations:
+            break
+    return angles[:max_rotations]
+
+
+def get_envelopes(points, resolution):
+    """
+    Lowest and highest point of the rotated outlines on the column borders. Between two borders the outline is
+    taken as the straight line between those values, that is exact for sides that cross the whole column.
+    The borders of a column with a corner inside it are moved out to the corner, so the straight lines
+    always stay outside of the outline.
+
+    :param points: (R, n, 2) rotations of an outline that start at x = 0
+    :param resolution: width of a column
+    :return: (R) amount of columns w of every rotation, (R, W + 1) lowest y, (R, W + 1) highest y,
+             the values after the w + 1 borders of a rotation are not used
+    """
+    width = points[..., 0].max(axis=1)
+    columns = np.maximum(np.ceil(width / resolution - 1e-9).astype(np.int64), 1)
+    border_amount = columns.max() + 1
+    borders = np.minimum(np.arange(border_amount) * resolution, width[:, None])
+    samples = np.concatenate((borders, points[..., 0]), axis=1)[..., None]
+
+    start = points[:, None]
+    end = np.roll(points, -1, axis=1)[:, None]
+    step = end[..., 0] - start[..., 0]
+    slanted = step != 0
+    t = (samples - start[..., 0]) / np.where(slanted, step, 1.0)
+    y = start[..., 1] + t * (end[..., 1] - start[..., 1])
+    inside = slanted & (samples >= np.minimum(start[..., 0], end[..., 0])) & \
+        (samples <= np.maximum(start[..., 0], end[..., 0]))
+    sample_low = np.where(inside, y, np.inf).min(axis=2)
+    sample_high = np.where(inside, y, -np.inf).max(axis=2)
+
+    lower = sample_low[:, :border_amount].copy()
+    upper = sample_high[:, :border_amount].copy()
+    rows = np.arange(len(points))[:, None]
+    corner_columns = np.clip(np.floor(points[..., 0] / resolution).astype(np.int64), 0, columns[:, None] - 1)
+    for border in (corner_columns, corner_columns + 1):
+        np.minimum.at(lower, (rows, border), sample_low[:, border_amount:])
+        np.maximum.at(upper, (rows, border), sample_high[:, border_amount:])
+    return columns, lower, upper
+
+
+def offset_polygon(points, distance, miter_limit=MITER_LIMIT):
+    """
+    Moves every side outwards by distance, the corners are mitered so the result contains every point
+    that is closer than distance to the polygon. Convex corners whose miter would reach further than
+    miter_limit times distance are beveled: the miter is cut off there, which leaves two points.
+
+    :param points: (n, 2) corners of a simple polygon
+    :param miter_limit: longest miter in units of distance, at least 1
+    :return: (m, 2) corners of the grown polygon, n <= m <= 2n
+    """
+    if distance == 0 or len(points) < 3:
+        return points
+    corners, bevel = offset_polygons(points[None], distance, miter_limit)
+    return corners[0][np.stack((np.ones(len(points), dtype=bool), bevel[0]), axis=1)]
+
+
+def offset_polygons(points, distance, miter_limit=MITER_LIMIT):
+    """
+    offset_polygon for polygons with the same amount of corners at once. Every corner gives two points,
+    they are the same when the corner is not beveled.
+
+    :param points: (P, n, 2) corners of simple polygons
+    :return: (P, n, 2, 2) the two points of every corner, (P, n) bool if the corner is beveled
+    """
+    bevel = np.zeros(points.shape[:2], dtype=bool)
+    if distance == 0 or points.shape[1] < 3:
+        return np.repeat(points[:, :, None], 2, axis=2), bevel
+    sides = np.roll(points, -1, axis=1) - points
+    # outwards is to the right of the sides of a counterclockwise polygon
+    x, y = points[..., 0], points[..., 1]
+    orientation = np.where(np.einsum("pi,pi->p", x, np.roll(y, -1, axis=1)) -
+                           np.einsum("pi,pi->p", y, np.roll(x, -1, axis=1)) > 0, 1.0, -1.0)[:, None]
+    normals = orientation[..., None] * np.stack((sides[..., 1], -sides[..., 0]), axis=2)
+    normals /= np.maximum(np.linalg.norm(normals, axis=2, keepdims=True), 1e-12)
+    previous = np.roll(normals, 1, axis=1)
+    normal_dot = np.einsum("pij,pij->pi", normals, previous)
+    miter = (normals + previous) / np.maximum(1 + normal_dot, 1e-6)[..., None]
+    corners = np.repeat((points + distance * miter)[:, :, None], 2, axis=2)
+
+    # the miter is 1 / cos(half the angle between the normals) long, concave corners keep it
+    previous_sides = np.roll(sides, 1, axis=1)
+    convex = orientation * (previous_sides[..., 0] * sides[..., 1] - previous_sides[..., 1] * sides[..., 0]) > 0
+    bevel = convex & (1 + normal_dot < 2 / miter_limit ** 2)
+    if not bevel.any():
+        return corners, bevel
+
+    # the cut is perpendicular to the bisector, miter_limit * distance away from the corner. A spike that turns
+    # around completely has no bisector of the normals, it points along the side that leads into it.
+    bisector = normals[bevel] + previous[bevel]
+    length = np.linalg.norm(bisector, axis=1, keepdims=True)
+    lead_in = previous_sides[bevel] / np.maximum(np.linalg.norm(previous_sides[bevel], axis=1, keepdims=True), 1e-12)
+    bisector = np.where(length > 1e-9, bisector / np.maximum(length, 1e-12), lead_in)
+    # across is the direction along the cut towards the previous side, the cut ends on both offset sides
+    cos_half = np.einsum("ij,ij->i", previous[bevel], bisector)[:, None]
+    across = previous[bevel] - cos_half * bisector
+    sin_half = np.linalg.norm(across, axis=1, keepdims=True)
+    across /= np.maximum(sin_half, 1e-12)
+    half_width = (1 - miter_limit * cos_half) / np.maximum(sin_half, 1e-12)
+
+    corners[bevel, 0] = points[bevel] + distance * (miter_limit * bisector + half_width * across)
+    corners[bevel, 1] = points[bevel] + distance * (miter_limit * bisector - half_width * across)
+    return corners, bevel
+
+
+def get_part_shapes(outlines, angle_lists, resolution, spacing, heuristic, batch_size=256):
+    """
+    The PartShape of every outline. The outlines with the same amount of corners and of rotations are grown,
+    rotated and sampled together, batch_size outlines at a time.
+
+    :param outlines: [(n, 2) points, ...]
+    :param angle_lists: [[angle, ...], ...] the rotations that are tried for every outline
+    :param resolution: width of a column of the sheet grid
+    :param spacing: free space that is kept between the parts, every part is grown by half of it
+    :param heuristic: one of HEURISTICS
+    :return: [PartShape, ...]
+    """
+    batches = {}
+    for index, (outline, angles) in enumerate(zip(outlines, angle_lists)):
+        batches.setdefault((len(outline), len(angles)), []).append(index)
+
+    shapes = [None] * len(outlines)
+    for indices in batches.values():
+        for start in range(0, len(indices), batch_size):
+            batch = indices[start:start + batch_size]
+            points = np.stack([outlines[index] for index in batch])
+            angles = np.array([angle_lists[index] for index in batch], dtype=np.float64)
+
+            # the corners that are not beveled are there twice, that does not change the envelopes
+            corners = offset_polygons(points, spacing / 2)[0]
+            cos, sin = np.cos(angles), np.sin(angles)
+            matrices = np.stack((np.stack((cos, sin), axis=2), np.stack((-sin, cos), axis=2)), axis=2)
+            rotated = corners.reshape(len(batch), 1, -1, 2) @ matrices
+            shifts = -rotated.min(axis=2)
+            rotated += shifts[:, :, None]
+            widths, heights = rotated[..., 0].max(axis=2), rotated[..., 1].max(axis=2)
+            if heuristic == "boxes":
+                columns = np.maximum(np.ceil(widths / resolution - 1e-9).astype(np.int64), 1)
+                lower = np.zeros(columns.shape + (columns.max() + 1,))
+                upper = np.repeat(heights[..., None], columns.max() + 1, axis=2)
+            else:
+                columns, lower, upper = get_envelopes(rotated.reshape((-1,) + rotated.shape[2:]), resolution)
+                columns = columns.reshape(rotated.shape[:2])
+                lower = lower.reshape(rotated.shape[:2] + (-1,))
+                upper = upper.reshape(rotated.shape[:2] + (-1,))
+
+            for number, index in enumerate(batch):
+                width = columns[number].max() + 1
+                shapes[index] = PartShape(angle_lists[index], get_polygon_area(outlines[index]), shifts[number],
+                                          heights[number], columns[number], lower[number, :, :width],
+                                          upper[number, :, :width])
+    return shapes
+
+
+def get_shape_key(outline):
+    return np.round(outline - outline.min(axis=0), 6).tobytes()
+
+
+@instrument_helper.timed("pack")
+def pack_tris(outlines, sheet_width, sheet_height, margin=5.0, spacing=2.0, resolution=None, heuristic="skyline",
+              rotate=True, max_rotations=8, open_sheets=2):
+    """
+    Nests the flattened parts on sheets. The parts are sorted by area and every part is dropped on the skyline
+    of the first open sheet where it fits, in the rotation and column with the best score. Older sheets
+    are closed when more than open_sheets are in use, so the time per part does not grow with the sheets.
+
+    :param outlines: [(n, 2) points, ...] for example from get_face_outlines or get_connector_outlines
+    :param sheet_width: width of the sheets
+    :param sheet_height: height of the sheets
+    :param margin: free border of the sheets
+    :param spacing: free space between the parts, for the kerf
+    :param resolution: width of a column of the skyline, by default 1/500 of the sheet width
+    :param heuristic: one of HEURISTICS
+    :param rotate: try the rotations from get_rotation_angles, otherwise the parts keep their orientation
+    :param max_rotations: amount of rotations that are tried for every part
+    :param open_sheets: amount of sheets that still get parts
+    :return: Packing
+    """
+    if heuristic not in HEURISTICS:
+        raise ValueError("Unknown heuristic " + str(heuristic) + ", use one of " + ", ".join(HEURISTICS))
+    if resolution is None:
+        resolution = (sheet_width - 2 * margin) / 500
+
+    outlines = [np.asarray(outline, dtype=np.float64) for outline in outlines]
+    # equal outlines share their shape
+    shape_dict = {}
+    part_shape_index = [shape_dict.setdefault(get_shape_key(outline), len(shape_dict)) for outline in outlines]
+    first_parts = {}
+    for part, shape_index in enumerate(part_shape_index):
+        first_parts.setdefault(shape_index, part)
+    shape_outlines = [outlines[first_parts[shape_index]] for shape_index in range(len(shape_dict))]
+    angle_lists = [get_rotation_angles(outline, max_rotations) if rotate else [0.0] for outline in shape_outlines]
+    shapes = get_part_shapes(shape_outlines, angle_lists, resolution, spacing, heuristic)
+    part_shapes = [shapes[shape_index] for shape_index in part_shape_index]
+    instrument_helper.count("pack.shapes", len(shapes))
+
+    order = sorted(range(len(outlines)), key=lambda part: -part_shapes[part].area)
+    sheets = []
+    placements = [None] * len(outlines)
+    unplaced = []
+    for part in order:
+        shape = part_shapes[part]
+        for sheet in sheets[-open_sheets:]:
+            position = sheet.find_position(shape)
+            if position is not None:
+                break
+        else:
+            sheet = Sheet(len(sheets), sheet_width, sheet_height, margin, resolution,
+                          GAP_WEIGHT if heuristic == "skyline" else 0.0)
+            position = sheet.find_position(shape)
+            if position is None:
+                unplaced.append(part)
+                continue
+            sheets.append(sheet)
+        placements[part] = sheet.add(part, outlines[part], shape, position)
+
+    instrument_helper.count("pack.sheets", len(sheets))
+    return Packing(sheets, placements, unplaced, heuristic)
+
+
+def get_face_outlines(mesh):
+    """
+    Every face of the mesh flattened in its own plane, the longest side lies on the x axis so equal faces
+    get equal outlines
+
+    :param mesh: ArrayConnectionMesh
+    :return: [(n, 2) points, ...] for every face
+    """
+    offsets = mesh.faces.offsets
+    sizes = np.diff(offsets)
+    outlines = [None] * len(sizes)
+    for size in np.unique(sizes):
+        faces = np.nonzero(sizes == size)[0]
+        co = mesh.coords[mesh.faces.indices[offsets[faces][:, None] + np.arange(size)]]
+        sides = np.roll(co, -1, axis=1) - co
+        longest = np.argmax(np.linalg.norm(sides, axis=2), axis=1)
+        rows = np.arange(len(faces))
+
+        x_axis = sides[rows, longest]
+        x_axis /= np.linalg.norm(x_axis, axis=1, keepdims=True)
+        y_axis = np.cross(mesh.face_normal[faces], x_axis)
+        relative = co - co[rows, longest][:, None]
+        points = np.stack((np.einsum("fvj,fj->fv", relative, x_axis), np.einsum("fvj,fj->fv", relative, y_axis)),
+                          axis=2)
+        for face, face_points in zip(faces, points):
+            outlines[face] = face_points
+    return outlines
+
+
+def get_connector_outlines(results):
+    """
+    to_middle_point turns every connector so its normal is the z axis, the outline is the convex hull
+    of the vertices seen from above
+
+    :param results: iterable of connector_pipeline.ConnectorResult
+    :return: [(n, 2) points, ...]
+    """
+    return [get_convex_hull(result.verts[:, :2]) for result in results]
+
+
+def get_connector_holes(results, hole_radius=1.5, bolt_vertices=create_array_functions.BOLT_VERTICES,
+                        nut_vertices=create_array_functions.NUT_VERTICES):
+    """
+    Centers of the bolt holes seen from above, like get_connector_outlines. add_holes adds the hole vertices
+    last, every pair has the bolt circles and then the nut circles, the top bolt circle comes first.
+    The holes are exact circles, so the connectors can be generated with the coarsest circles.
+
+    :param results: iterable of connector_pipeline.ConnectorResult
+    :param hole_radius: radius of the bolt holes
+    :param bolt_vertices: amount of vertices of the bolt circles the connectors were generated with
+    :param nut_vertices: amount of vertices of the nut circles
+    :return: [(pairs, 3) center x, center y and radius, ...]
+    """
+    pair_size = 2 * bolt_vertices + 2 * nut_vertices
+    holes = []
+    for result in results:
+        # a connector has 2 + 4 * pairs rim and middle vertices when it is closed and 4 + 4 * pairs when it is open
+        pair_amount = (len(result.verts) - 2) // (pair_size + 4)
+        hole_co = result.verts[len(result.verts) - pair_amount * pair_size:].reshape(pair_amount, pair_size, 3)
+        centers = hole_co[:, :bolt_vertices, :2].mean(axis=1)
+        holes.append(np.concatenate((centers, np.full((pair_amount, 1), float(hole_radius))), axis=1))
+    return holes
+
+
+def get_overlaps(sheet, tolerance=1e-6):
+    """
+    Checks the outlines of a packed sheet, a BoxTree finds the parts whose bounding boxes overlap and only those
+    are compared with polygons_overlap
+
+    :param sheet: Sheet
+    :param tolerance: overlap depth that is allowed
+    :return: [(part, part), ...] pairs that overlap
+    """
+    placements = sheet.placements
+    low = np.array([np.append(placement.points.min(axis=0), 0.0) for placement in placements]).reshape(-1, 3)
+    high = np.array([np.append(placement.points.max(axis=0), 0.0) for placement in placements]).reshape(-1, 3)
+    overlaps = []
+    for first, second in sorted(map(tuple, bvh_helper.BoxTree(low, high).get_overlapping_pairs().tolist())):
+        if polygons_overlap(placements[first].points, placements[second].points, tolerance):
+            overlaps.append((placements[first].part, placements[second].part))
+    return overlaps
+
+
+def polygons_overlap(polygon1, polygon2, tolerance=1e-6):
+    """
+    Two simple polygons overlap when a side of one crosses a side of the other, or when a corner of one or a point
+    just inside the middle of one of its sides is inside the other. Touching is no overlap: the crossing sides
+    have to reach further than tolerance past each other and the points have to be further than tolerance inside.
+
+    :return: True if the polygons overlap deeper than tolerance
+    """
+    for first, second in ((polygon1, polygon2), (polygon2, polygon1)):
+        sides = np.roll(first, -1, axis=0) - first
+        lengths = np.maximum(np.linalg.norm(sides, axis=1, keepdims=True), 1e-12)
+        # the left normals point inwards on a counterclockwise polygon
+        orientation = 1.0 if np.dot(first[:, 0], np.roll(first[:, 1], -1)) > \
+            np.dot(first[:, 1], np.roll(first[:, 0], -1)) else -1.0
+        inwards = orientation * np.stack((-sides[:, 1], sides[:, 0]), axis=1) / lengths
+        points = np.concatenate((first, first + sides / 2 + 2 * tolerance * inwards))
+        if np.any(get_inside(second, points) & (get_side_distances(second, points) > tolerance)):
+            return True
+
+    # the ends of both sides are on different sides of the other one
+    start1, side1 = polygon1[:, None], (np.roll(polygon1, -1, axis=0) - polygon1)[:, None]
+    start2, side2 = polygon2[None], (np.roll(polygon2, -1, axis=0) - polygon2)[None]
+    length1 = np.maximum(np.linalg.norm(side1, axis=2), 1e-12)
+    length2 = np.maximum(np.linalg.norm(side2, axis=2), 1e-12)
+    relative = start2 - start1
+    start2_side = cross_2d(side1, relative) / length1
+    end2_side = cross_2d(side1, relative + side2) / length1
+    start1_side = cross_2d(side2, -relative) / length2
+    end1_side = cross_2d(side2, side1 - relative) / length2
+    crossing = (np.minimum(start2_side, end2_side) < -tolerance) & (np.maximum(start2_side, end2_side) > tolerance) & \
+        (np.minimum(start1_side, end1_side) < -tolerance) & (np.maximum(start1_side, end1_side) > tolerance)
+    return bool(crossing.any())
+
+
+def cross_2d(first, second):
+    return first[..., 0] * second[..., 1] - first[..., 1] * second[..., 0]
+
+
+def get_inside(polygon, points):
+    """
+    Even odd rule with a ray along x
+
+    :param polygon: (n, 2) corners
+    :param points: (m, 2) points
+    :return: (m) bool
+    """
+    start = polygon[None]
+    end = np.roll(polygon, -1, axis=0)[None]
+    x, y = points[:, None, 0], points[:, None, 1]
+    crosses = (start[..., 1] > y) != (end[..., 1] > y)
+    t = (y - start[..., 1]) / np.where(crosses, end[..., 1] - start[..., 1], 1)
+    return (crosses & (x < start[..., 0] + t * (end[..., 0] - start[..., 0]))).sum(axis=1) % 2 == 1
+
+
+def get_side_distances(polygon, points):
+    """
+
+    :param polygon: (n, 2) corners
+    :param points: (m, 2) points
+    :return: (m) distance from every point to the closest side
+    """
+    start = polygon[None]
+    side = (np.roll(polygon, -1, axis=0) - polygon)[None]
+    relative = points[:, None] - start
+    t = np.clip((relative * side).sum(axis=2) / np.maximum((side * side).sum(axis=2), 1e-24), 0, 1)
+    return np.linalg.norm(relative - t[..., None] * side, axis=2).min(axis=1)
+
+
+def get_sheet_parts(sheet, holes=None):
+    """
+
+    :param sheet: Sheet
+    :param holes: [(h, 3) center x, center y and radius, ...] for every part around its own outline, None if
+                  the parts have no holes
+    :return: [(outline, holes), ...] on the sheet, the holes of a part are None if it has none
+    """
+    parts = []
+    for placement in sheet.placements:
+        part_holes = None if holes is None else holes[placement.part]
+        if part_holes is not None and len(part_holes):
+            part_holes = np.array(part_holes, dtype=np.float64)
+            part_holes[:, :2] = rotate_points(part_holes[:, :2], placement.angle) + placement.offset
+        parts.append((placement.points, part_holes))
+    return parts
+
+
+def write_sheets(directory, packing, extension=".svg", holes=None, processes=None, prefix="sheet_", precision=3):
+    """
+    Writes every sheet to its own file, with more than one process the files are written in parallel
+
+    :param extension: one of sheet_export_helper.WRITERS
+    :param holes: see get_sheet_parts
+    :param processes: amount of worker processes, None uses all cores and 1 writes in this process
+    :return: [path, ...] one file for every sheet
+    """
+    if not packing.sheets:
+        return []
+    width, height = packing.sheets[0].width, packing.sheets[0].height
+    paths = [os.path.join(directory, prefix + str(sheet.index) + extension) for sheet in packing.sheets]
+    # only the outlines are sent to the workers, the sheets also hold the skyline views
+    parts = [get_sheet_parts(sheet, holes) for sheet in packing.sheets]
+
+    if processes == 1 or len(paths) == 1:
+        for path, sheet_parts in zip(paths, parts):
+            sheet_export_helper.write_sheet(path, width, height, sheet_parts, precision)
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            list(executor.map(sheet_export_helper.write_sheet, paths, repeat(width), repeat(height), parts,
+                              repeat(precision)))
+    return paths
@@ -0,0 +1,291 @@
+import numpy as np
+import connector_pipeline
+import create_array_functions
+import strut_cut_list
+from blender_helper import bvh_helper
+from blender_helper import export_helper
+from blender_helper import instrument_helper
+
+# corners of a strut box are [start, end] x [-side, +side] x [-up, +up], these are its 12 triangles
+BOX_TRIANGLES = np.array([
+    (0, 1, 3), (0, 3, 2), (4, 6, 7), (4, 7, 5),
+    (0, 4, 5), (0, 5, 1), (2, 3, 7), (2, 7, 6),
+    (0, 2, 6), (0, 6, 4), (1, 5, 7), (1, 7, 3),
+], dtype=np.int64)
+
+CONNECTOR = "connector"
+STRUT = "strut"
+
+
+class InterferenceReport:
+    """
+    Everything the check found, an empty report means the connectors can be built as they are.
+    Connectors are named by the index of their vertex in the mesh and struts by the index of their edge.
+    """
+    def __init__(self, wall):
+        self.wall = wall
+        # [(vertex index, amount of crossing triangle pairs), ...]
+        self.self_intersections = []
+        # [(kind, index, kind, index), ...] the parts that cross each other
+        self.interferences = []
+        # [(vertex index, pair index, "bolt" or "nut", wall thickness), ...]
+        self.hole_breakouts = []
+        self.triangle_amount = 0
+        self.tested_pairs = 0
+
+    def is_ok(self):
+        return not (self.self_intersections or self.interferences or self.hole_breakouts)
+
+    def get_summary(self):
+        """
+
+        :return: dict that can be written as json
+        """
+        return {
+            "ok": self.is_ok(),
+            "triangles": self.triangle_amount,
+            "tested_pairs": self.tested_pairs,
+            "wall": self.wall,
+            "self_intersections": [{"connector": vert, "triangle_pairs": amount}
+                                   for vert, amount in self.self_intersections],
+            "interferences": [{"first": [kind1, index1], "second": [kind2, index2]}
+                              for kind1, index1, kind2, index2 in self.interferences],
+            "hole_breakouts": [{"connector": vert, "pair": pair, "hole": hole, "wall": round(wall, 4)}
+                               for vert, pair, hole, wall in self.hole_breakouts],
+        }
+
+
+def get_world_stages(parameters):
+    """
+    The stages of the pipeline without to_middle_point, so the connectors stay where they are on the mesh
+    """
+    return [(name, stage) for name, stage in connector_pipeline.get_stages(parameters) if name != "to_middle_point"]
+
+
+def get_segment_distances(points, starts, ends):
+    """
+
+    :param points: (..., 3) points
+    :param starts: (..., 3) first point of the segments
+    :param ends: (..., 3) second point of the segments
+    :return: (...) distance from every point to its segment
+    """
+    vector = ends - starts
+    length_sq = np.maximum(create_array_functions.dot(vector, vector), 1e-24)
+    t = np.clip(create_array_functions.dot(points - starts, vector) / length_sq, 0, 1)
+    return np.linalg.norm(points - starts - t[..., None] * vector, axis=-1)
+
+
+def get_hole_walls(wood_con, parameters):
+    """
+    The material between the holes of every pair and the border of the face they are in. The bolt hole
+    is in the top face of the pair, the nut hole in the bottom face, both faces have the middle vertex
+    and the three rim vertices of the pair as corners.
+
+    :param wood_con: ArrayConnector after add_holes
+    :param parameters: dict with all the parameters, see connector_pipeline.get_parameters
+    :return: (G, pairs, 2) wall thickness around the bolt hole and around the nut hole
+    """
+    verts = wood_con.get_verts()
+    walls = []
+    for rim_verts, middle, hole_verts, radius in (
+            (wood_con.top_rim_verts, wood_con.middle_vert, wood_con.top_bolt_verts, parameters["hole_radius"]),
+            (wood_con.bottom_rim_verts, wood_con.extended_middle, wood_con.bottom_nut_verts,
+             parameters["nut_radius"])):
+        pairs = wood_con.get_pair_indices(rim_verts)
+        corners = np.concatenate((np.full((len(pairs), 1), middle), pairs), axis=1)
+        # (G, pairs, 4, 3) the corners of the faces, and the sides from every corner to the next one
+        corner_co = verts[:, corners]
+        centers = verts[:, hole_verts].mean(axis=2)
+        distances = get_segment_distances(centers[:, :, None], corner_co, np.roll(corner_co, -1, axis=2))
+        walls.append(distances.min(axis=2) - radius)
+    return np.stack(walls, axis=2)
+
+
+def get_strut_boxes(mesh, distance, width, height, vertex_normal):
+    """
+    A box around every edge between the rims of its two connectors
+
+    :return: (E, 8, 3) corners of the boxes in the order of BOX_TRIANGLES
+    """
+    edge_length, axis, up = strut_cut_list.get_strut_frames(mesh, vertex_normal)
+    side = np.cross(axis, up)
+    start = mesh.coords[mesh.edge_verts[:, 0]] + distance * axis
+    ends = np.stack((start, start + np.maximum(edge_length - 2 * distance, 0)[:, None] * axis), axis=1)
+
+    signs = np.array([-0.5, 0.5])
+    offsets = (signs[:, None, None] * width * side[:, None, None] +
+               signs[None, :, None] * height * up[:, None, None])
+    # (E, end, side sign, up sign, 3)
+    return (ends[:, :, None, None] + offsets[:, None]).reshape(-1, 8, 3)
+
+
+def get_plane_distances(points, triangles):
+    """
+
+    :param points: (P, n, 3) points
+    :param triangles: (P, 3, 3) corners of the triangles
+    :return: (P, n) distance of the points to the plane of their triangle, (P, 3) normals, (P) bool if the
+             triangle has an area
+    """
+    normal = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    normal_length = np.linalg.norm(normal, axis=1)
+    valid = normal_length > 1e-12
+    normal = normal / np.where(valid, normal_length, 1)[:, None]
+    return create_array_functions.dot(points - triangles[:, :1], normal[:, None]), normal, valid
+
+
+def get_triangle_crossings(triangles1, triangles2, tolerance=1e-6):
+    """
+    Two triangles that are not in one plane cross when an edge of one goes through the inside of the other.
+    Edges and corners that only touch the other triangle closer than the tolerance don't count.
+    Most pairs have one triangle on one side of the plane of the other, only the rest get the edge tests.
+
+    :param triangles1: (P, 3, 3) corners of the first triangles
+    :param triangles2: (P, 3, 3) corners of the second triangles
+    :return: (P) bool if the triangles cross
+    """
+    distances1, normal2, valid2 = get_plane_distances(triangles1, triangles2)
+    distances2, normal1, valid1 = get_plane_distances(triangles2, triangles1)
+    candidates = np.flatnonzero(valid1 & valid2 &
+                                np.any(distances1 > tolerance, axis=1) & np.any(distances1 < -tolerance, axis=1) &
+                                np.any(distances2 > tolerance, axis=1) & np.any(distances2 < -tolerance, axis=1))
+
+    crossing = np.zeros(len(triangles1), dtype=bool)
+    for segments, triangles, distances, normal in (
+            (triangles1[candidates], triangles2[candidates], distances1[candidates], normal2[candidates]),
+            (triangles2[candidates], triangles1[candidates], distances2[candidates], normal1[candidates])):
+        for edge in range(3):
+            start, end = segments[:, edge], segments[:, (edge + 1) % 3]
+            start_dist, end_dist = distances[:, edge], distances[:, (edge + 1) % 3]
+            through = (((start_dist > tolerance) & (end_dist < -tolerance)) |
+                       ((start_dist < -tolerance) & (end_dist > tolerance)))
+
+            t = start_dist / np.where(through, start_dist - end_dist, 1)
+            point = start + t[:, None] * (end - start)
+            inside = through
+            for corner in range(3):
+                side_start = triangles[:, corner]
+                side = triangles[:, (corner + 1) % 3] - side_start
+                side_length = np.maximum(np.linalg.norm(side, axis=1), 1e-12)
+                # distance of the point to the side, positive on the inside of the triangle
+                side_dist = create_array_functions.dot(np.cross(side, point - side_start), normal) / side_length
+                inside &= side_dist > tolerance
+            crossing[candidates] |= inside
+    return crossing
+
+
+@instrument_helper.timed("interference")
+def check_interference(mesh, parameters=None, wall=1.0, strut_size=(10.0, 10.0), vertex_normal=None, chunk_size=256,
+                       tolerance=1e-6, leaf_size=4):
+    """
+    Builds all the connectors where they are on the mesh and the strut boxes, puts all their triangles
+    in one bvh_helper.BoxTree and tests the triangles with overlapping boxes. Triangles of one part that are
+    in the same face or share a vertex are neighbours and not tested, a strut is not tested against the
+    connectors at its ends because it touches their rim by design.
+
+    :param mesh: ArrayConnectionMesh
+    :param parameters: dict with the parameters that differ from connector_pipeline.DEFAULT_PARAMETERS
+    :param wall: thinnest material that is allowed between a hole and the border of its face
+    :param strut_size: width and height of the struts, None leaves the struts out
+    :param vertex_normal: (V, 3) normals to use instead of mesh.vertex_normal
+    :param chunk_size: connectors that are built in one batch
+    :param tolerance: crossings that are less deep than this are seen as touching
+    :param leaf_size: triangles in a leaf of the tree
+    :return: InterferenceReport
+    """
+    parameters = connector_pipeline.get_parameters(parameters)
+    if vertex_normal is None:
+        vertex_normal = mesh.vertex_normal
+    report = InterferenceReport(wall)
+
+    # every triangle gets its corners, its part, its face in the part and global vertex indices
+    triangle_co = []
+    triangle_part = []
+    triangle_face = []
+    triangle_verts = []
+    part_kinds = []
+    part_indices = []
+    vert_amount = 0
+
+    stages = get_world_stages(parameters)
+    jobs = connector_pipeline.get_connector_jobs(mesh, vertex_normal)
+    for chunk in connector_pipeline.get_chunks(jobs, chunk_size):
+        wood_con = connector_pipeline.build_batch(chunk, parameters, stages)
+
+        with instrument_helper.stage("hole_walls"):
+            walls = get_hole_walls(wood_con, parameters)
+            for connector, pair, hole in zip(*np.nonzero(walls < wall)):
+                report.hole_breakouts.append((int(chunk[connector].index), int(pair), ("bolt", "nut")[hole],
+                                              float(walls[connector, pair, hole])))
+
+        verts = wood_con.get_verts()
+        face_offsets, face_indices = wood_con.get_face_buffers()
+        triangles = export_helper.get_triangles(verts, face_offsets, face_indices)
+        faces = np.repeat(np.arange(len(face_offsets) - 1), np.maximum(np.diff(face_offsets) - 2, 0))
+        first_part = len(part_kinds)
+        for connector, job in enumerate(chunk):
+            triangle_co.append(verts[connector][triangles[connector]])
+            triangle_part.append(np.full(len(faces), first_part + connector))
+            triangle_face.append(faces)
+            triangle_verts.append(triangles[connector] + vert_amount)
+            vert_amount += wood_con.vert_amount
+            part_kinds.append(CONNECTOR)
+            part_indices.append(int(job.index))
+
+    connector_parts = np.full(len(mesh.coords), -1, dtype=np.int64)
+    connector_parts[part_indices] = np.arange(len(part_indices))
+    end_parts = np.zeros((0, 2), dtype=np.int64)
+    if strut_size is not None and len(mesh.edge_verts):
+        boxes = get_strut_boxes(mesh, parameters["distance"], strut_size[0], strut_size[1], vertex_normal)
+        first_part = len(part_kinds)
+        edge_amount = len(boxes)
+        triangle_co.append(boxes[:, BOX_TRIANGLES].reshape(-1, 3, 3))
+        triangle_part.append(np.repeat(np.arange(first_part, first_part + edge_amount), len(BOX_TRIANGLES)))
+        triangle_face.append(np.tile(np.arange(len(BOX_TRIANGLES)) // 2, edge_amount))
+        triangle_verts.append((BOX_TRIANGLES + 8 * np.arange(edge_amount)[:, None, None] + vert_amount).reshape(-1, 3))
+        part_kinds += [STRUT] * edge_amount
+        part_indices += list(range(edge_amount))
+        # (parts, 2) the connectors at the ends of every part, -1 for the connectors
+        end_parts = np.full((len(part_kinds), 2), -1, dtype=np.int64)
+        end_parts[first_part:] = connector_parts[mesh.edge_verts]
+
+    if not triangle_co:
+        return report
+    triangle_co = np.concatenate(triangle_co)
+    triangle_part = np.concatenate(triangle_part)
+    triangle_face = np.concatenate(triangle_face)
+    triangle_verts = np.concatenate(triangle_verts)
+    report.triangle_amount = len(triangle_co)
+
+    with instrument_helper.stage("bvh_build"):
+        tree = bvh_helper.BoxTree(triangle_co.min(axis=1), triangle_co.max(axis=1), leaf_size)
+    with instrument_helper.stage("bvh_query"):
+        pairs = tree.get_overlapping_pairs()
+
+    with instrument_helper.stage("triangle_tests"):
+        first, second = pairs[:, 0], pairs[:, 1]
+        part1, part2 = triangle_part[first], triangle_part[second]
+        same_part = part1 == part2
+        shares_vert = np.any(triangle_verts[first][:, :, None] == triangle_verts[second][:, None, :], axis=(1, 2))
+        neighbours = same_part & ((triangle_face[first] == triangle_face[second]) | shares_vert)
+        if len(end_parts):
+            neighbours |= np.any(end_parts[part1] == part2[:, None], axis=1)
+            neighbours |= np.any(end_parts[part2] == part1[:, None], axis=1)
+        first, second = first[~neighbours], second[~neighbours]
+        report.tested_pairs = len(first)
+        crossing = get_triangle_crossings(triangle_co[first], triangle_co[second], tolerance)
+        part1, part2 = triangle_part[first[crossing]], triangle_part[second[crossing]]
+
+    instrument_helper.count("interference.triangles", len(triangle_co))
+    instrument_helper.count("interference.tested_pairs", report.tested_pairs)
+
+    same_part = part1 == part2
+    parts, amounts = np.unique(part1[same_part], return_counts=True)
+    report.self_intersections = [(part_indices[part], int(amount)) for part, amount in zip(parts.tolist(),
+                                                                                           amounts.tolist())
+                                 if part_kinds[part] == CONNECTOR]
+    part_pairs = np.unique(np.stack((np.minimum(part1, part2), np.maximum(part1, part2)), axis=1)[~same_part], axis=0)
+    report.interferences = [(part_kinds[first_part], part_indices[first_part], part_kinds[second_part],
+                             part_indices[second_part]) for first_part, second_part in part_pairs.tolist()]
+    return report
@@ -0,0 +1,202 @@
+from concurrent.futures import ProcessPoolExecutor
+import csv
+import itertools
+import json
+import numpy as np
+import connector_pipeline
+import create_array_functions
+import interference_check
+from blender_helper import instrument_helper
+
+METRIC_COLUMNS = ["connectors", "vertices", "faces", "volume", "min_wall", "hole_breakouts",
+                  "size_x", "size_y", "size_z"]
+
+# the sweep of a worker process, it is sent once when the pool starts instead of with every parameter set
+worker_sweep = None
+
+
+class Sweep:
+    """
+    The part of the pipeline that doesn't depend on the parameters. The ordered fans and the normals of the mesh
+    are turned into jobs once and split in chunks, every parameter set only runs the stages on those chunks.
+    With dedupe only the first job of every connector type is built and its metrics count for the whole group.
+    """
+    def __init__(self, mesh, chunk_size=256, dedupe=None, vertex_normal=None):
+        """
+
+        :param mesh: ArrayConnectionMesh
+        :param chunk_size: connectors that are built in one batch
+        :param dedupe: tolerance of connector_pipeline.group_jobs, None builds every connector
+        :param vertex_normal: (V, 3) normals to use instead of mesh.vertex_normal
+        """
+        self.jobs = connector_pipeline.get_connector_jobs(mesh, vertex_normal)
+        if dedupe is None:
+            built_jobs = self.jobs
+            counts = {job.index: 1 for job in self.jobs}
+        else:
+            groups = connector_pipeline.group_jobs(self.jobs, tolerance=dedupe)
+            built_jobs = [group.jobs[0] for group in groups]
+            counts = {group.jobs[0].index: group.get_count() for group in groups}
+
+        self.chunks = connector_pipeline.get_chunks(built_jobs, chunk_size)
+        # (G) the amount of connectors that every built connector of a chunk stands for
+        self.chunk_counts = [np.array([counts[job.index] for job in chunk], dtype=np.int64) for chunk in self.chunks]
+        self.type_amount = len(built_jobs)
+
+    def get_connector_amount(self):
+        return len(self.jobs)
+
+    def evaluate(self, parameters, wall=1.0):
+        """
+        Builds the connectors chunk by chunk and only keeps their metrics, the vertices of a chunk are
+        dropped before the next one is built
+
+        :param parameters: dict with all the parameters, see connector_pipeline.get_parameters
+        :param wall: hole walls thinner than this are counted as hole breakouts
+        :return: dict with the METRIC_COLUMNS, the amounts and the volume are for all the connectors
+        """
+        metrics = {"connectors": self.get_connector_amount(), "vertices": 0, "faces": 0, "volume": 0.0,
+                   "min_wall": None, "hole_breakouts": 0}
+        size = np.zeros(3)
+        stages = connector_pipeline.get_stages(parameters)
+        for chunk, counts in zip(self.chunks, self.chunk_counts):
+            wood_con = connector_pipeline.build_batch(chunk, parameters, stages)
+
+            with instrument_helper.stage("sweep_metrics"):
+                verts = wood_con.get_verts()
+                face_offsets, face_indices = wood_con.get_face_buffers()
+                walls = interference_check.get_hole_walls(wood_con, parameters)
+                amount = int(counts.sum())
+
+                metrics["vertices"] += amount * wood_con.vert_amount
+                metrics["faces"] += amount * (len(face_offsets) - 1)
+                metrics["volume"] += float(np.dot(get_volumes(verts, face_offsets, face_indices), counts))
+                if walls.size:
+                    chunk_wall = float(walls.min())
+                    metrics["min_wall"] = chunk_wall if metrics["min_wall"] is None else \
+                        min(metrics["min_wall"], chunk_wall)
+                metrics["hole_breakouts"] += int(np.dot((walls < wall).sum(axis=(1, 2)), counts))
+                # to_middle_point puts every connector in its own frame, so this is the stock it is cut from
+                size = np.maximum(size, (verts.max(axis=1) - verts.min(axis=1)).max(axis=0))
+
+        metrics["size_x"], metrics["size_y"], metrics["size_z"] = size.tolist()
+        return metrics
+
+
+def get_volumes(verts, face_offsets, face_indices):
+    """
+    Volume of closed meshes that share their faces, every face is split in a fan of triangles from its first
+    corner and the signed volumes of the tetrahedrons with the origin are added up. Corners next to the first
+    one give a zero volume, so all the corners can be summed without leaving them out.
+
+    :param verts: (G, V, 3) vertex coordinates
+    :param face_offsets: (F + 1) start of every face in face_indices
+    :param face_indices: (C) vertex index of every face corner, the faces point outwards
+    :return: (G) volume of every mesh
+    """
+    sizes = np.diff(face_offsets)
+    corner_face = np.repeat(np.arange(len(sizes)), sizes)
+    corner_next = np.arange(1, len(face_indices) + 1)
+    corner_next[face_offsets[1:] - 1] = face_offsets[:-1]
+
+    first = verts[:, face_indices[face_offsets[:-1]][corner_face]]
+    products = np.cross(verts[:, face_indices], verts[:, face_indices[corner_next]])
+    return np.einsum("gcj,gcj->g", first, products) / 6
+
+
+def get_parameter_grid(values, parameters=None):
+    """
+    Every combination of the swept values
+
+    :param values: {name: [value, ...], ...} the parameters that are swept
+    :param parameters: dict with the parameters that are not swept and differ from DEFAULT_PARAMETERS
+    :return: [dict with all the parameters, ...] the last name changes the fastest
+    """
+    base = connector_pipeline.get_parameters(parameters)
+    names = list(values)
+    grid = []
+    for combination in itertools.product(*(values[name] for name in names)):
+        parameter_set = dict(base)
+        parameter_set.update(zip(names, combination))
+        grid.append(parameter_set)
+    return grid
+
+
+def set_worker_sweep(sweep):
+    global worker_sweep
+    worker_sweep = sweep
+
+
+def evaluate_in_worker(parameters, wall, instrument=False):
+    """
+    Sweep.evaluate for a worker process, with instrument the instrumentation of the worker is sent back as well
+
+    :return: metrics, data for Instrumentation.merge or None
+    """
+    if not instrument:
+        return worker_sweep.evaluate(parameters, wall), None
+    instrument_helper.enable()
+    metrics = worker_sweep.evaluate(parameters, wall)
+    return metrics, instrument_helper.disable().get_data()
+
+
+@instrument_helper.timed("sweep")
+def run_sweep(sweep, parameter_sets, processes=None, wall=1.0):
+    """
+    Evaluates all the parameter sets, with more than one process every set is evaluated by a worker.
+    The sweep is sent to every worker once when the pool starts.
+
+    :param sweep: Sweep
+    :param parameter_sets: [dict with all the parameters, ...], see get_parameter_grid
+    :param processes: amount of worker processes, None uses all cores and 1 runs in this process
+    :param wall: hole walls thinner than this are counted as hole breakouts
+    :return: [metrics, ...] in the order of the parameter sets
+    :raises ValueError: when a parameter set has circles that add_holes can't build, before any set is evaluated
+    """
+    for parameters in parameter_sets:
+        create_array_functions.check_circle_vertices(parameters["bolt_vertices"], parameters["nut_vertices"])
+    instrument_helper.count("sweep.sets", len(parameter_sets))
+    if processes == 1 or len(parameter_sets) <= 1:
+        return [sweep.evaluate(parameters, wall) for parameters in parameter_sets]
+
+    instrumentation = instrument_helper.active
+    with ProcessPoolExecutor(max_workers=processes, initializer=set_worker_sweep, initargs=(sweep,)) as pool:
+        results = []
+        for metrics, data in pool.map(evaluate_in_worker, parameter_sets, itertools.repeat(wall),
+                                      itertools.repeat(instrumentation is not None)):
+            if data is not None:
+                instrumentation.merge(data)
+            results.append(metrics)
+    return results
+
+
+def get_rows(names, parameter_sets, results):
+    """
+
+    :param names: the swept parameters, they are the first columns
+    :return: [dict, ...] a row for every parameter set with its swept values and its metrics
+    """
+    rows = []
+    for parameters, metrics in zip(parameter_sets, results):
+        row = {name: parameters[name] for name in names}
+        row.update(metrics)
+        rows.append(row)
+    return rows
+
+
+def write_sweep(path, names, rows):
+    """
+    Writes the rows as csv, or as json when the path ends with .json
+
+    :param names: the swept parameters, see get_rows
+    :param rows: [dict, ...] from get_rows
+    """
+    if path.lower().endswith(".json"):
+        with open(path, "w") as json_file:
+            json.dump(rows, json_file, indent=2)
+        return
+
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(names) + METRIC_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
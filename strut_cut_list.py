@@ -0,0 +1,195 @@
+import csv
+import json
+import numpy as np
+import create_array_functions
+from blender_helper import instrument_helper
+
+CSV_COLUMNS = ["name", "count", "length", "start_miter", "start_bevel", "end_miter", "end_bevel"]
+
+
+class Struts:
+    """
+    A strut for every edge of the mesh. The start of a strut is at the first vertex in edge_verts.
+    The end cuts are described from the strut: the miter turns the cut around the up direction of the strut,
+    the bevel tilts the cut towards the up direction. Both are in degrees, 0 is a square cut.
+    """
+    def __init__(self, edge_verts, length, miter, bevel):
+        """
+
+        :param edge_verts: (E, 2) start and end vertex of every strut
+        :param length: (E) length along the middle of the strut, between the rims of the two connectors
+        :param miter: (E, 2) miter at the start and at the end
+        :param bevel: (E, 2) bevel at the start and at the end
+        """
+        self.edge_verts = edge_verts
+        self.length = length
+        self.miter = miter
+        self.bevel = bevel
+
+    def __len__(self):
+        return len(self.length)
+
+
+class StrutType:
+    """
+    Struts that are cut the same way, the values are the averages of all the struts of the type
+    """
+    def __init__(self, name, length, miter, bevel, edges):
+        """
+
+        :param edges: (k, 2) the vertices of the struts of this type, ordered so the first one is at the start cut
+        """
+        self.name = name
+        self.length = length
+        self.miter = miter
+        self.bevel = bevel
+        self.edges = edges
+
+    def get_count(self):
+        return len(self.edges)
+
+    def get_row(self):
+        """
+
+        :return: dict with the CSV_COLUMNS, the values are rounded to 0.01
+        """
+        # adding 0.0 turns the -0.0 of tiny negative values into 0.0
+        return {"name": self.name, "count": self.get_count(), "length": round(self.length, 2) + 0.0,
+                "start_miter": round(self.miter[0], 2) + 0.0, "start_bevel": round(self.bevel[0], 2) + 0.0,
+                "end_miter": round(self.miter[1], 2) + 0.0, "end_bevel": round(self.bevel[1], 2) + 0.0}
+
+
+def get_strut_frames(mesh, vertex_normal):
+    """
+    The up direction of a strut is the average of its two vertex normals made square to the strut.
+
+    :param mesh: ArrayConnectionMesh
+    :param vertex_normal: (V, 3) vertex normals
+    :return: (E) edge lengths, (E, 3) normalized direction from the first to the second vertex, (E, 3) up directions
+    """
+    edge_verts = mesh.edge_verts
+    vector = mesh.coords[edge_verts[:, 1]] - mesh.coords[edge_verts[:, 0]]
+    edge_length = np.linalg.norm(vector, axis=1)
+    axis = vector / edge_length[:, None]
+
+    normals = vertex_normal[edge_verts]
+    up = normals[:, 0] + normals[:, 1]
+    up -= create_array_functions.dot(up, axis)[:, None] * axis
+    up_length = np.linalg.norm(up, axis=1)
+    # opposite or parallel normals don't give an up direction, any direction square to the strut is used then
+    helper = np.where(np.abs(axis[:, :1]) < 0.9, [[1.0, 0.0, 0.0]], [[0.0, 1.0, 0.0]])
+    fallback = np.cross(axis, helper)
+    up = np.where(up_length[:, None] > 1e-9, up, fallback)
+    up = create_array_functions.normalized(up)
+    return edge_length, axis, up
+
+
+@instrument_helper.timed("struts")
+def get_struts(mesh, distance=20, vertex_normal=None):
+    """
+    Computes all the struts at once. The connector walls are parallel to the vertex normal, so the cut at an end
+    is the plane through the vertex normal that is square to the strut seen along the normal.
+
+    :param mesh: ArrayConnectionMesh
+    :param distance: distance from the vertex to the rim of the connector along the edges, see create_hat
+    :param vertex_normal: (V, 3) normals to use instead of mesh.vertex_normal
+    :return: Struts
+    """
+    if vertex_normal is None:
+        vertex_normal = mesh.vertex_normal
+
+    edge_verts = mesh.edge_verts
+    edge_length, axis, up = get_strut_frames(mesh, vertex_normal)
+    normals = vertex_normal[edge_verts]
+
+    # (E, 2, 3) direction from the middle of the strut to each end, and the side direction of each end
+    outwards = np.stack((-axis, axis), axis=1)
+    side = np.cross(outwards, up[:, None])
+
+    cut_normal = outwards - create_array_functions.dot(outwards, normals)[..., None] * normals
+    cut_normal = create_array_functions.normalized(cut_normal)
+
+    along = create_array_functions.dot(cut_normal, outwards)
+    across = create_array_functions.dot(cut_normal, side)
+    upwards = create_array_functions.dot(cut_normal, up[:, None])
+    miter = np.degrees(np.arctan2(across, along))
+    bevel = np.degrees(np.arctan2(upwards, np.hypot(along, across)))
+
+    instrument_helper.count("struts", len(edge_verts))
+    return Struts(edge_verts.copy(), edge_length - 2 * distance, miter, bevel)
+
+
+@instrument_helper.timed("strut_types")
+def group_struts(struts, length_tolerance=0.5, angle_tolerance=0.5):
+    """
+    Struts with the same length and end cuts after quantizing them to the tolerances get one type, like
+    connector_pipeline.group_jobs does for the connectors. A strut can be turned around, so the two ends are
+    sorted first and the flipped struts get their edge reversed.
+
+    :param struts: Struts
+    :param length_tolerance: quantization step of the lengths
+    :param angle_tolerance: quantization step of the angles in degrees
+    :return: [StrutType, ...] sorted by length
+    """
+    if len(struts) == 0:
+        return []
+
+    q_length = np.round(struts.length / length_tolerance).astype(np.int64)
+    q_ends = np.round(np.stack((struts.miter, struts.bevel), axis=2) / angle_tolerance).astype(np.int64)
+    flip = (q_ends[:, 0, 0] > q_ends[:, 1, 0]) | ((q_ends[:, 0, 0] == q_ends[:, 1, 0]) &
+                                                  (q_ends[:, 0, 1] > q_ends[:, 1, 1]))
+    order = np.where(flip[:, None], [[1, 0]], [[0, 1]])
+    rows = np.arange(len(struts))[:, None]
+    q_ends = q_ends[rows, order]
+    edges = struts.edge_verts[rows, order]
+    miter = struts.miter[rows, order]
+    bevel = struts.bevel[rows, order]
+
+    # sorting the keys puts the struts of a type next to each other, a new type starts where the key changes
+    keys = np.concatenate((q_length[:, None], q_ends.reshape(-1, 4)), axis=1)
+    members = np.lexsort(keys.T[::-1])
+    sorted_keys = keys[members]
+    is_start = np.concatenate(([True], np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)))
+    starts = np.append(np.nonzero(is_start)[0], len(members))
+    inverse = np.empty(len(members), dtype=np.int64)
+    inverse[members] = np.cumsum(is_start) - 1
+    counts = np.diff(starts)
+
+    def average(values):
+        return np.bincount(inverse, weights=values, minlength=len(counts)) / counts
+
+    length = average(struts.length)
+    type_miter = np.stack([average(miter[:, end]) for end in range(2)], axis=1)
+    type_bevel = np.stack([average(bevel[:, end]) for end in range(2)], axis=1)
+
+    strut_types = []
+    for type_index in range(len(counts)):
+        type_edges = edges[members[starts[type_index]:starts[type_index + 1]]]
+        strut_types.append(StrutType("strut_" + str(type_index), float(length[type_index]),
+                                     type_miter[type_index].tolist(), type_bevel[type_index].tolist(), type_edges))
+
+    instrument_helper.count("strut_types", len(strut_types))
+    return strut_types
+
+
+def write_cut_list(path, strut_types):
+    """
+    Writes the cut list as csv, one row per type with the amount, or as json that also has the edges of every type
+
+    :param path: .csv or .json file path
+    :param strut_types: [StrutType, ...] from group_struts
+    """
+    if path.lower().endswith(".json"):
+        rows = []
+        for strut_type in strut_types:
+            row = strut_type.get_row()
+            row["edges"] = strut_type.edges.tolist()
+            rows.append(row)
+        with open(path, "w") as json_file:
+            json.dump(rows, json_file, indent=2)
+        return
+
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=CSV_COLUMNS)
+        writer.writeheader()
+        writer.writerows(strut_type.get_row() for strut_type in strut_types)
@@ -0,0 +1,152 @@
+import math
+import numpy as np
+
+# The generated meshes are scaled so the edges are around this length, the default connector rim is at 20
+EDGE_LENGTH = 100
+
+
+def faces_to_buffers(faces):
+    """
+
+    :param faces: (F, n) vertex indices of faces that all have n corners
+    :return: (F + 1) face offsets, (F * n) face vertex indices
+    """
+    faces = np.asarray(faces, dtype=np.int64)
+    return np.arange(len(faces) + 1, dtype=np.int64) * faces.shape[1], faces.reshape(-1)
+
+
+def remove_unused_verts(coords, face_indices):
+    """
+
+    :return: coordinates of the vertices that are used by a face, face indices that point to those
+    """
+    used, new_indices = np.unique(face_indices, return_inverse=True)
+    return coords[used], new_indices.reshape(-1)
+
+
+def get_icosahedron():
+    """
+
+    :return: (12, 3) unit vertex coordinates, (20, 3) outward wound triangles
+    """
+    t = (1 + math.sqrt(5)) / 2
+    coords = np.array([(-1, t, 0), (1, t, 0), (-1, -t, 0), (1, -t, 0), (0, -1, t), (0, 1, t), (0, -1, -t),
+                       (0, 1, -t), (t, 0, -1), (t, 0, 1), (-t, 0, -1), (-t, 0, 1)], dtype=np.float64)
+    faces = np.array([(0, 11, 5), (0, 5, 1), (0, 1, 7), (0, 7, 10), (0, 10, 11), (1, 5, 9), (5, 11, 4),
+                      (11, 10, 2), (10, 7, 6), (7, 1, 8), (3, 9, 4), (3, 4, 2), (3, 2, 6), (3, 6, 8), (3, 8, 9),
+                      (4, 9, 5), (2, 4, 11), (6, 2, 10), (8, 6, 7), (9, 8, 1)], dtype=np.int64)
+    return coords / np.linalg.norm(coords, axis=1, keepdims=True), faces
+
+
+def geodesic_sphere(frequency, radius=None):
+    """
+    Every face of an icosahedron is split in frequency ** 2 triangles and the points are pushed to the sphere.
+    All the faces are subdivided at once, the points on the shared edges are merged afterwards.
+
+    :param frequency: amount of parts every edge of the icosahedron is split in
+    :param radius: radius of the sphere, by default the edges are around EDGE_LENGTH
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    if radius is None:
+        radius = EDGE_LENGTH * frequency
+    ico_coords, ico_faces = get_icosahedron()
+
+    # grid points (i, j) of a subdivided triangle and the two kinds of small triangles between them
+    i, j = np.nonzero(np.add.outer(np.arange(frequency + 1), np.arange(frequency + 1)) <= frequency)
+    point_index = np.full((frequency + 2, frequency + 2), -1, dtype=np.int64)
+    point_index[i, j] = np.arange(len(i))
+    up_i, up_j = np.nonzero(np.add.outer(np.arange(frequency), np.arange(frequency)) < frequency)
+    down_i, down_j = np.nonzero(np.add.outer(np.arange(frequency), np.arange(frequency)) < frequency - 1)
+    grid_faces = np.concatenate((
+        np.stack((point_index[up_i, up_j], point_index[up_i + 1, up_j], point_index[up_i, up_j + 1]), axis=1),
+        np.stack((point_index[down_i + 1, down_j], point_index[down_i + 1, down_j + 1],
+                  point_index[down_i, down_j + 1]), axis=1)))
+
+    corners = ico_coords[ico_faces]
+    points = corners[:, None, 0] + np.einsum("p,fj->fpj", i / frequency, corners[:, 1] - corners[:, 0]) + \
+        np.einsum("p,fj->fpj", j / frequency, corners[:, 2] - corners[:, 0])
+    points /= np.linalg.norm(points, axis=2, keepdims=True)
+
+    faces = grid_faces[None] + (np.arange(len(ico_faces)) * len(i))[:, None, None]
+    unique_keys, inverse = np.unique(np.round(points.reshape(-1, 3) * 1e9), axis=0, return_inverse=True)
+    coords = unique_keys / 1e9 * radius
+    face_offsets, face_indices = faces_to_buffers(inverse.reshape(-1)[faces.reshape(-1, 3)])
+    return coords, face_offsets, face_indices
+
+
+def open_dome(frequency, cutoff=0.0, radius=None):
+    """
+    Geodesic sphere without the faces below the cutoff, the vertices on the rim have open fans
+
+    :param cutoff: height of the cut as a fraction of the radius, -1 keeps the whole sphere
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    coords, face_offsets, face_indices = geodesic_sphere(frequency, radius)
+    faces = face_indices.reshape(-1, 3)
+    centers = coords[faces].mean(axis=1)
+    faces = faces[centers[:, 2] >= cutoff * np.linalg.norm(centers, axis=1)]
+    coords, face_indices = remove_unused_verts(coords, faces.reshape(-1))
+    face_offsets, face_indices = faces_to_buffers(face_indices.reshape(-1, 3))
+    return coords, face_offsets, face_indices
+
+
+def prism(sides, height=EDGE_LENGTH):
+    """
+    Prism with two sides-gons as caps, the vertices have three edges and the caps are n-gons
+
+    :param sides: amount of sides of the caps
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    radius = EDGE_LENGTH / (2 * math.sin(math.pi / sides))
+    angles = np.arange(sides) * 2 * math.pi / sides
+    ring = np.stack((radius * np.cos(angles), radius * np.sin(angles), np.zeros(sides)), axis=1)
+    coords = np.concatenate((ring, ring + [0, 0, height]))
+
+    ring_verts = np.arange(sides)
+    next_verts = np.roll(ring_verts, -1)
+    sides_faces = np.stack((ring_verts, next_verts, next_verts + sides, ring_verts + sides), axis=1)
+    sizes = np.concatenate(([sides, sides], np.full(sides, 4)))
+    face_offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    np.cumsum(sizes, out=face_offsets[1:])
+    face_indices = np.concatenate((ring_verts[::-1], ring_verts + sides, sides_faces.reshape(-1)))
+    return coords, face_offsets, face_indices
+
+
+def hub(valence, height=EDGE_LENGTH):
+    """
+    Bipyramid, the two tips are hubs with valence edges
+
+    :param valence: amount of edges at the tips
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    radius = EDGE_LENGTH / (2 * math.sin(math.pi / valence))
+    angles = np.arange(valence) * 2 * math.pi / valence
+    ring = np.stack((radius * np.cos(angles), radius * np.sin(angles), np.zeros(valence)), axis=1)
+    coords = np.concatenate((ring, [[0, 0, height], [0, 0, -height]]))
+
+    ring_verts = np.arange(valence)
+    next_verts = np.roll(ring_verts, -1)
+    top = np.full(valence, valence)
+    bottom = np.full(valence, valence + 1)
+    faces = np.concatenate((np.stack((ring_verts, next_verts, top), axis=1),
+                            np.stack((next_verts, ring_verts, bottom), axis=1)))
+    face_offsets, face_indices = faces_to_buffers(faces)
+    return coords, face_offsets, face_indices
+
+
+GENERATORS = {
+    "icosphere": geodesic_sphere,
+    "dome": open_dome,
+    "prism": prism,
+    "hub": hub,
+}
+
+
+def get_mesh(name, size):
+    """
+
+    :param name: key of GENERATORS
+    :param size: frequency, sides or valence of the generator
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    return GENERATORS[name](size)
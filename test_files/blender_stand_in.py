@@ -0,0 +1,193 @@
+import sys
+import types
+import numpy as np
+
+
+class Vector:
+    """
+    The part of mathutils.Vector that the bmesh functions use, with the operators of the Blender 2.7 api
+    """
+    def __init__(self, values):
+        self.values = np.array([float(value) for value in values], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, index):
+        return float(self.values[index])
+
+    def __iter__(self):
+        return iter(self.values.tolist())
+
+    def __add__(self, other):
+        return Vector(self.values + get_values(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return Vector(self.values - get_values(other))
+
+    def __neg__(self):
+        return Vector(-self.values)
+
+    def __mul__(self, other):
+        # Vector * Vector is the dot product in the 2.7 api
+        if isinstance(other, Vector):
+            return float(self.values @ other.values)
+        return Vector(self.values * other)
+
+    def __rmul__(self, other):
+        return Vector(self.values * other)
+
+    def __truediv__(self, other):
+        return Vector(self.values / other)
+
+    def normalized(self):
+        return Vector(self.values / np.linalg.norm(self.values))
+
+    def cross(self, other):
+        return Vector(np.cross(self.values, get_values(other)))
+
+    def copy(self):
+        return Vector(self.values)
+
+
+class Matrix:
+    def __init__(self, rows):
+        self.values = np.array([get_values(row) for row in rows], dtype=np.float64)
+
+    def __iter__(self):
+        return iter([Vector(row) for row in self.values])
+
+    def __mul__(self, other):
+        if isinstance(other, Matrix):
+            return Matrix(self.values @ other.values)
+        # a 4x4 matrix transforms a 3d vector as a point
+        if len(self.values) == 4:
+            return Vector((self.values @ np.append(get_values(other), 1))[:3])
+        return Vector(self.values @ get_values(other))
+
+    def transposed(self):
+        return Matrix(self.values.T)
+
+    def to_4x4(self):
+        values = np.eye(4)
+        values[:3, :3] = self.values
+        return Matrix(values)
+
+    @staticmethod
+    def Translation(vector):
+        values = np.eye(4)
+        values[:3, 3] = get_values(vector)
+        return Matrix(values)
+
+
+def get_values(vector):
+    if isinstance(vector, Vector):
+        return vector.values
+    return np.asarray(vector, dtype=np.float64)
+
+
+class BMVert:
+    def __init__(self, co, index):
+        self.co = Vector(co)
+        self.index = index
+
+
+class BMEdge:
+    def __init__(self, verts, index):
+        self.verts = tuple(verts)
+        self.index = index
+
+
+class BMLoop:
+    def __init__(self, vert, edge):
+        self.vert = vert
+        self.edge = edge
+
+
+class BMFace:
+    def __init__(self, verts, index):
+        self.verts = list(verts)
+        self.index = index
+        self.edges = []
+        self.loops = []
+
+    @property
+    def normal(self):
+        corners = np.array([vert.co.values for vert in self.verts])
+        normal = np.cross(corners, np.roll(corners, -1, axis=0)).sum(axis=0)
+        return Vector(normal / np.linalg.norm(normal))
+
+
+class BMSeq(list):
+    def __init__(self, make):
+        super().__init__()
+        self.make = make
+
+    def new(self, value):
+        element = self.make(value, len(self))
+        self.append(element)
+        return element
+
+    def ensure_lookup_table(self):
+        pass
+
+    def index_update(self):
+        for index, element in enumerate(self):
+            element.index = index
+
+
+class BMesh:
+    """
+    The elements are only stored, faces.new doesn't make the edges and loops, see from_buffers
+    """
+    def __init__(self):
+        self.verts = BMSeq(BMVert)
+        self.edges = BMSeq(BMEdge)
+        self.faces = BMSeq(BMFace)
+
+
+def transform(mesh, matrix, verts):
+    for vert in verts:
+        vert.co = matrix * vert.co
+
+
+def from_buffers(coords, face_offsets, face_indices):
+    """
+    A complete stand-in bmesh with edges and loops, the edges are numbered in the order they are first used
+
+    :return: BMesh
+    """
+    mesh = BMesh()
+    for co in coords:
+        mesh.verts.new(co)
+    edge_dict = {}
+    for start, end in zip(face_offsets[:-1], face_offsets[1:]):
+        face = mesh.faces.new([mesh.verts[vert] for vert in face_indices[start:end]])
+        for corner, vert in enumerate(face.verts):
+            next_vert = face.verts[(corner + 1) % len(face.verts)]
+            key = (min(vert.index, next_vert.index), max(vert.index, next_vert.index))
+            if key not in edge_dict:
+                edge_dict[key] = mesh.edges.new((vert, next_vert))
+            face.edges.append(edge_dict[key])
+            face.loops.append(BMLoop(vert, edge_dict[key]))
+    return mesh
+
+
+def install():
+    """
+    Registers the stand-ins as mathutils and bmesh when the tests don't run inside Blender
+    """
+    try:
+        import mathutils
+        import bmesh
+    except ImportError:
+        mathutils_module = types.ModuleType("mathutils")
+        mathutils_module.Vector = Vector
+        mathutils_module.Matrix = Matrix
+        bmesh_module = types.ModuleType("bmesh")
+        bmesh_module.new = BMesh
+        bmesh_module.ops = types.SimpleNamespace(transform=transform)
+        sys.modules["mathutils"] = mathutils_module
+        sys.modules["bmesh"] = bmesh_module
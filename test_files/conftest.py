@@ -0,0 +1,12 @@
+import os
+import sys
+
+# the modules import each other from the top folder of the repository, like Blender runs them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import blender_stand_in
+
+# a scratch script that runs when it is imported, it has no tests
+collect_ignore = ["test_classes.py"]
+
+blender_stand_in.install()
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+import blender_stand_in
+import synthetic_meshes
+from blender_helper.array_collection_helper import ArrayConnectionMesh, CsrLink
+from blender_helper.collection_helper import ConnectionMesh
+
+MESHES = {
+    "icosphere": lambda: synthetic_meshes.geodesic_sphere(3),
+    "dome": lambda: synthetic_meshes.open_dome(4),
+    "prism": lambda: synthetic_meshes.prism(6),
+}
+
+
+@pytest.fixture(params=sorted(MESHES))
+def meshes(request):
+    """
+
+    :return: ArrayConnectionMesh, the baseline ConnectionMesh of the same mesh
+    """
+    coords, face_offsets, face_indices = MESHES[request.param]()
+    return (ArrayConnectionMesh(coords, face_offsets, face_indices),
+            ConnectionMesh(blender_stand_in.from_buffers(coords, face_offsets, face_indices)))
+
+
+def get_edge_key(edge):
+    return tuple(sorted(vert.index for vert in edge.verts))
+
+
+def test_csr_link():
+    link = CsrLink(np.array([0, 2, 2, 5]), np.array([4, 1, 7, 8, 9]))
+    assert len(link) == 3
+    assert link[0].tolist() == [4, 1]
+    assert link[1].tolist() == []
+    assert link[2].tolist() == [7, 8, 9]
+    assert link.counts().tolist() == [2, 0, 3]
+
+
+def test_edges(meshes):
+    array_mesh, connection_mesh = meshes
+    assert sorted(map(tuple, array_mesh.edge_verts.tolist())) == sorted(map(get_edge_key, connection_mesh.edges))
+    # the side that starts at every corner runs to the next corner of the face
+    corner_verts = np.stack((array_mesh.faces.indices, array_mesh.faces.indices[array_mesh.corner_next]), axis=1)
+    assert np.array_equal(np.sort(corner_verts, axis=1), array_mesh.edge_verts[array_mesh.corner_edge])
+
+
+def test_links(meshes):
+    array_mesh, connection_mesh = meshes
+    edge_index = {tuple(verts): edge for edge, verts in enumerate(array_mesh.edge_verts.tolist())}
+
+    for vert in connection_mesh.verts:
+        edges = sorted(edge_index[get_edge_key(edge)] for edge in connection_mesh.vertex_edge[vert])
+        assert sorted(array_mesh.vertex_edge[vert.index].tolist()) == edges
+        faces = sorted(face.index for face in connection_mesh.vertex_face[vert])
+        assert sorted(array_mesh.vertex_face[vert.index].tolist()) == faces
+
+    for edge in connection_mesh.edges:
+        faces = sorted(face.index for face in connection_mesh.edge_face[edge])
+        assert sorted(array_mesh.edge_face[edge_index[get_edge_key(edge)]].tolist()) == faces
+
+
+def test_fans(meshes):
+    array_mesh, connection_mesh = meshes
+    array_fans = array_mesh.half_edge
+    fans = connection_mesh.half_edge
+    assert np.array_equal(array_fans.fan_closed, fans.fan_closed)
+    for vert in range(len(array_mesh.coords)):
+        assert np.array_equal(array_fans.corner_vert[array_fans.get_fan(vert)], fans.corner_vert[fans.get_fan(vert)])
+
+
+def test_normals(meshes):
+    array_mesh, connection_mesh = meshes
+    for face in connection_mesh.faces:
+        assert np.allclose(array_mesh.face_normal[face.index], face.normal.values)
+        corners = np.array([vert.co.values for vert in face.verts])
+        area = np.linalg.norm(np.cross(corners, np.roll(corners, -1, axis=0)).sum(axis=0)) / 2
+        assert array_mesh.face_area[face.index] == pytest.approx(area)
+
+    # the array mesh weights the face normals by the face areas, the baseline averages them. With faces of a
+    # similar size the directions are close.
+    weighted = {}
+    for vert, faces in connection_mesh.vertex_face.items():
+        weighted[vert] = sum(face.normal.values * array_mesh.face_area[face.index] for face in faces)
+    similar_faces = array_mesh.face_area.max() < 2 * array_mesh.face_area.min()
+    for vert in connection_mesh.verts:
+        normal = weighted[vert] / np.linalg.norm(weighted[vert])
+        assert np.allclose(array_mesh.vertex_normal[vert.index], normal)
+        baseline = connection_mesh.vertex_normal[vert].values
+        if similar_faces:
+            assert np.dot(normal, baseline) / np.linalg.norm(baseline) > np.cos(np.radians(5))
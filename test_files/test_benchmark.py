@@ -0,0 +1,58 @@
+import copy
+import benchmark
+import cli
+import connector_pipeline
+import synthetic_meshes
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+
+CASE_KEYS = {"name", "vertices", "faces", "connectors", "stages", "counters", "total", "connectors_per_second",
+             "peak_memory", "export_bytes"}
+
+
+def test_benchmark_smoke(tmp_path):
+    results = benchmark.run_benchmarks([("icosphere", 2), ("dome", 3)], repeat=1, log=None)
+    path = str(tmp_path / "baseline.json")
+    benchmark.save_results(path, results)
+    baseline = benchmark.load_results(path)
+
+    # the results survive the json baseline unchanged, so they can be compared with later runs
+    assert baseline == results
+    assert set(baseline) == {"python", "numpy", "machine", "chunk_size", "cases"}
+    assert [case["name"] for case in baseline["cases"]] == ["icosphere_2", "dome_3"]
+
+    for case, (name, size) in zip(baseline["cases"], [("icosphere", 2), ("dome", 3)]):
+        assert set(case) == CASE_KEYS
+        mesh = ArrayConnectionMesh(*synthetic_meshes.get_mesh(name, size))
+        jobs = connector_pipeline.get_connector_jobs(mesh)
+        assert case["connectors"] == len(jobs) == case["counters"]["connectors"]
+        assert case["vertices"] == len(mesh.coords)
+        assert "create_hat" in case["stages"] and "export" in case["stages"] and "pack" in case["stages"]
+        assert case["counters"]["pack.sheets"] > 0
+        assert case["peak_memory"] > 0
+        # the binary STL has a header of 84 bytes and 50 bytes for every triangle
+        parameters = connector_pipeline.get_parameters()
+        triangles = connector_pipeline.get_triangle_amount(jobs, parameters["bolt_vertices"],
+                                                           parameters["nut_vertices"])
+        assert case["export_bytes"] == 84 + 50 * triangles
+
+
+def test_compare_results():
+    case = {"name": "icosphere_4", "total": 1.0, "stages": {"create_hat": 0.5, "fill_hole_faces": 0.001}}
+    baseline = {"cases": [case]}
+    assert benchmark.compare_results(baseline, baseline) == []
+
+    slower = copy.deepcopy(baseline)
+    slower["cases"][0]["total"] = 1.5
+    slower["cases"][0]["stages"] = {"create_hat": 0.8, "fill_hole_faces": 0.009}
+    regressions = benchmark.compare_results(slower, baseline, threshold=1.25)
+    # stages below MIN_COMPARE_TIME in the baseline are too noisy to compare
+    assert [regression.split(":")[0] for regression in regressions] == ["icosphere_4 total", "icosphere_4 create_hat"]
+
+
+def test_cli_compare(tmp_path, capsys):
+    path = str(tmp_path / "baseline.json")
+    arguments = ["benchmark", "--case", "hub:6", "--repeat", "1", "--no-memory"]
+    assert cli.main(arguments + ["--save", path]) == 0
+    # a large threshold so a busy machine doesn't make the smoke test fail
+    assert cli.main(arguments + ["--compare", path, "--threshold", "1000"]) == 0
+    assert "No regressions" in capsys.readouterr().out
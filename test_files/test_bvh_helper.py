@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from blender_helper import bvh_helper
+
+
+def get_brute_force_pairs(low, high):
+    """
+
+    :return: [(first box, second box), ...] of all the overlapping boxes, first < second
+    """
+    overlap = bvh_helper.boxes_overlap(low[:, None], high[:, None], low[None], high[None])
+    return sorted(map(tuple, np.argwhere(np.triu(overlap, 1)).tolist()))
+
+
+def get_random_boxes(amount, seed):
+    """
+    Boxes of very different sizes, some are flat or only a point, some are equal and some only touch
+
+    :return: (n, 3) lowest corners, (n, 3) highest corners
+    """
+    rng = np.random.default_rng(seed)
+    low = rng.uniform(0, 100, (amount, 3))
+    size = rng.exponential(5, (amount, 3)) * (rng.uniform(size=(amount, 3)) > 0.1)
+    high = low + size
+    if amount >= 4:
+        low[1], high[1] = low[0], high[0]
+        # box 3 starts exactly where box 2 ends
+        low[3] = high[2]
+        high[3] = high[2] + 1
+    return low, high
+
+
+@pytest.mark.parametrize("leaf_size", [1, 2, 4, 7])
+@pytest.mark.parametrize("amount", [0, 1, 2, 5, 17, 300])
+def test_same_as_brute_force(amount, leaf_size):
+    low, high = get_random_boxes(amount, amount * 10 + leaf_size)
+    pairs = bvh_helper.BoxTree(low, high, leaf_size).get_overlapping_pairs()
+    assert pairs.shape == (len(pairs), 2)
+    assert sorted(map(tuple, pairs.tolist())) == get_brute_force_pairs(low, high)
+
+
+def test_clustered_boxes():
+    # most boxes in a small corner, so the morton cells and the leaves are crowded
+    rng = np.random.default_rng(1)
+    low = np.concatenate((rng.uniform(0, 1, (200, 3)), rng.uniform(0, 1000, (50, 3))))
+    high = low + rng.uniform(0, 0.3, low.shape)
+    pairs = bvh_helper.BoxTree(low, high).get_overlapping_pairs()
+    assert sorted(map(tuple, pairs.tolist())) == get_brute_force_pairs(low, high)
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+import connector_archive
+import connector_pipeline
+import synthetic_meshes
+from blender_helper import export_helper
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+
+
+@pytest.mark.parametrize("name, size", [("icosphere", 2), ("dome", 4), ("prism", 6)])
+def test_group_frames(tmp_path, name, size):
+    jobs = connector_pipeline.get_connector_jobs(ArrayConnectionMesh(*synthetic_meshes.get_mesh(name, size)))
+    parameters = connector_pipeline.get_parameters({"bolt_vertices": 8})
+    groups = connector_pipeline.group_jobs(jobs)
+    assert len(groups) < len(jobs)
+    path = str(tmp_path / "connectors.npz")
+    connector_archive.write_archive(path, connector_pipeline.generate_connector_groups(groups, parameters,
+                                                                                       processes=1), parameters)
+
+    archive = connector_archive.ConnectorArchive(path)
+    assert len(archive) == len(jobs)
+    assert not np.isnan(archive.arrays["frame_origin"]).any()
+    assert not np.isnan(archive.arrays["frame_axes"]).any()
+
+    # every connector of a group is placed on its own vertex where the connector built for it would be
+    built = {result.index: result for result in connector_pipeline.generate_connectors(jobs, parameters, processes=1)}
+    for result in archive.get_results():
+        placed = export_helper.get_placed_verts([result])[0]
+        expected = export_helper.get_placed_verts([built[result.index]])[0]
+        # the fans of a group only agree up to the dedupe tolerance
+        distances = np.linalg.norm(placed[:, None] - expected[None], axis=2)
+        assert distances.min(axis=1).max() < 0.1
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+import connector_cache
+import connector_pipeline
+import synthetic_meshes
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+
+
+@pytest.fixture(scope="module")
+def connectors():
+    """
+
+    :return: [ConnectorJob, ...], {vertex index: ConnectorResult}
+    """
+    mesh = ArrayConnectionMesh(*synthetic_meshes.geodesic_sphere(1))
+    jobs = connector_pipeline.get_connector_jobs(mesh)
+    results = {result.index: result for result in connector_pipeline.generate_connectors(jobs, processes=1)}
+    return jobs, results
+
+
+def test_round_trip(tmp_path, connectors):
+    jobs, results = connectors
+    parameters = connector_pipeline.get_parameters()
+    cache = connector_cache.ConnectorCache(str(tmp_path))
+    job = jobs[0]
+    key = cache.get_key(job, parameters)
+    assert cache.get(key, job.index) is None
+
+    cache.put(key, results[job.index], middle=job.middle)
+    result = cache.get(key, job.index, middle=job.middle)
+    assert np.array_equal(result.verts, results[job.index].verts)
+    assert np.array_equal(result.face_indices, results[job.index].face_indices)
+    assert np.allclose(result.origin, results[job.index].origin)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_put_same_key(tmp_path, connectors):
+    jobs, results = connectors
+    parameters = connector_pipeline.get_parameters()
+    cache = connector_cache.ConnectorCache(str(tmp_path))
+    for job in jobs[:3] + jobs[:3]:
+        cache.put(cache.get_key(job, parameters), results[job.index], middle=job.middle)
+    assert cache.total_bytes == sum(size for path, time, size in cache.get_entries())
+    assert len(cache.get_entries()) == len({cache.get_key(job, parameters) for job in jobs[:3]})
+
+
+def test_key_numbers(connectors):
+    jobs, results = connectors
+    parameters = connector_pipeline.get_parameters({"distance": 20, "thickness": 7})
+    key = connector_cache.get_job_key(jobs[0], parameters)
+    assert connector_cache.get_job_key(jobs[0], dict(parameters, distance=20.0, thickness=np.int64(7))) == key
+    assert connector_cache.get_job_key(jobs[0], dict(parameters, distance=21)) != key
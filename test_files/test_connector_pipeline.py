@@ -0,0 +1,64 @@
+from concurrent.futures import Future
+import numpy as np
+import connector_pipeline
+import synthetic_meshes
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+
+
+class RecordingPool:
+    """
+    Runs the submitted functions right away and records how many results were not taken yet
+    """
+    def __init__(self):
+        self.submitted = 0
+        self.taken = 0
+        self.most_ahead = 0
+
+    def submit(self, function, *arguments):
+        self.submitted += 1
+        self.most_ahead = max(self.most_ahead, self.submitted - self.taken)
+        future = Future()
+        future.set_result(function(*arguments))
+        return future
+
+
+def test_map_bounded():
+    pool = RecordingPool()
+    results = []
+    for result in connector_pipeline.map_bounded(pool, pow, range(20), (2,), 4):
+        pool.taken += 1
+        results.append(result)
+    assert results == [value ** 2 for value in range(20)]
+    assert pool.most_ahead == 4
+
+
+def test_map_bounded_cancels():
+    pool = RecordingPool()
+    results = connector_pipeline.map_bounded(pool, pow, range(20), (2,), 4)
+    assert next(results) == 0
+    results.close()
+    assert pool.submitted == 4
+
+
+def test_pool_same_as_serial():
+    mesh = ArrayConnectionMesh(*synthetic_meshes.open_dome(4))
+    jobs = connector_pipeline.get_connector_jobs(mesh)
+    serial = {result.index: result for result in connector_pipeline.generate_connectors(jobs, processes=1,
+                                                                                        chunk_size=16)}
+    pooled = list(connector_pipeline.generate_connectors(jobs, processes=2, chunk_size=16))
+    assert len(pooled) == len(serial)
+    for result in pooled:
+        assert np.array_equal(result.verts, serial[result.index].verts)
+        assert np.array_equal(result.face_indices, serial[result.index].face_indices)
+
+
+def test_fit_triangle_budget():
+    jobs = connector_pipeline.get_connector_jobs(ArrayConnectionMesh(*synthetic_meshes.geodesic_sphere(2)))
+    largest = connector_pipeline.get_triangle_amount(jobs, 32, 6)
+    for bolt_vertices, nut_vertices in ((32, 6), (13, 7), (5, 3), (3, 9), (2, 2)):
+        for budget in (0, largest // 3, largest // 2, largest):
+            parameters = connector_pipeline.fit_triangle_budget(jobs, budget, {"bolt_vertices": bolt_vertices,
+                                                                               "nut_vertices": nut_vertices})
+            resolutions = parameters["bolt_vertices"], parameters["nut_vertices"]
+            assert all(value % 2 == 0 and value >= 4 for value in resolutions)
+            assert resolutions == (4, 4) or connector_pipeline.get_triangle_amount(jobs, *resolutions) <= budget
@@ -0,0 +1,107 @@
+import numpy as np
+import pytest
+import blender_stand_in
+import connector_pipeline
+import create_mesh_functions
+import parameter_sweep
+import synthetic_meshes
+from mathutils import Vector
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+from blender_helper.collection_helper import ConnectionMesh, WoodConnector
+
+# generator, size and if the mesh has open fans
+MESHES = [("icosphere", 1, False), ("dome", 3, True), ("prism", 5, False), ("hub", 7, False)]
+
+
+def get_bmesh_connectors(coords, face_offsets, face_indices, vertex_normal, parameters):
+    """
+    The connectors of the bmesh path, like create_connector_meshes.create_bmesh_connectors makes them
+
+    :return: {vertex index: ((V, 3) coordinates, [[v1, v2, v3, v4], ...] faces)}
+    """
+    connection_mesh = ConnectionMesh(blender_stand_in.from_buffers(coords, face_offsets, face_indices))
+    pair_dict = create_mesh_functions.get_edge_face_pairs(connection_mesh)
+    closed_dict = create_mesh_functions.get_closed_fans(connection_mesh)
+
+    connectors = {}
+    for vert, pairs in pair_dict.items():
+        bm = blender_stand_in.BMesh()
+        wood_con = WoodConnector(bm, bm.verts.new(vert.co), Vector(vertex_normal[vert.index]), pairs,
+                                 origin_index=vert.index)
+        wood_con.set_closed_pair(closed_dict[vert])
+        create_mesh_functions.create_hat(wood_con, distance=parameters["distance"])
+        create_mesh_functions.create_thickness(wood_con, thickness=parameters["thickness"])
+        create_mesh_functions.add_holes(wood_con, hole_radius=parameters["hole_radius"],
+                                        nut_radius=parameters["nut_radius"], bolt_dist=parameters["bolt_dist"],
+                                        location=parameters["location"], bolt_thickness=parameters["bolt_thickness"],
+                                        bolt_vertices=parameters["bolt_vertices"],
+                                        nut_vertices=parameters["nut_vertices"])
+        create_mesh_functions.fill_hole_faces(wood_con)
+        create_mesh_functions.to_middle_point(wood_con)
+
+        bm.verts.index_update()
+        faces = [[face_vert.index for face_vert in face.verts] for face in bm.faces]
+        connectors[vert.index] = (np.array([bm_vert.co.values for bm_vert in bm.verts]), faces)
+    return connectors
+
+
+def get_directed_sides(result):
+    """
+
+    :return: (C, 2) start and end vertex of every side of every face
+    """
+    corner_next = np.arange(1, len(result.face_indices) + 1)
+    corner_next[result.face_offsets[1:] - 1] = result.face_offsets[:-1]
+    return np.stack((result.face_indices, result.face_indices[corner_next]), axis=1)
+
+
+@pytest.fixture(scope="module", params=MESHES, ids=[name for name, size, has_open in MESHES])
+def connectors(request):
+    """
+
+    :return: {vertex index: ConnectorResult}, {vertex index: bmesh connector}, {vertex index: bool closed fan},
+             bool if the mesh has open fans
+    """
+    name, size, has_open = request.param
+    coords, face_offsets, face_indices = synthetic_meshes.get_mesh(name, size)
+    mesh = ArrayConnectionMesh(coords, face_offsets, face_indices)
+    parameters = connector_pipeline.get_parameters({"bolt_vertices": 8, "nut_vertices": 6})
+    jobs = connector_pipeline.get_connector_jobs(mesh)
+    results = {result.index: result for result in connector_pipeline.generate_connectors(jobs, parameters,
+                                                                                         processes=1)}
+    bmesh_connectors = get_bmesh_connectors(coords, face_offsets, face_indices, mesh.vertex_normal, parameters)
+    return results, bmesh_connectors, {job.index: job.is_closed for job in jobs}, has_open
+
+
+def test_open_and_closed_fans(connectors):
+    results, bmesh_connectors, is_closed, has_open = connectors
+    assert sorted(results) == sorted(bmesh_connectors)
+    assert any(is_closed.values())
+    assert (not all(is_closed.values())) == has_open
+
+
+def test_same_as_bmesh(connectors):
+    results, bmesh_connectors, is_closed, has_open = connectors
+    for index, result in results.items():
+        verts, faces = bmesh_connectors[index]
+        assert result.verts.shape == verts.shape
+        # the bmesh path makes the vertices in another order, they are matched by position
+        distances = np.linalg.norm(verts[:, None] - result.verts[None], axis=2)
+        verts_map = np.argmin(distances, axis=1)
+        assert np.allclose(distances[np.arange(len(verts)), verts_map], 0, atol=1e-6)
+        assert len(set(verts_map.tolist())) == len(verts)
+
+        # the bmesh faces are wound by recalc_face_normals afterwards, so only their vertices are compared
+        array_faces = sorted(sorted(face) for face in result.get_faces())
+        assert array_faces == sorted(sorted(verts_map[face].tolist()) for face in faces)
+
+
+def test_manifold_and_outwards(connectors):
+    results, bmesh_connectors, is_closed, has_open = connectors
+    for result in results.values():
+        sides = get_directed_sides(result)
+        # every side is used once in each direction, so the connector is closed and consistently wound
+        assert len(np.unique(sides, axis=0)) == len(sides)
+        assert sorted(map(tuple, sides.tolist())) == sorted(map(tuple, sides[:, ::-1].tolist()))
+        volume = parameter_sweep.get_volumes(result.verts[None], result.face_offsets, result.face_indices)[0]
+        assert volume > 0
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+import create_svg_functions
+
+SLIVER = np.array([(0, 0), (100, 0), (50, 0.5)])
+SQUARE = np.array([(0, 0), (10, 0), (10, 10), (0, 10)], dtype=np.float64)
+# an L whose notch is inside its convex hull
+CORNER = np.array([(0, 0), (20, 0), (20, 5), (5, 5), (5, 20), (0, 20)], dtype=np.float64)
+
+
+def is_inside(polygon, points):
+    """
+    Even odd rule with a ray along x
+
+    :return: (n) bool
+    """
+    start = polygon[None]
+    end = np.roll(polygon, -1, axis=0)[None]
+    x, y = points[:, None, 0], points[:, None, 1]
+    crosses = (start[..., 1] > y) != (end[..., 1] > y)
+    t = (y - start[..., 1]) / np.where(crosses, end[..., 1] - start[..., 1], 1)
+    return (crosses & (x < start[..., 0] + t * (end[..., 0] - start[..., 0]))).sum(axis=1) % 2 == 1
+
+
+def test_offset_contains_close_points():
+    rng = np.random.default_rng(0)
+    distance = 2.0
+    for outline in [SLIVER, SLIVER[::-1]] + list(rng.uniform(0, 60, (20, 3, 2))):
+        grown = create_svg_functions.offset_polygon(outline, distance)
+        # points on the sides moved up to almost distance in any direction
+        t = rng.uniform(0, 1, (500, 1))
+        side = rng.integers(0, 3, 500)
+        on_sides = outline[side] + t * (np.roll(outline, -1, axis=0)[side] - outline[side])
+        angle = rng.uniform(0, 2 * np.pi, 500)
+        radius = rng.uniform(0, 0.99 * distance, (500, 1))
+        close = on_sides + radius * np.stack((np.cos(angle), np.sin(angle)), axis=1)
+        assert is_inside(grown, close).all()
+        # the cut of a bevel is at the miter limit, its ends are at most distance to the side of the bisector
+        corner_distances = np.linalg.norm(grown[:, None] - outline[None], axis=2).min(axis=1)
+        assert corner_distances.max() <= np.hypot(create_svg_functions.MITER_LIMIT, 1) * distance + 1e-9
+
+
+def test_offset_keeps_blunt_corners():
+    grown = create_svg_functions.offset_polygon(SQUARE, 1.0)
+    assert np.allclose(grown, [(-1, -1), (11, -1), (11, 11), (-1, 11)])
+
+
+def test_pack_slivers():
+    # random triangles have a few slivers, they have to fit on the sheet like the others
+    rng = np.random.default_rng(3)
+    outlines = list(rng.uniform(0, 60, (400, 3, 2))) + [SLIVER]
+    packing = create_svg_functions.pack_tris(outlines, 600, 400)
+    assert packing.unplaced == []
+    assert all(placement is not None for placement in packing.placements)
+    assert all(create_svg_functions.get_overlaps(sheet) == [] for sheet in packing.sheets)
+
+
+@pytest.mark.parametrize("first, second, overlap", [
+    (SQUARE, SQUARE + 5, True),
+    (SQUARE, SQUARE, True),
+    (SQUARE, SQUARE[::-1] + (10, 3), False),
+    (SQUARE, SQUARE + (10, 10), False),
+    (SQUARE, SQUARE * (3, 0.2) + (-10, 4), True),
+    (CORNER, SQUARE + (6, 6), False),
+    (CORNER, SQUARE + (4, 4), True),
+], ids=["moved", "same", "side", "corner", "crossing", "notch", "notch_deeper"])
+def test_polygons_overlap(first, second, overlap):
+    assert create_svg_functions.polygons_overlap(first, second) == overlap
+    assert create_svg_functions.polygons_overlap(second, first) == overlap
+
+
+@pytest.mark.parametrize("heuristic", create_svg_functions.HEURISTICS)
+def test_pack_without_overlaps(heuristic):
+    # concave parts, their convex hulls overlap when they interlock
+    rng = np.random.default_rng(5)
+    outlines = [CORNER * scale for scale in rng.uniform(0.5, 2, 60)]
+    outlines += [triangle for triangle in rng.uniform(0, 40, (100, 3, 2))]
+    packing = create_svg_functions.pack_tris(outlines, 400, 300, heuristic=heuristic)
+    assert packing.unplaced == []
+    for sheet in packing.sheets:
+        assert create_svg_functions.get_overlaps(sheet) == []
+
+    # a part moved onto its neighbour is found
+    sheet = packing.sheets[0]
+    first, second = sheet.placements[:2]
+    second.points = second.points - second.points.mean(axis=0) + first.points.mean(axis=0)
+    assert (first.part, second.part) in create_svg_functions.get_overlaps(sheet)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+import connector_pipeline
+import synthetic_meshes
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+
+
+def get_tetrahedron(offset, tip):
+    """
+
+    :return: (4, 3) coordinates, [[v1, v2, v3], ...] outward wound faces, the tip is vertex 0
+    """
+    coords = np.array([(0, 0, 0), (1, 0, 0), (0, 1, 0), (0, 0, 1)], dtype=np.float64) * tip + offset
+    faces = [(0, 2, 1), (0, 1, 3), (0, 3, 2), (1, 2, 3)]
+    return coords, faces
+
+
+def test_manifold_meshes():
+    for name, size in (("icosphere", 2), ("dome", 4), ("prism", 5), ("hub", 7)):
+        mesh = ArrayConnectionMesh(*synthetic_meshes.get_mesh(name, size))
+        assert len(mesh.half_edge.non_manifold_verts) == 0
+        mesh.half_edge.check_manifold()
+
+
+def test_bow_tie():
+    # two tetrahedrons that only share their tip have two closed fans around it
+    first_coords, first_faces = get_tetrahedron(0, 1)
+    second_coords, second_faces = get_tetrahedron(0, -1)
+    coords = np.concatenate((first_coords, second_coords[1:]))
+    faces = first_faces + [tuple(0 if vert == 0 else vert + 3 for vert in face) for face in second_faces]
+    mesh = ArrayConnectionMesh.from_faces(coords, faces)
+    assert mesh.half_edge.non_manifold_verts.tolist() == [0]
+    with pytest.raises(ValueError, match="don't make a single fan"):
+        connector_pipeline.get_connector_jobs(mesh)
+
+
+def test_open_bow_tie():
+    coords = np.array([(0, 0, 0), (1, 0, 0), (1, 1, 0), (-1, 0, 0), (-1, -1, 0)], dtype=np.float64)
+    mesh = ArrayConnectionMesh.from_faces(coords, [(0, 1, 2), (0, 3, 4)])
+    assert mesh.half_edge.non_manifold_verts.tolist() == [0]
+
+
+def test_flipped_face():
+    coords, face_offsets, face_indices = synthetic_meshes.geodesic_sphere(2)
+    faces = face_indices.reshape(-1, 3)
+    faces[5] = faces[5][::-1]
+    mesh = ArrayConnectionMesh(coords, face_offsets, faces.reshape(-1))
+    assert mesh.half_edge.non_manifold_verts.tolist() == sorted(set(faces[5].tolist()))
+    with pytest.raises(ValueError):
+        connector_pipeline.get_connector_jobs(mesh)
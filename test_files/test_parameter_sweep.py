@@ -0,0 +1,23 @@
+import pytest
+import cli
+import parameter_sweep
+import synthetic_meshes
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_odd_circles(monkeypatch, processes):
+    sweep = parameter_sweep.Sweep(ArrayConnectionMesh(*synthetic_meshes.geodesic_sphere(1)))
+    evaluated = []
+    monkeypatch.setattr(sweep, "evaluate", lambda parameters, wall: evaluated.append(parameters))
+    parameter_sets = parameter_sweep.get_parameter_grid({"bolt_vertices": [8, 7]})
+    # the odd circle is found before any set is built, not in a worker after the others
+    with pytest.raises(ValueError, match="even amount"):
+        parameter_sweep.run_sweep(sweep, parameter_sets, processes=processes)
+    assert evaluated == []
+
+
+def test_cli_odd_circles(tmp_path, capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["sweep", str(tmp_path / "mesh.obj"), "--set", "nut_vertices=6,2"])
+    assert "even circle resolutions" in capsys.readouterr().err
@@ -0,0 +1,138 @@
+import numpy as np
+import pytest
+import synthetic_meshes
+from blender_helper import export_helper, read_helper
+
+
+def get_mixed_mesh(face_amount=60, vert_amount=40, seed=0):
+    """
+    Faces with runs of 3, 4 and 5 corners, they only have to be valid for the readers
+
+    :return: (V, 3) coordinates, (F + 1) face offsets, (C) face vertex indices
+    """
+    rng = np.random.default_rng(seed)
+    coords = rng.uniform(-100, 100, (vert_amount, 3))
+    sizes = np.repeat(rng.integers(3, 6, face_amount // 4), rng.integers(1, 8, face_amount // 4))
+    face_offsets = read_helper.sizes_to_offsets(sizes)
+    return coords, face_offsets, rng.integers(0, vert_amount, face_offsets[-1])
+
+
+def get_faces(face_offsets, face_indices):
+    return [face_indices[start:end].tolist() for start, end in zip(face_offsets[:-1], face_offsets[1:])]
+
+
+def write_ply(path, coords, face_offsets, face_indices, ply_format):
+    """
+    PLY with extra properties around the ones the reader uses, like files from scanners have them.
+    The binary faces have a flag before the vertex list and a tag after it.
+    """
+    faces = get_faces(face_offsets, face_indices)
+    face_properties = "property list uchar int vertex_indices\n"
+    if ply_format != "ascii":
+        face_properties = "property uchar flags\n" + face_properties + "property int tag\n"
+    header = ("ply\nformat " + ply_format + " 1.0\ncomment written by the tests\n"
+              "element vertex " + str(len(coords)) + "\nproperty double x\nproperty double y\nproperty double z\n"
+              "property float confidence\nelement face " + str(len(faces)) + "\n" + face_properties + "end_header\n")
+
+    with open(path, "wb") as ply_file:
+        ply_file.write(header.encode("ascii"))
+        if ply_format == "ascii":
+            for co in coords.tolist():
+                ply_file.write((" ".join(repr(value) for value in co) + " 0.5\n").encode("ascii"))
+            for face in faces:
+                ply_file.write((" ".join(str(value) for value in [len(face)] + face) + "\n").encode("ascii"))
+            return
+
+        order = "<" if ply_format == "binary_little_endian" else ">"
+        vertex_dtype = np.dtype([("co", order + "f8", (3,)), ("confidence", order + "f4")])
+        vertices = np.zeros(len(coords), dtype=vertex_dtype)
+        vertices["co"] = coords
+        ply_file.write(vertices.tobytes())
+        for index, face in enumerate(faces):
+            ply_file.write(np.array([7, len(face)], dtype="u1").tobytes())
+            ply_file.write(np.array(face + [index], dtype=order + "i4").tobytes())
+
+
+@pytest.mark.parametrize("ply_format", ["ascii", "binary_little_endian", "binary_big_endian"])
+def test_ply(tmp_path, ply_format):
+    coords, face_offsets, face_indices = get_mixed_mesh()
+    path = str(tmp_path / "mesh.ply")
+    write_ply(path, coords, face_offsets, face_indices, ply_format)
+
+    read_coords, read_offsets, read_indices = read_helper.read_buffers(path)
+    assert np.array_equal(read_coords, coords)
+    assert np.array_equal(read_offsets, face_offsets)
+    assert np.array_equal(read_indices, face_indices)
+
+
+def test_obj_round_trip(tmp_path):
+    coords, face_offsets, face_indices = get_mixed_mesh(seed=1)
+    path = str(tmp_path / "mesh.obj")
+    export_helper.write_obj(path, coords, face_offsets, face_indices)
+
+    read_coords, read_offsets, read_indices = read_helper.read_buffers(path)
+    assert np.allclose(read_coords, coords)
+    assert np.array_equal(read_offsets, face_offsets)
+    assert np.array_equal(read_indices, face_indices)
+
+
+def test_obj_features(tmp_path, monkeypatch):
+    lines = ["# comment", "o object", "v 0 0 0", "v 1 0 0 0.5 0.5 0.5", "vt 0 0", "vn 0 0 1", "v 1 1 0",
+             "f 1/1/1 2/1/1 3/1/1", "v 0 1 0", "f -4//1 -2//1 -1//1", "vn 0 0 -1", "s off", "f 2 4 3 1"]
+    path = tmp_path / "mesh.obj"
+    path.write_text("\n".join(lines))
+    # chunks of a few lines, so faces with negative indices come in another chunk than their vertices
+    monkeypatch.setattr(read_helper, "CHUNK_SIZE", 24)
+
+    coords, face_offsets, face_indices = read_helper.read_buffers(str(path))
+    assert coords.tolist() == [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]]
+    assert get_faces(face_offsets, face_indices) == [[0, 1, 2], [0, 2, 3], [1, 3, 2, 0]]
+
+
+def test_stl_welds_corners(tmp_path):
+    coords, face_offsets, face_indices = synthetic_meshes.geodesic_sphere(3)
+    path = str(tmp_path / "mesh.stl")
+    export_helper.write_mesh(path, coords, face_offsets, face_indices)
+
+    read_coords, read_offsets, read_indices = read_helper.read_buffers(path)
+    # STL stores every triangle with its own corners as float32, the equal corners are one vertex again
+    assert len(read_coords) == len(coords)
+    assert np.array_equal(read_offsets, face_offsets)
+    expected = sorted(map(tuple, coords.astype(np.float32)[face_indices].reshape(-1, 9).tolist()))
+    assert sorted(map(tuple, read_coords[read_indices].reshape(-1, 9).tolist())) == expected
+
+    mesh = read_helper.read_mesh(path)
+    assert mesh.half_edge.fan_closed.all()
+    assert len(mesh.edge_verts) == len(coords) + len(face_offsets) - 1 - 2
+
+
+def test_unknown_format(tmp_path):
+    path = tmp_path / "mesh.off"
+    path.write_text("OFF\n")
+    with pytest.raises(ValueError):
+        read_helper.read_buffers(str(path))
+
+
+def test_truncated_ply(tmp_path):
+    coords, face_offsets, face_indices = get_mixed_mesh(face_amount=8)
+    path = tmp_path / "mesh.ply"
+    write_ply(str(path), coords, face_offsets, face_indices, "binary_little_endian")
+    data = path.read_bytes()
+    # the last face has a flag, its count, its indices and a tag. The file ends in its tag, after its count
+    # and before its count.
+    last_face = 1 + 1 + 4 * (face_offsets[-1] - face_offsets[-2]) + 4
+    for cut in (3, last_face - 2, last_face - 1):
+        path.write_bytes(data[:-cut])
+        with pytest.raises(ValueError, match="Truncated face element"):
+            read_helper.read_buffers(str(path))
+
+
+def test_ply_without_faces(tmp_path):
+    coords, face_offsets, face_indices = get_mixed_mesh()
+    path = str(tmp_path / "mesh.ply")
+    write_ply(path, coords, face_offsets[:1], face_indices[:0], "binary_big_endian")
+
+    read_coords, read_offsets, read_indices = read_helper.read_buffers(path)
+    assert np.array_equal(read_coords, coords)
+    assert read_offsets.tolist() == [0]
+    assert len(read_indices) == 0
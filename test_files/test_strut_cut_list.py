@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+import strut_cut_list
+import synthetic_meshes
+from blender_helper.array_collection_helper import ArrayConnectionMesh
+
+# half the angle between the radii to the two ends of an icosahedron edge
+ICOSAHEDRON_HALF_ANGLE = np.degrees(np.arcsin(1 / (2 * np.sin(2 * np.pi / 5))))
+
+
+def get_icosahedron_mesh(radius=100):
+    coords, faces = synthetic_meshes.get_icosahedron()
+    return ArrayConnectionMesh(coords * radius, *synthetic_meshes.faces_to_buffers(faces))
+
+
+def get_random_normals(mesh, seed):
+    """
+    Vertex normals that lean up to about 45 degrees away from the mesh normals, so the cuts get large miters
+    """
+    rng = np.random.default_rng(seed)
+    normals = mesh.vertex_normal + rng.uniform(-0.7, 0.7, mesh.vertex_normal.shape)
+    return normals / np.linalg.norm(normals, axis=1, keepdims=True)
+
+
+def test_icosahedron():
+    mesh = get_icosahedron_mesh()
+    struts = strut_cut_list.get_struts(mesh, distance=20)
+    edge_length = np.linalg.norm(mesh.coords[0] - mesh.coords[1])
+    assert len(struts) == 30
+    assert np.allclose(struts.length, edge_length - 40)
+    # the vertex normals are the radii, so the cuts lean inwards by half the angle of the edge and have no miter
+    assert np.allclose(struts.miter, 0, atol=1e-6)
+    assert np.allclose(struts.bevel, -ICOSAHEDRON_HALF_ANGLE)
+
+    strut_types = strut_cut_list.group_struts(struts)
+    assert len(strut_types) == 1
+    assert strut_types[0].get_count() == 30
+    assert strut_types[0].get_row() == {"name": "strut_0", "count": 30, "length": round(edge_length - 40, 2),
+                                        "start_miter": 0.0, "start_bevel": -31.72, "end_miter": 0.0,
+                                        "end_bevel": -31.72}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_cut_normals(seed):
+    mesh = ArrayConnectionMesh(*synthetic_meshes.geodesic_sphere(2))
+    vertex_normal = get_random_normals(mesh, seed)
+    struts = strut_cut_list.get_struts(mesh, vertex_normal=vertex_normal)
+    assert np.abs(struts.miter).max() > 10
+
+    # the cut normal rebuilt from the angles in the frame of the strut
+    axis, up = strut_cut_list.get_strut_frames(mesh, vertex_normal)[1:]
+    outwards = np.stack((-axis, axis), axis=1)
+    side = np.cross(outwards, up[:, None])
+    miter, bevel = np.radians(struts.miter)[..., None], np.radians(struts.bevel)[..., None]
+    cut_normal = np.cos(bevel) * (np.cos(miter) * outwards + np.sin(miter) * side) + np.sin(bevel) * up[:, None]
+
+    # the vertex normal lies in the cut, and seen along the vertex normal the cut is square to the strut
+    normals = vertex_normal[mesh.edge_verts]
+    assert np.allclose(np.einsum("ijk,ijk->ij", cut_normal, normals), 0, atol=1e-9)
+    seen = outwards - np.einsum("ijk,ijk->ij", outwards, normals)[..., None] * normals
+    assert np.allclose(np.cross(cut_normal, seen), 0, atol=1e-9)
+    assert (np.einsum("ijk,ijk->ij", cut_normal, seen) > 0).all()
+
+
+def test_mirrored_struts():
+    mesh = ArrayConnectionMesh(*synthetic_meshes.geodesic_sphere(2))
+    vertex_normal = get_random_normals(mesh, 3)
+    struts = strut_cut_list.get_struts(mesh, vertex_normal=vertex_normal)
+
+    # mirrored along x, the faces are turned around so they still face outwards
+    face_indices = mesh.faces.indices.reshape(-1, 3)[:, ::-1]
+    mirror = ArrayConnectionMesh(mesh.coords * (-1, 1, 1), *synthetic_meshes.faces_to_buffers(face_indices))
+    mirrored = strut_cut_list.get_struts(mirror, vertex_normal=vertex_normal * (-1, 1, 1))
+
+    # the mirror image of a cut has the opposite miter and the same bevel
+    edge_index = {tuple(edge): index for index, edge in enumerate(struts.edge_verts.tolist())}
+    for index, edge in enumerate(mirrored.edge_verts.tolist()):
+        if tuple(edge) in edge_index:
+            original, ends = edge_index[tuple(edge)], [0, 1]
+        else:
+            original, ends = edge_index[tuple(edge[::-1])], [1, 0]
+        assert np.allclose(mirrored.miter[index], -struts.miter[original, ends], atol=1e-9)
+        assert np.allclose(mirrored.bevel[index], struts.bevel[original, ends], atol=1e-9)
+
+    # a strut and its mirror image need different cuts, they only share a type when they have no miter
+    vert_amount = len(mesh.coords)
+    both = strut_cut_list.Struts(np.concatenate((struts.edge_verts, mirrored.edge_verts + vert_amount)),
+                                 np.concatenate((struts.length, mirrored.length)),
+                                 np.concatenate((struts.miter, mirrored.miter)),
+                                 np.concatenate((struts.bevel, mirrored.bevel)))
+    for strut_type in strut_cut_list.group_struts(both):
+        if np.abs(strut_type.miter).max() > 1:
+            assert len(np.unique(strut_type.edges[:, 0] >= vert_amount)) == 1
+
+
+def test_group_struts():
+    # the second strut is the first one turned around, the third one is its mirror image, the fourth is shorter
+    struts = strut_cut_list.Struts(np.array([(0, 1), (2, 3), (4, 5), (6, 7)]),
+                                   np.array([500.0, 500.1, 500.0, 400.0]),
+                                   np.array([(10.0, -20.0), (-20.1, 10.0), (-10.0, 20.0), (10.0, -20.0)]),
+                                   np.array([(5.0, 3.0), (3.0, 5.1), (5.0, 3.0), (5.0, 3.0)]))
+    strut_types = strut_cut_list.group_struts(struts, length_tolerance=0.5, angle_tolerance=0.5)
+    assert [strut_type.edges.tolist() for strut_type in strut_types] == [[[7, 6]], [[1, 0], [2, 3]], [[4, 5]]]
+    assert [strut_type.name for strut_type in strut_types] == ["strut_0", "strut_1", "strut_2"]
+
+    # the first strut is flipped, so its start is the end with the -20 miter like the start of the second one
+    turned = strut_types[1]
+    assert turned.length == pytest.approx(500.05)
+    assert turned.miter == pytest.approx([-20.05, 10.0])
+    assert turned.bevel == pytest.approx([3.0, 5.05])
+    assert strut_types[2].miter == pytest.approx([-10.0, 20.0])
+
+
+def test_group_empty():
+    struts = strut_cut_list.Struts(np.zeros((0, 2), dtype=np.int64), np.zeros(0), np.zeros((0, 2)), np.zeros((0, 2)))
+    assert strut_cut_list.group_struts(struts) == []
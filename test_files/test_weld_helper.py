@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from blender_helper import weld_helper
+
+TOLERANCE = 0.1
+
+
+def get_brute_force_map(coords, tolerance):
+    """
+    Compares every vertex with every other one and joins the close ones, the groups keep their lowest index
+
+    :return: (V) index of the vertex that every vertex is welded to
+    """
+    difference = coords[:, None] - coords[None]
+    close = np.einsum("ijk,ijk->ij", difference, difference) <= tolerance * tolerance
+    labels = np.arange(len(coords))
+    for vert in range(len(coords)):
+        if labels[vert] != vert:
+            continue
+        group = {vert}
+        todo = [vert]
+        while todo:
+            for neighbour in np.flatnonzero(close[todo.pop()]).tolist():
+                if neighbour not in group:
+                    group.add(neighbour)
+                    todo.append(neighbour)
+        labels[sorted(group)] = vert
+    return labels
+
+
+def get_border_points(seed):
+    """
+    Pairs of close points on both sides of the cell borders, the cells are 2 * TOLERANCE large
+
+    :return: (V, 3) coordinates
+    """
+    rng = np.random.default_rng(seed)
+    border = rng.integers(-5, 5, (100, 3)) * 2 * TOLERANCE
+    first = border + rng.uniform(-0.4, 0.4, (100, 3)) * TOLERANCE
+    second = first + rng.normal(size=(100, 3)) * 0.6 * TOLERANCE
+    return np.concatenate((border, first, second))
+
+
+def get_chains(seed):
+    """
+    Walks with steps a bit shorter than the tolerance, the ends are far apart but every point is close to the next
+
+    :return: (V, 3) coordinates
+    """
+    rng = np.random.default_rng(seed)
+    steps = rng.normal(size=(10, 30, 3))
+    steps *= 0.9 * TOLERANCE / np.linalg.norm(steps, axis=2, keepdims=True)
+    steps[:, 0] = rng.uniform(-10, 10, (10, 3))
+    coords = np.cumsum(steps, axis=1).reshape(-1, 3)
+    return coords[rng.permutation(len(coords))]
+
+
+@pytest.mark.parametrize("get_coords", [get_border_points, get_chains], ids=["borders", "chains"])
+@pytest.mark.parametrize("seed", range(3))
+def test_same_as_brute_force(get_coords, seed):
+    coords = get_coords(seed)
+    expected = get_brute_force_map(coords, TOLERANCE)
+    assert np.array_equal(weld_helper.get_weld_map(coords, TOLERANCE), expected)
+    assert len(np.unique(expected)) < len(coords)
+
+
+def test_random_points():
+    rng = np.random.default_rng(0)
+    coords = rng.uniform(0, 3, (600, 3))
+    assert np.array_equal(weld_helper.get_weld_map(coords, TOLERANCE), get_brute_force_map(coords, TOLERANCE))
+
+
+def test_weld_faces():
+    # two triangles of a quad with their own corners, the last one collapses to an edge and is removed
+    coords = np.array([(0, 0, 0), (1, 0, 0), (1, 1, 0), (0, 0, 0.01), (1, 1, 0.01), (0, 1, 0), (0, 1, 0.05)])
+    face_offsets = np.array([0, 3, 6, 9])
+    face_indices = np.array([0, 1, 2, 3, 4, 5, 5, 6, 0])
+    new_coords, new_offsets, new_indices, vertex_map = weld_helper.weld_vertices(coords, face_offsets,
+                                                                                  face_indices, TOLERANCE)
+    assert vertex_map.tolist() == [0, 1, 2, 0, 2, 3, 3]
+    assert np.array_equal(new_coords, coords[[0, 1, 2, 5]])
+    assert new_offsets.tolist() == [0, 3, 6]
+    assert new_indices.tolist() == [0, 1, 2, 0, 2, 3]